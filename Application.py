@@ -1,65 +1,522 @@
 # Importing Required Libraries
 
+import functools
+import gc
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
 import dash
 import dash_bootstrap_components as dbc
 import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-from dash import Input, Output, html, dcc
+from dash import ClientsideFunction, Input, Output, State, html, dcc
 from dash.exceptions import PreventUpdate
+from flask import has_request_context, jsonify
+
+from aggregates import (AggregateStore, SalesAggregator, StoreDeptSales, WeeklySales, count_data, dept_data,
+                        monthly_data, parallel_aggregate, period_label, slice_dept_difference, store_data,
+                        weekly_data)
+from backends import LOAD_CHUNKSIZE, open_backend
+from data_source import (compact_frame, complete_lines_end, ensure_source, iter_csv_chunks, load_data, prefix_signature,
+                         read_appended_rows, source_fingerprint, source_stat)
+from datasets import DatasetRegistry, parse_datasets
+from export import install_export
+from figure_cache import DiskCache, LRUCache, TieredCache, cached_result
+from figures import (card_layout, clientside_payload, dept_bar_layout, dept_difference_figure, figure_format,
+                     indicator_figure, line_layout, store_bar_layout, store_ranking_figure, weekly_figure)
+from instrumentation import Instrumentation
+from memory_usage import (AllocationTracker, deep_size, format_bytes, format_memory_report, resident_memory,
+                          shared_memory_breakdown)
+from payload import FigureSlimmer, PayloadSizes, install_compression
+from snapshot import SalesSnapshot, SnapshotHolder
+
+# Configuration
+
+source_path = os.environ.get('RETAIL_SALES_SOURCE',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retail_sales.csv'))
+cache_dir = os.environ.get('RETAIL_SALES_CACHE_DIR') or None
+use_cache = os.environ.get('RETAIL_SALES_CACHE', '1') != '0'
+figure_cache_size = int(os.environ.get('FIGURE_CACHE_SIZE', '256'))
+figure_cache_dir = os.environ.get('FIGURE_CACHE_DIR') or None
+figure_cache_ttl = float(os.environ.get('FIGURE_CACHE_TTL', '86400'))
+figure_cache_max_bytes = float(os.environ.get('FIGURE_CACHE_MAX_MB', '256')) * 1024 * 1024
+top_k = int(os.environ.get('TOP_K', '10'))
+aggregates_only = os.environ.get('AGGREGATES_ONLY', '1') != '0'
+refresh_interval = float(os.environ.get('REFRESH_INTERVAL', '0'))
+reload_interval = float(os.environ.get('RELOAD_INTERVAL', '0'))
+streaming_chunksize = int(os.environ.get('STREAMING_CHUNKSIZE', '0'))
+aggregation_workers = int(os.environ.get('AGGREGATION_WORKERS', '1'))
+aggregation_partition = os.environ.get('AGGREGATION_PARTITION', 'Store')
+compact_schema = os.environ.get('COMPACT_SCHEMA', '0') == '1'
+compact_float32 = os.environ.get('COMPACT_FLOAT32', '0') == '1'
+clientside = os.environ.get('CLIENTSIDE', '0') == '1'
+instrumentation_enabled = os.environ.get('INSTRUMENTATION', '0') == '1'
+compress_responses = os.environ.get('COMPRESS_RESPONSES', '1') != '0'
+slim_figures = os.environ.get('SLIM_FIGURES', '0') == '1'
+date_ranges = os.environ.get('DATE_RANGES', '0') == '1'
+cube_filters = os.environ.get('CUBE_FILTERS', '0') == '1' and not date_ranges
+data_backend = os.environ.get('DATA_BACKEND', 'pandas')
+database_dir = os.environ.get('DATA_BACKEND_DIR') or None
+lazy_startup = os.environ.get('LAZY_STARTUP', '0') == '1'
+startup_timeout = float(os.environ.get('STARTUP_TIMEOUT', '30'))
+export_concurrency = int(os.environ.get('EXPORT_CONCURRENCY', '2'))
+dataset_paths = parse_datasets(os.environ.get('RETAIL_SALES_DATASETS', ''))
+dataset_budget = float(os.environ.get('DATASET_MEMORY_BUDGET', '0')) * 1024 * 1024
+# python Application.py --memory-report loads the data with allocation tracing, prints the report and exits
+memory_report_only = __name__ == '__main__' and '--memory-report' in sys.argv[1:]
+memory_accounting = os.environ.get('MEMORY_ACCOUNTING', '0') == '1' or memory_report_only
+memory_budget = float(os.environ.get('MEMORY_BUDGET', '0')) * 1024 * 1024
+memory_budget_action = os.environ.get('MEMORY_BUDGET_ACTION', 'warn')
+# python Application.py --warm-cache fills the shared figure cache for every month pair and exits
+warm_cache_only = __name__ == '__main__' and '--warm-cache' in sys.argv[1:]
+
+# Date ranges and filters are answered on the server, so they take precedence over clientside mode
+clientside = clientside and not date_ranges and not cube_filters
+
+if data_backend == 'duckdb' and refresh_interval > 0:
+    raise RuntimeError('REFRESH_INTERVAL needs DATA_BACKEND=pandas or sqlite')
+
+if figure_cache_dir is not None and refresh_interval > 0 and data_backend != 'pandas':
+    # Workers query the shared database, which other workers append to, so their version does not pin the rows
+    raise RuntimeError('FIGURE_CACHE_DIR with REFRESH_INTERVAL needs DATA_BACKEND=pandas')
+
+if memory_budget_action not in ('warn', 'refuse'):
+    raise ValueError('MEMORY_BUDGET_ACTION must be warn or refuse, got {0!r}'.format(memory_budget_action))
+
+# With several datasets the first one is the default; it is loaded at startup, refreshed and reloaded like a
+# single source, the others are loaded when a page asks for them
+default_dataset = next(iter(dataset_paths), None)
+if dataset_paths:
+    source_path = dataset_paths[default_dataset]
 
 # Loading Data
 
-url = 'https://raw.githubusercontent.com/NurulYakimKazal/Dash-App-For-Retail-Sales-Data/main/retail_sales.csv'
+def load_source(path):
+    # The fingerprint is taken before the rows are read; a change while reading shows up as the next revision.
+    # Only the default source is downloaded when it is missing
+    if path == source_path:
+        ensure_source(path)
+    state = SalesSnapshot(source_fingerprint(path), os.path.getsize(path), source_path=path)
+    if streaming_chunksize <= 0 and data_backend == 'pandas':
+        state.data = load_data(path, cache_dir=cache_dir, use_cache=use_cache)
+        if compact_schema:
+            state.data = compact_frame(state.data, float32=compact_float32)
+    return state
+
+
+# Data Preparation
+
+def month_options(months):
+    return {x: [y for y in months if y != x] for x in months}
+
+
+def prepare_aggregates(state):
+    data = state.data
+    state.range_sales = WeeklySales() if date_ranges else None
+    state.cube_sales = StoreDeptSales() if cube_filters else None
+
+    if data_backend != 'pandas':
+        # The month queries run on the database file; the rows are only streamed for the date-range and cube indexes
+        if state.range_sales is not None or state.cube_sales is not None:
+            for chunk in iter_csv_chunks(state.source_path, streaming_chunksize or LOAD_CHUNKSIZE):
+                if state.range_sales is not None:
+                    state.range_sales.add(chunk)
+                if state.cube_sales is not None:
+                    state.cube_sales.add(chunk)
+    elif streaming_chunksize > 0:
+        state.aggregator = SalesAggregator()
+        for chunk in iter_csv_chunks(state.source_path, streaming_chunksize):
+            state.aggregator.add(chunk)
+            if state.range_sales is not None:
+                state.range_sales.add(chunk)
+            if state.cube_sales is not None:
+                state.cube_sales.add(chunk)
+    elif aggregation_workers > 1 or refresh_interval > 0:
+        state.aggregator = parallel_aggregate(data, aggregation_workers, partition_by=aggregation_partition)
+
+    if data_backend != 'pandas':
+        state.backend = open_backend(data_backend, state.source_path, database_dir=database_dir, top_k=top_k)
+        state.source_offset = state.backend.source_offset()
+        state.options = month_options(state.backend.months())
+        print('Sales database: {0}, {1}'.format(state.backend.path, format_bytes(state.backend.nbytes())))
+    else:
+        if state.aggregator is not None:
+            state.tables = state.aggregator.tables()
+        else:
+            state.tables = (monthly_data(data), weekly_data(data), store_data(data), dept_data(data), count_data(data))
+        state.backend = AggregateStore(*state.tables, top_k=top_k)
+        state.options = month_options(data['Month'].unique() if state.aggregator is None else state.aggregator.months)
+
+
+# Date-Range Index
+
+def build_range_index(state):
+    if state.range_sales is not None:
+        if state.data is not None:
+            state.range_sales.add(state.data)
+        state.range_index = state.range_sales.index(top_k=top_k)
+
+
+# Store-Dept Cube
+
+def build_sales_cube(state):
+    if state.cube_sales is not None:
+        if state.data is not None:
+            state.cube_sales.add(state.data)
+        state.sales_cube = state.cube_sales.cube(top_k=top_k)
+        print('Sales cube: {0} weeks x {1} stores x {2} depts, {3}'.format(
+            *state.sales_cube.sales.shape, format_bytes(state.sales_cube.nbytes())))
+
+
+# Aggregates-Only Mode
+
+def drop_raw_data(state):
+    if aggregates_only and state.data is not None:
+        memory_with_data = resident_memory()
+        state.data = None
+        gc.collect()
+        print('Resident memory: {0} with the raw data, {1} aggregates only'.format(
+            format_bytes(memory_with_data), format_bytes(resident_memory())))
+
+
+def build_snapshot(path=None):
+    state = load_source(path or source_path)
+    prepare_aggregates(state)
+    build_range_index(state)
+    build_sales_cube(state)
+    drop_raw_data(state)
+    # Lets the refresh and the reload tell an append from a rewrite of the rows read so far
+    state.source_signature = prefix_signature(state.source_path, state.source_offset)
+    return state
+
+
+# Published Snapshot
+
+snapshots = SnapshotHolder()
+
+
+def active_snapshot():
+    return snapshots.active()
+
+
+# Dataset Registry
 
-data = pd.read_csv(url, sep=',')
-data['Date'] = pd.to_datetime(data['Date'], format='%Y-%m-%d')
+dataset_registry = DatasetRegistry(dataset_paths, build_snapshot, budget=dataset_budget) if dataset_paths else None
 
 
-# Helper Functions For Data Preparation
+def dataset_snapshot(name=None, count=True):
+    # The published snapshot of a dataset, loaded if needed; KeyError for a dataset that is not configured
+    if dataset_registry is None:
+        if name is not None:
+            raise KeyError(name)
+        return snapshots.current
+    return dataset_registry.get(name or default_dataset, count=count)
 
-def monthly_data(dataframe):
-    monthly_sales = dataframe.groupby(['month', 'Month'])['Weekly_Sales'].sum().reset_index()
-    monthly_sales = monthly_sales.rename(columns={'Weekly_Sales': 'Monthly_Sales'})
-    holiday_sales = dataframe[dataframe['IsHoliday'] == True].groupby(['month'])['Weekly_Sales'].sum().reset_index()
-    holiday_sales = holiday_sales.rename(columns={'Weekly_Sales': 'Holiday_Sales'})
-    merge_data = pd.merge(monthly_sales, holiday_sales, on='month', how='left').fillna(value=0)
-    merge_data['Monthly_Sales'] = merge_data['Monthly_Sales'].round(1)
-    merge_data['Holiday_Sales'] = merge_data['Holiday_Sales'].round(1)
-    return merge_data
 
+# Memory Budget
 
-def weekly_data(dataframe):
-    weekly_sales = dataframe.groupby(['month', 'Month', 'Date'])['Weekly_Sales'].sum().reset_index()
-    weekly_sales['Weekly_Sales'] = weekly_sales['Weekly_Sales'].round(1)
-    weekly_sales['Week_Number'] = weekly_sales.groupby(['month'])['Date'].rank(method='min').astype('int')
-    return weekly_sales
+allocation_tracker = AllocationTracker(enabled=memory_accounting)
 
 
-def store_data(dataframe):
-    store_sales = dataframe.groupby(['month', 'Month', 'Store'])['Weekly_Sales'].sum().reset_index()
-    store_sales['Weekly_Sales'] = store_sales['Weekly_Sales'].round(1)
-    store_sales['Store'] = store_sales['Store'].apply(lambda x: 'Store' + ' ' + str(x))
-    return store_sales
+def memory_budget_status():
+    rss = resident_memory()
+    return {'bytes': memory_budget, 'action': memory_budget_action, 'rss_bytes': rss,
+            'exceeded': memory_budget > 0 and rss > memory_budget}
 
 
-def dept_data(dataframe):
-    dept_sales = dataframe.groupby(['month', 'Month', 'Dept'])['Weekly_Sales'].sum().reset_index()
-    dept_sales['Weekly_Sales'] = dept_sales['Weekly_Sales'].round(1)
-    dept_sales['Dept'] = dept_sales['Dept'].apply(lambda x: 'Dept' + ' ' + str(x))
-    return dept_sales
+def check_memory_budget():
+    # Checked once the data is loaded; MEMORY_BUDGET_ACTION=refuse fails the startup instead of warning
+    status = memory_budget_status()
+    if not status['exceeded']:
+        return
+    message = 'Resident memory {0} exceeds MEMORY_BUDGET {1}'.format(format_bytes(status['rss_bytes']),
+                                                                     format_bytes(memory_budget))
+    if memory_budget_action == 'refuse':
+        raise RuntimeError(message)
+    print('Warning: {0}'.format(message))
 
 
-monthly_sales_data = monthly_data(data)
-weekly_sales_data = weekly_data(data)
-store_sales_data = store_data(data)
-dept_sales_data = dept_data(data)
+# Deferred Startup
+
+startup_ready = threading.Event()
+startup_error = None
+startup_seconds = None
+
+
+def load_sales():
+    # Everything the callbacks read; with LAZY_STARTUP=1 this runs in a background thread while the server already
+    # answers with the loading layout and a 503 from /ready
+    global startup_error, startup_seconds
+    start = time.perf_counter()
+    allocation_tracker.start()
+    try:
+        snapshots.publish(build_snapshot())
+        allocation_tracker.mark_startup()
+        check_memory_budget()
+    except Exception as error:
+        startup_error = error
+        raise
+    startup_seconds = time.perf_counter() - start
+    if dataset_registry is not None:
+        dataset_registry.attach(default_dataset, snapshots, load_seconds=startup_seconds)
+    startup_ready.set()
+
+
+def wait_for_data(func):
+    # Callbacks that arrive before the data is loaded wait for it, up to STARTUP_TIMEOUT, then leave the page as it
+    # is; the rest of the callback reads the snapshot that was published when it started. With several datasets
+    # the callbacks are registered with the page's 'dataset' store as their last state
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not startup_ready.wait(startup_timeout):
+            raise PreventUpdate
+        snapshot = None
+        if dataset_registry is not None:
+            *args, dataset = args
+            try:
+                snapshot = dataset_snapshot(dataset, count=False)
+            except KeyError:
+                raise PreventUpdate
+        with snapshots.pinned(snapshot):
+            return func(*args)
+    return wrapper
+
+
+if lazy_startup:
+    threading.Thread(target=load_sales, name='load-sales', daemon=True).start()
+else:
+    load_sales()
+
+
+# Figure Cache
+
+figure_cache = LRUCache(maxsize=figure_cache_size)
+if figure_cache_dir is not None:
+    # Shared by the workers on this node; results also depend on these settings and on the figure format, so they
+    # are part of the key
+    figure_cache = TieredCache(figure_cache, DiskCache(
+        os.path.join(figure_cache_dir, 'figure_cache.sqlite'), ttl=figure_cache_ttl,
+        max_bytes=figure_cache_max_bytes,
+        namespace='format={0},top_k={1},slim={2},float32={3}'.format(figure_format(), top_k, slim_figures,
+                                                                     compact_float32)))
+
+
+def current_data_version():
+    return active_snapshot().version
+
+
+# Instrumentation
+
+instrumentation = Instrumentation(enabled=instrumentation_enabled)
+
+# Payload Slimming
+
+payload_sizes = PayloadSizes()
+figure_slimmer = FigureSlimmer(enabled=slim_figures, sizes=payload_sizes)
+
+
+# Background Threads
+
+background_stop = threading.Event()
+background_threads = []
+
+
+def start_background_thread(target, name):
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    background_threads.append(thread)
+
+
+def stop_background_threads():
+    # For a master that only forks workers, like serve.py's: the refresh and reload threads finish what they are
+    # doing and stop, so that no worker is forked while one of them holds a lock. Forked workers start their own
+    background_stop.set()
+    for thread in background_threads:
+        thread.join()
+    del background_threads[:]
+
+
+def reset_background_threads():
+    background_stop.clear()
+    del background_threads[:]
+
+
+if hasattr(os, 'register_at_fork'):
+    # Registered before the threads' own hooks, which run after it in the child
+    os.register_at_fork(after_in_child=reset_background_threads)
+
+
+# Incremental Refresh
+
+# Serializes the writers, ingest and reload; callbacks never take it
+ingest_lock = threading.RLock()
+
+
+def extend_indexes(state, changes, rows):
+    # Adds rows to copies of the snapshot's date-range and cube sums, made once per ingest
+    if state.range_sales is not None:
+        if 'range_sales' not in changes:
+            changes['range_sales'] = state.range_sales.copy()
+        changes['range_sales'].add(rows)
+        changes['range_index'] = changes['range_sales'].index(top_k=top_k)
+    if state.cube_sales is not None:
+        if 'cube_sales' not in changes:
+            changes['cube_sales'] = state.cube_sales.copy()
+        changes['cube_sales'].add(rows)
+        changes['sales_cube'] = changes['cube_sales'].cube(top_k=top_k)
+
+
+def ingest(new_rows, new_offset=None):
+    # Folds newly appended sales rows into copies of the aggregates, published with the new snapshot, so a batch
+    # that fails half way leaves the published ones as they were; only the months present in new_rows are
+    # recomputed. A database backend needs the source offset after the rows, so workers sharing the file insert
+    # them once; it inserts them last, after everything that could still fail, and answers a new view of the file
+    with ingest_lock:
+        state = snapshots.current
+        if state.aggregator is None and data_backend == 'pandas':
+            raise RuntimeError('Incremental ingest needs REFRESH_INTERVAL to be set')
+        if len(new_rows) == 0:
+            return []
+        changes = {}
+        extend_indexes(state, changes, new_rows)
+        if data_backend != 'pandas':
+            backend = state.backend.add(new_rows, new_offset, start_offset=state.source_offset,
+                                        source_path=state.source_path)
+            if new_offset is not None and backend.offset > new_offset:
+                # Another worker sharing the file already inserted the rows after these; they are folded in too, so
+                # that the indexes and the offset match the view
+                more_rows = read_appended_rows(state.source_path, new_offset, end=backend.offset)[0]
+                if more_rows is not None:
+                    extend_indexes(state, changes, more_rows)
+                    new_rows = pd.concat([new_rows, more_rows], ignore_index=True)
+                new_offset = backend.offset
+            touched_months = list(new_rows['Month'].unique())
+            changes.update(backend=backend, options=month_options(backend.months()))
+        else:
+            aggregator = state.aggregator.copy()
+            touched_months = aggregator.add(new_rows)
+            tables = aggregator.tables()
+            changes.update(aggregator=aggregator, tables=tables, backend=AggregateStore(*tables, top_k=top_k),
+                           options=month_options(aggregator.months))
+        if state.data is not None:
+            changes['data'] = pd.concat([state.data, new_rows], ignore_index=True)
+        if new_offset is not None:
+            changes.update(source_offset=new_offset, source_signature=prefix_signature(state.source_path, new_offset))
+        else:
+            changes['ingest_token'] = uuid.uuid4().hex[:8]
+        snapshots.publish(state.replace(ingest_count=state.ingest_count + 1, **changes))
+    return touched_months
+
+
+def source_appended(state):
+    # True while the rows read so far are still the first bytes of the source, so new rows can only be appended
+    try:
+        return prefix_signature(state.source_path, state.source_offset) == state.source_signature
+    except OSError:
+        return False
+
+
+def refresh_from_source():
+    startup_ready.wait()
+    rewritten = False
+    while not background_stop.wait(refresh_interval):
+        with ingest_lock:
+            state = snapshots.current
+            # A rewritten source is left to the reload; reading it from the old offset would start mid-line
+            if not source_appended(state):
+                if not rewritten:
+                    print('Refresh of {0} skipped: the file was rewritten, not appended{1}'.format(
+                        source_path, '' if reload_interval > 0 else '; set RELOAD_INTERVAL to reload it'))
+                rewritten = True
+                continue
+            rewritten = False
+            try:
+                end = os.path.getsize(source_path)
+                new_rows, new_offset = read_appended_rows(source_path, state.source_offset, end=end)
+                if not source_appended(state):
+                    continue
+                if new_rows is not None:
+                    ingest(new_rows, new_offset)
+                    continue
+            except OSError as error:
+                print('Refresh of {0} failed: {1}'.format(source_path, error))
+                continue
+            except Exception as error:
+                # Rows that cannot be read or aggregated are skipped, so that they do not stop the refresh
+                try:
+                    new_offset = complete_lines_end(source_path, state.source_offset, end)
+                except OSError:
+                    continue
+                print('Refresh of {0} skipped bytes {1} to {2}: {3}'.format(source_path, state.source_offset,
+                                                                           new_offset, error))
+            if new_offset != state.source_offset:
+                snapshots.publish(state.replace(source_offset=new_offset,
+                                                source_signature=prefix_signature(source_path, new_offset)))
+
+
+def start_refresh_thread():
+    start_background_thread(refresh_from_source, 'refresh-from-source')
+
+
+if refresh_interval > 0:
+    start_refresh_thread()
+    # Threads do not survive a fork, so every pre-forked worker (serve.py, gunicorn --preload) starts its own
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start_refresh_thread)
+
+
+# Hot Reload
+
+def reload_source():
+    # The new snapshot is built next to the published one, which keeps answering requests until the swap
+    start = time.perf_counter()
+    with ingest_lock:
+        state = build_snapshot()
+        snapshots.publish(state)
+    print('Reloaded {0} as version {1} in {2:.2f}s'.format(source_path, state.version, time.perf_counter() - start))
+    return state
+
+
+def watch_source():
+    startup_ready.wait()
+    last_stat = None
+    while not background_stop.wait(reload_interval):
+        try:
+            stat = source_stat(source_path)
+        except OSError:
+            # Missing for a moment while the file is replaced
+            continue
+        if stat == last_stat:
+            continue
+        # Appends to the same file are left to the incremental refresh when it is on; a file that keeps its inode
+        # and grows may still have been rewritten, e.g. by cp, which the signature of the rows read so far shows
+        appended = (refresh_interval > 0 and last_stat is not None and stat[0] == last_stat[0] and
+                    stat[1] > last_stat[1] and source_appended(snapshots.current))
+        last_stat = stat
+        if appended or source_fingerprint(source_path) == snapshots.current.source_version:
+            continue
+        try:
+            reload_source()
+        except Exception as error:
+            print('Reload of {0} failed: {1}'.format(source_path, error))
+
+
+def start_reload_thread():
+    start_background_thread(watch_source, 'watch-source')
+
+
+if reload_interval > 0:
+    start_reload_thread()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start_reload_thread)
 
-all_options = {x: [y for y in data['Month'].unique() if y != x] for x in data['Month'].unique()}
 
 # Components Of Content
 
-card_header1 = dbc.CardHeader('Select Months',
+card_header1 = dbc.CardHeader('Select Periods' if date_ranges else 'Select Months',
                               className='bg-dark bg-opacity-25 border-bottom border-secondary d-flex align-items-center justify-content-center',
                               style={'height': '30%', 'textAlign': 'center', 'fontSize': '14px', 'fontWeight': 500,
                                      'color': 'white'})
@@ -94,29 +551,63 @@ card_header7 = dbc.CardHeader('Stores With Highest Sales',
                               style={'height': '14.5%', 'textAlign': 'center', 'fontSize': '14px', 'fontWeight': 500,
                                      'color': 'white'})
 
-card_body1 = dbc.CardBody([
-    dbc.Row([
-        dbc.Col([
-            html.Label('Current Period', style={'fontSize': '15px', 'fontWeight': 500, 'color': 'white'}),
-            dcc.Dropdown(
-                id='current',
-                options=list(all_options.keys()),
-                value=list(all_options.keys())[0],
-                multi=False,
-                maxHeight=140,
-                style={'width': '100%', 'textAlign':'left'})
-        ], width=6, className='vstack gap-0 d-flex align-items-start justify-content-center',
-            style={'height': '100%'}),
-        dbc.Col([
-            html.Label('Reference Period', style={'fontSize': '15px', 'fontWeight': 500, 'color': 'white'}),
-            dcc.Dropdown(
-                id='reference',
-                multi=False,
-                maxHeight=140,
-                style={'width': '100%', 'textAlign':'left'})
-        ], width=6, className='vstack gap-0 d-flex align-items-start justify-content-center', style={'height': '100%'})
-    ], style={'textAlign': 'center', 'height': '100%', 'width': '100%'})
-], className='mt-0 mb-0 d-flex flex-column align-items-center justify-content-start', style={'height': '70px'})
+def month_period(month):
+    dates = active_snapshot().backend.weekly_sales(month)['Date']
+    return dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
+
+
+def period_picker(component_id, period):
+    # Any range of weeks; the first and second month are preselected like in the month dropdowns
+    range_index = active_snapshot().range_index
+    return dcc.DatePickerRange(
+        id=component_id,
+        min_date_allowed=str(range_index.dates[0])[:10],
+        max_date_allowed=str(range_index.dates[-1])[:10],
+        start_date=period[0],
+        end_date=period[1],
+        display_format='YYYY-MM-DD',
+        style={'width': '100%', 'textAlign': 'left'})
+
+
+def period_controls():
+    options = active_snapshot().options
+    if date_ranges:
+        first_month = list(options.keys())[0]
+        return (period_picker('current-range', month_period(first_month)),
+                period_picker('reference-range', month_period(options[first_month][0])))
+    current_control = dcc.Dropdown(
+        id='current',
+        options=list(options.keys()),
+        value=list(options.keys())[0],
+        multi=False,
+        maxHeight=140,
+        style={'width': '100%', 'textAlign':'left'})
+    reference_control = dcc.Dropdown(
+        id='reference',
+        multi=False,
+        maxHeight=140,
+        style={'width': '100%', 'textAlign':'left'})
+    return current_control, reference_control
+
+
+def period_card_body():
+    # Built once the data is loaded, since the controls list the months
+    current_control, reference_control = period_controls()
+    return dbc.CardBody([
+        dbc.Row([
+            dbc.Col([
+                html.Label('Current Period', style={'fontSize': '15px', 'fontWeight': 500, 'color': 'white'}),
+                current_control
+            ], width=6, className='vstack gap-0 d-flex align-items-start justify-content-center',
+                style={'height': '100%'}),
+            dbc.Col([
+                html.Label('Reference Period', style={'fontSize': '15px', 'fontWeight': 500, 'color': 'white'}),
+                reference_control
+            ], width=6, className='vstack gap-0 d-flex align-items-start justify-content-center',
+                style={'height': '100%'})
+        ], style={'textAlign': 'center', 'height': '100%', 'width': '100%'})
+    ], className='mt-0 mb-0 d-flex flex-column align-items-center justify-content-start', style={'height': '70px'})
+
 
 card_body2 = dbc.CardBody([
     dcc.Graph(
@@ -181,527 +672,573 @@ card_body7 = dbc.CardBody([
 
 plotly_logo = 'https://images.plot.ly/logo/new-branding/plotly-logomark.png'
 
-app = dash.Dash(external_stylesheets=[dbc.themes.SLATE],
+app = dash.Dash(__name__,
+                external_stylesheets=[dbc.themes.SLATE],
                 meta_tags=[{'name': 'viewport', 'content': 'width=device-width, initial-scale=1'}])
 
 app.title = 'Retail Sales Dashboard'
 
-navbar = dbc.Navbar([
-    dbc.Container([
-        html.A([
-            dbc.Row([
-                dbc.Col(html.Img(src=plotly_logo, height='27.5px')),
-                dbc.Col(dbc.NavbarBrand('Retail Sales Dashboard', className='ms-2',
-                                        style={'fontWeight': 500, 'color': 'white'}))
-            ], align='center', className='g-0', style={'opacity': '90%'})
-        ], href='https://plotly.com', style={'textDecoration': 'none'})
-    ])
-], className='bg-dark', style={'height':'45px'})
+# WSGI entry point for production servers, e.g. serve.py or gunicorn --preload Application:server
+server = app.server
+
+instrumentation.install(server)
+if compress_responses:
+    install_compression(server, sizes=payload_sizes)
+install_export(server, dataset_snapshot, startup_ready, concurrency=export_concurrency)
+if dataset_registry is not None:
+    dataset_registry.install(server)
+
+
+@server.route('/ready')
+def ready():
+    # Readiness probe for orchestrators: 503 while the data loads, 500 if loading failed
+    if startup_ready.is_set():
+        return jsonify(status='ready', data_version=snapshots.current.version,
+                       startup_seconds=round(startup_seconds, 3))
+    elif startup_error is not None:
+        return jsonify(status='failed', error=str(startup_error)), 500
+    else:
+        return jsonify(status='loading'), 503
+
+
+# Memory Accounting
+
+AGGREGATE_TABLES = ('monthly_sales_data', 'weekly_sales_data', 'store_sales_data', 'dept_sales_data',
+                    'distinct_counts')
+
+
+def memory_structures():
+    # Everything this process holds on to, by the name the report lists it under
+    state = snapshots.current
+    structures = {'data': state.data}
+    structures.update(zip(AGGREGATE_TABLES, state.tables or ()))
+    structures.update(sales_backend=state.backend, aggregator=state.aggregator, range_sales=state.range_sales,
+                      range_index=state.range_index, cube_sales=state.cube_sales, sales_cube=state.sales_cube,
+                      month_options=state.options)
+    structures.update(figure_layouts=[card_layout, line_layout, dept_bar_layout, store_bar_layout],
+                      app_layout=app.layout() if callable(app.layout) else app.layout,
+                      figure_cache=figure_cache, figure_slimmer=figure_slimmer)
+    if dataset_registry is not None:
+        structures['other_datasets'] = [snapshot for name, snapshot in dataset_registry.loaded().items()
+                                        if name != default_dataset]
+    return {name: value for name, value in structures.items() if value is not None}
+
+
+def memory_report():
+    structures = memory_structures()
+    report = {
+        'pid': os.getpid(),
+        'rss_bytes': resident_memory(),
+        'shared': shared_memory_breakdown(),
+        'structures': {name: deep_size(value) for name, value in structures.items()},
+        # Structures can share frames, e.g. the tables and the aggregate store; counted once here
+        'structures_total_bytes': deep_size(list(structures.values())),
+        'startup': {'seconds': startup_seconds, 'traced_peak_bytes': allocation_tracker.startup_peak,
+                    'traced_bytes': allocation_tracker.startup_current},
+        'callbacks': allocation_tracker.stats(),
+        'budget': memory_budget_status()
+    }
+    if data_backend != 'pandas':
+        report['database_file_bytes'] = snapshots.current.backend.nbytes()
+    return report
+
+
+if memory_accounting:
+    @server.route('/admin/memory')
+    def admin_memory():
+        if not startup_ready.is_set():
+            return jsonify(status='loading'), 503
+        return jsonify(memory_report())
+
+
+def filter_dropdown(component_id, values, label, placeholder):
+    return dcc.Dropdown(
+        id=component_id,
+        options=[{'label': '{0} {1}'.format(label, value), 'value': int(value)} for value in values],
+        multi=True,
+        placeholder=placeholder,
+        maxHeight=200,
+        style={'width': '240px', 'textAlign': 'left', 'fontSize': '13px'})
+
+
+def filter_controls():
+    if not cube_filters:
+        return []
+    sales_cube = active_snapshot().sales_cube
+    return [dbc.Row([
+        dbc.Col(filter_dropdown('store-filter', sales_cube.stores, 'Store', 'All stores')),
+        dbc.Col(filter_dropdown('dept-filter', sales_cube.depts, 'Dept', 'All departments'))
+    ], align='center', className='g-2 ms-auto flex-nowrap')]
+
+
+def dataset_controls(dataset):
+    # Links to ?dataset=<name>; the page callback renders the chosen dataset without reloading the page
+    if dataset_registry is None:
+        return []
+    return [dbc.DropdownMenu([
+        dbc.DropdownMenuItem(name, href='?{0}'.format(urllib.parse.urlencode({'dataset': name})),
+                             active=name == dataset)
+        for name in dataset_registry.names()
+    ], label=dataset, color='secondary', size='sm', className='ms-3')]
+
+
+def navbar_layout(*controls):
+    return dbc.Navbar([
+        dbc.Container([
+            html.A([
+                dbc.Row([
+                    dbc.Col(html.Img(src=plotly_logo, height='27.5px')),
+                    dbc.Col(dbc.NavbarBrand('Retail Sales Dashboard', className='ms-2',
+                                            style={'fontWeight': 500, 'color': 'white'}))
+                ], align='center', className='g-0', style={'opacity': '90%'})
+            ], href='https://plotly.com', style={'textDecoration': 'none'}),
+            *controls
+        ])
+    ], className='bg-dark', style={'height':'45px'})
+
 
 # App Layout
 
-app.layout = dbc.Container([
-    navbar,
-    dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Card([card_header1, card_body1], style={'height':'100%', 'width':'100%'})
-                    ], width=12, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '153px', 'padding':'3px'}),
-                    dbc.Col([
-                        dbc.Card([card_header2, card_body2], style={'height':'100%', 'width':'100%'})
-                    ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '153px', 'padding':'3px'}),
-                    dbc.Col([
-                        dbc.Card([card_header3, card_body3], style={'height':'100%', 'width':'100%'})
-                    ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '153px', 'padding':'3px'}),
-                    dbc.Col([
-                        dbc.Card([card_header4, card_body4], style={'height':'100%', 'width':'100%'})
-                    ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '153px', 'padding':'3px'})
-                ], className='m-0 p-0')
-            ], lg=4, className='m-0 p-0'),
-            dbc.Col([
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Card([card_header5, card_body5], style={'height': '100%', 'width': '100%'})
-                    ], width=12, md=6, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '306px', 'padding': '3px'}),
-                    dbc.Col([
-                        dbc.Card([card_header6, card_body6], style={'height': '100%', 'width': '100%'})
-                    ], width=12, md=6, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '306px', 'padding': '3px'})
-                ], className='m-0 p-0'),
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Card([card_header7, card_body7], style={'height': '100%', 'width': '100%'})
-                    ], width=12, className='m-0 d-flex align-items-center justify-content-center',
-                        style={'height': '306px', 'padding': '3px'})
-                ], className='m-0 p-0')
-            ], lg=8, className='m-0 p-0')
-        ], className='m-0 p-0')
+def dashboard_layout(dataset=None):
+    state = active_snapshot()
+    return dbc.Container([
+        navbar_layout(*dataset_controls(dataset), *filter_controls()),
+        dcc.Store(id='dataset', data=dataset),
+        dcc.Interval(id='refresh', interval=max(refresh_interval or reload_interval, 1) * 1000,
+                     disabled=refresh_interval <= 0 and reload_interval <= 0),
+        dcc.Store(id='data-version', data=state.version),
+        dcc.Store(id='aggregate-store',
+                  data=clientside_payload(state.backend, state.options) if clientside else None),
+        dbc.Container([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([card_header1, period_card_body()], style={'height':'100%', 'width':'100%'})
+                        ], width=12, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '153px', 'padding':'3px'}),
+                        dbc.Col([
+                            dbc.Card([card_header2, card_body2], style={'height':'100%', 'width':'100%'})
+                        ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '153px', 'padding':'3px'}),
+                        dbc.Col([
+                            dbc.Card([card_header3, card_body3], style={'height':'100%', 'width':'100%'})
+                        ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '153px', 'padding':'3px'}),
+                        dbc.Col([
+                            dbc.Card([card_header4, card_body4], style={'height':'100%', 'width':'100%'})
+                        ], width=4, lg=12, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '153px', 'padding':'3px'})
+                    ], className='m-0 p-0')
+                ], lg=4, className='m-0 p-0'),
+                dbc.Col([
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([card_header5, card_body5], style={'height': '100%', 'width': '100%'})
+                        ], width=12, md=6, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '306px', 'padding': '3px'}),
+                        dbc.Col([
+                            dbc.Card([card_header6, card_body6], style={'height': '100%', 'width': '100%'})
+                        ], width=12, md=6, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '306px', 'padding': '3px'})
+                    ], className='m-0 p-0'),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([card_header7, card_body7], style={'height': '100%', 'width': '100%'})
+                        ], width=12, className='m-0 d-flex align-items-center justify-content-center',
+                            style={'height': '306px', 'padding': '3px'})
+                    ], className='m-0 p-0')
+                ], lg=8, className='m-0 p-0')
+            ], className='m-0 p-0')
+        ], className='m-0 p-0', fluid=True)
     ], className='m-0 p-0', fluid=True)
-], className='m-0 p-0', fluid=True)
 
-# App Callbacks
 
-@app.callback(
-    Output('reference', 'options'),
-    Output('reference', 'value'),
-    Input('current', 'value')
-)
-def set_reference_options_and_value(selected_option):
-    if selected_option is None:
-        raise PreventUpdate
+def loading_layout():
+    # Served while the data loads in the background; the page reloads itself once /ready answers 200
+    return dbc.Container([
+        navbar_layout(),
+        dcc.Interval(id='startup-poll', interval=1000),
+        dcc.Store(id='startup-ready-url', data=app.get_relative_path('/ready')),
+        html.Div([
+            dbc.Spinner(color='light'),
+            html.Div('Loading sales data', className='mt-3',
+                     style={'fontSize': '15px', 'fontWeight': 500, 'color': 'white'})
+        ], className='d-flex flex-column align-items-center justify-content-center', style={'height': '80vh'})
+    ], className='m-0 p-0', fluid=True)
+
+
+def serve_layout():
+    if startup_ready.is_set():
+        return dashboard_layout()
+    return loading_layout()
+
+
+def message_layout(message):
+    return dbc.Container([
+        navbar_layout(),
+        html.Div(message, className='d-flex align-items-center justify-content-center',
+                 style={'height': '80vh', 'fontSize': '15px', 'fontWeight': 500, 'color': 'white'})
+    ], className='m-0 p-0', fluid=True)
+
+
+def render_page(search):
+    # The dataset comes from the url, ?dataset=<name>, and is loaded on first use
+    if not startup_ready.is_set():
+        return loading_layout()
+    dataset = urllib.parse.parse_qs((search or '').lstrip('?')).get('dataset', [default_dataset])[0]
+    if dataset not in dataset_registry:
+        return message_layout('Unknown dataset {0}'.format(dataset))
+    try:
+        snapshot = dataset_registry.get(dataset)
+    except Exception as error:
+        return message_layout('Loading dataset {0} failed: {1}'.format(dataset, error))
+    with snapshots.pinned(snapshot):
+        return dashboard_layout(dataset)
+
+
+if dataset_registry is not None or lazy_startup or reload_interval > 0:
+    # The dashboard components only exist once the data is loaded, a reload changes the month options and every
+    # dataset has its own
+    app.config.suppress_callback_exceptions = True
+    if dataset_registry is not None:
+        app.layout = html.Div([dcc.Location(id='url'), html.Div(id='page')])
+        app.callback(Output('page', 'children'), Input('url', 'search'))(allocation_tracker.callback(render_page))
     else:
-        options = [{'label': x, 'value': x} for x in all_options[selected_option]]
-        value = options[0]['label']
-        return options, value
-    
-@app.callback(
-    Output('card2', 'figure'),
-    Input('current', 'value'),
-    Input('reference', 'value')
-)
+        app.layout = serve_layout
+    app.clientside_callback(
+        ClientsideFunction(namespace='retail', function_name='reload_when_ready'),
+        Output('startup-poll', 'disabled'),
+        Input('startup-poll', 'n_intervals'),
+        State('startup-ready-url', 'data')
+    )
+else:
+    app.layout = dashboard_layout()
 
+# Figure Builders
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
 def update_card2(current, reference):
-    if ((current is None) or (reference is None)):
-        raise PreventUpdate
-    else:
-        current_mask = monthly_sales_data[monthly_sales_data['Month']==current]
-        current_total_sales = current_mask.reset_index().loc[0]['Monthly_Sales']
-        reference_mask = monthly_sales_data[monthly_sales_data['Month']==reference]
-        reference_total_sales = reference_mask.reset_index().loc[0]['Monthly_Sales'] 
-        
-        card2 = go.Figure()
-        card2.add_trace(
-            go.Indicator(
-                mode = "number+delta",
-                value = current_total_sales,
-                number = {'valueformat':'$.2f', 'suffix':'M'},
-                align='center',                
-                delta={'reference': reference_total_sales, 'relative':False, 'position':'bottom', 'valueformat':'$.2f', 'suffix':'M'},
-                domain = {'x': [0.15, 0.85], 'y': [0, 1]}                
-            )
-        )
-        card2.update_layout(
-            template='plotly_dark',
-            margin=dict(l=0, r=0, t=0, b=0),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
-        )
-        return card2
-    
-@app.callback(
-    Output('card3', 'figure'),
-    Input('current', 'value'),
-    Input('reference', 'value')
-)
+    with instrumentation.phase('update_card2', 'filter'):
+        current_total_sales = active_snapshot().backend.total_sales(current)
+        reference_total_sales = active_snapshot().backend.total_sales(reference)
+    with instrumentation.phase('update_card2', 'figure'):
+        return indicator_figure(current_total_sales, reference_total_sales, money=True)
+
 
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
 def update_card3(current, reference):
-    if ((current is None) or (reference is None)):
-        raise PreventUpdate
-    else:
-        current_holiday_mask = monthly_sales_data[monthly_sales_data['Month']==current]
-        current_holiday_total_sales = current_holiday_mask.reset_index().loc[0]['Holiday_Sales']
-        reference_holiday_mask = monthly_sales_data[monthly_sales_data['Month']==reference]
-        reference_holiday_total_sales = reference_holiday_mask.reset_index().loc[0]['Holiday_Sales'] 
-                
-        card3 = go.Figure()
-        card3.add_trace(
-            go.Indicator(
-                mode = "number+delta",
-                value = current_holiday_total_sales,
-                number = {'valueformat':'$.2f', 'suffix':'M'},
-                align='center',                
-                delta={'reference': reference_holiday_total_sales, 'relative':False, 'position':'bottom', 'valueformat':'$.2f', 'suffix':'M'},
-                domain = {'x': [0.15, 0.85], 'y': [0, 1]}                
-            )
-        )
-        card3.update_layout(
-            template='plotly_dark',
-            margin=dict(l=0, r=0, t=0, b=0),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
-        )
-        return card3
-    
-@app.callback(
-    Output('card4', 'figure'),
-    Input('current', 'value'),
-    Input('reference', 'value')
-)
+    with instrumentation.phase('update_card3', 'filter'):
+        current_holiday_total_sales = active_snapshot().backend.holiday_sales(current)
+        reference_holiday_total_sales = active_snapshot().backend.holiday_sales(reference)
+    with instrumentation.phase('update_card3', 'figure'):
+        return indicator_figure(current_holiday_total_sales, reference_holiday_total_sales, money=True)
 
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
 def update_card4(current, reference):
-    if ((current is None) or (reference is None)):
-        raise PreventUpdate
-    else:
-        current_total_store = data[data['Month']==current]['Store'].drop_duplicates().count()
-        reference_total_store = data[data['Month']==reference]['Store'].drop_duplicates().count()
-    
-        card4 = go.Figure()
-        card4.add_trace(
-            go.Indicator(
-                mode = "number+delta",
-                value = current_total_store,
-                align='center',                
-                delta={'reference': reference_total_store, 'relative':False, 'position':'bottom'},
-                domain = {'x': [0.15, 0.85], 'y': [0, 1]}                
-            )
-        )
-        card4.update_layout(
-            template='plotly_dark',
-            margin=dict(l=0, r=0, t=0, b=0),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
-        )
-        return card4
+    with instrumentation.phase('update_card4', 'filter'):
+        current_total_store = active_snapshot().backend.store_count(current)
+        reference_total_store = active_snapshot().backend.store_count(reference)
+    with instrumentation.phase('update_card4', 'figure'):
+        return indicator_figure(current_total_store, reference_total_store)
 
-@app.callback(
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
+def update_graph1(current, reference):
+    with instrumentation.phase('update_graph1', 'filter'):
+        current_month = active_snapshot().backend.weekly_sales(current)
+        reference_month = active_snapshot().backend.weekly_sales(reference)
+    with instrumentation.phase('update_graph1', 'figure'):
+        return weekly_figure(current_month, reference_month, current, reference)
+
+
+def update_header(current, reference):
+    header = 'Sales Difference Between Top Departments ({0}-{1})'.format(current, reference)
+    return header
+
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
+def update_graph2(current, reference):
+    with instrumentation.phase('update_graph2', 'filter'):
+        merged_dept = active_snapshot().backend.dept_difference(current, reference)
+    with instrumentation.phase('update_graph2', 'figure'):
+        return dept_difference_figure(merged_dept)
+
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
+def update_graph3(current):
+    with instrumentation.phase('update_graph3', 'filter'):
+        current_store_sales = active_snapshot().backend.top_stores(current)
+    with instrumentation.phase('update_graph3', 'figure'):
+        return store_ranking_figure(current_store_sales, current, 'cyan')
+
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+@figure_slimmer.slimmed
+def update_graph4(reference):
+    with instrumentation.phase('update_graph4', 'filter'):
+        reference_store_sales = active_snapshot().backend.top_stores(reference)
+    with instrumentation.phase('update_graph4', 'figure'):
+        return store_ranking_figure(reference_store_sales, reference, 'dodgerblue')
+
+
+def comparison_outputs(header, labels, totals, holidays, store_counts, weekly, merged_dept, store_sales):
+    # The dashboard outputs for a current and a reference selection, in the order of dashboard_outputs
+    outputs = (indicator_figure(*totals, money=True),
+               indicator_figure(*holidays, money=True),
+               indicator_figure(*store_counts),
+               weekly_figure(*weekly, *labels),
+               header,
+               dept_difference_figure(merged_dept),
+               store_ranking_figure(store_sales[0], labels[0], 'cyan'),
+               store_ranking_figure(store_sales[1], labels[1], 'dodgerblue'))
+    if figure_slimmer.enabled:
+        outputs = tuple(figure_slimmer.slim(output) if isinstance(output, dict) else output for output in outputs)
+    return outputs
+
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+def update_range_figures(current, reference):
+    # Every output for two date ranges; each lookup is a difference of two rows of the prefix-sum index
+    with instrumentation.phase('update_range_figures', 'filter'):
+        periods = [current, reference]
+        range_index = active_snapshot().range_index
+        totals = [range_index.total_sales(period) for period in periods]
+        holidays = [range_index.holiday_sales(period) for period in periods]
+        store_counts = [range_index.store_count(period) for period in periods]
+        weekly = [range_index.weekly_sales(period) for period in periods]
+        merged_dept = range_index.dept_difference(current, reference)
+        store_sales = [range_index.top_stores(period) for period in periods]
+    labels = [period_label(period) for period in periods]
+    header = 'Sales Difference Between Top Departments ({0} vs {1})'.format(*labels)
+    with instrumentation.phase('update_range_figures', 'figure'):
+        return comparison_outputs(header, labels, totals, holidays, store_counts, weekly, merged_dept, store_sales)
+
+
+@instrumentation.timed
+@cached_result(figure_cache, current_data_version)
+def update_filtered_figures(current, reference, stores, depts):
+    # Every output for two months restricted to the selected stores and depts, summed from the sales cube
+    with instrumentation.phase('update_filtered_figures', 'filter'):
+        slices = [active_snapshot().sales_cube.month_slice(month, stores, depts) for month in (current, reference)]
+        merged_dept = slice_dept_difference(*slices)
+    with instrumentation.phase('update_filtered_figures', 'figure'):
+        return comparison_outputs(update_header(current, reference), [current, reference],
+                                  [piece.total_sales for piece in slices], [piece.holiday_sales for piece in slices],
+                                  [piece.store_count for piece in slices], [piece.weekly_sales for piece in slices],
+                                  merged_dept, [piece.top_stores for piece in slices])
+
+
+# App Callbacks
+
+dashboard_outputs = [
+    Output('card2', 'figure'),
+    Output('card3', 'figure'),
+    Output('card4', 'figure'),
     Output('graph1', 'figure'),
-    Input('current', 'value'),
-    Input('reference', 'value')
+    Output('header', 'children'),
+    Output('graph2', 'figure'),
+    Output('graph3', 'figure'),
+    Output('graph4', 'figure')
+]
+
+if date_ranges:
+    refresh_outputs = [Output('current-range', 'max_date_allowed'), Output('reference-range', 'max_date_allowed'),
+                       Output('data-version', 'data')]
+else:
+    refresh_outputs = [Output('current', 'options'), Output('current', 'value'), Output('data-version', 'data')]
+if clientside:
+    refresh_outputs.append(Output('aggregate-store', 'data'))
+
+# Read by wait_for_data, which pins the snapshot of the page's dataset
+dataset_states = [State('dataset', 'data')] if dataset_registry is not None else []
+
+
+@app.callback(
+    *refresh_outputs,
+    Input('refresh', 'n_intervals'),
+    State('data-version', 'data'),
+    *([] if date_ranges else [State('current', 'value')]),
+    *dataset_states
 )
-def update_graph1(current, reference):
-    if ((current is None) or (reference is None)):
+@allocation_tracker.callback
+@wait_for_data
+def refresh_dashboard(n_intervals, version, current=None):
+    state = active_snapshot()
+    if version == state.version:
         raise PreventUpdate
+    elif date_ranges:
+        last_date = str(state.range_index.dates[-1])[:10]
+        return last_date, last_date, state.version
+    # A current month dropped by a reload is replaced by the first one, which refreshes the rest of the page
+    value = dash.no_update if current in state.options else next(iter(state.options), None)
+    if clientside:
+        return list(state.options.keys()), value, state.version, clientside_payload(state.backend, state.options)
     else:
-        current_month = weekly_sales_data[weekly_sales_data['Month'] == current]
-        reference_month = weekly_sales_data[weekly_sales_data['Month'] == reference]
-
-        fig1 = go.Figure()
-
-        fig1.add_trace(
-            go.Scatter(
-                x=current_month['Week_Number'],
-                y=current_month['Weekly_Sales'],
-                line=dict(color='cyan', width=3),
-                name='{}'.format(current),
-                text=current_month['Month'],
-                hovertemplate=
-                "<i><b>Week %{x}</b></i><br>" +
-                "<i><b>Sales:</b> %{y}</i><br>" +
-                "<extra></extra>",
-            )
-        )
-
-        fig1.add_trace(
-            go.Scatter(
-                x=reference_month['Week_Number'],
-                y=reference_month['Weekly_Sales'],
-                line=dict(color='dodgerblue', width=3),
-                name='{}'.format(reference),
-                text=reference_month['Month'],
-                hovertemplate=
-                "<i><b>Week %{x}</b></i><br>" +
-                "<i><b>Sales:</b> %{y}</i><br>" +
-                "<extra></extra>"
-            )
-        )
-
-        fig1.update_layout(
-            xaxis=dict(
-                showline=True,
-                showgrid=False,
-                showticklabels=True,
-                linecolor='white',
-                linewidth=2,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                )
-            ),
-            yaxis=dict(
-                showgrid=False,
-                showline=True,
-                showticklabels=True,
-                linecolor='white',
-                linewidth=2,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                )
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=0, b=0),
-            yaxis_tickformat='$',
-            yaxis_ticksuffix='M',
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1,
-                xanchor="right",
-                x=1,
-                font=dict(
-                    family="Arial",
-                    size=12,
-                    color="white"
-                )
-            )
-        )
-        return fig1
+        return list(state.options.keys()), value, state.version
 
 
-@app.callback(
-    Output('header', 'children'),
-    Input('current', 'value'),
-    Input('reference', 'value')
-)
-def update_header(current, reference):
-    if ((current is None) or (reference is None)):
+def current_month_changed():
+    # Outside a request, e.g. in the benchmarks, the call stands for a new current month
+    return not has_request_context() or any(
+        trigger['prop_id'] == 'current.value' for trigger in dash.callback_context.triggered)
+
+
+def set_reference_options_and_value(selected_option, version=None, reference=None):
+    if selected_option not in active_snapshot().options:
         raise PreventUpdate
     else:
-        header = 'Sales Difference Between Top Departments ({0}-{1})'.format(current, reference)
-        return header
+        options = [{'label': x, 'value': x} for x in active_snapshot().options[selected_option]]
+        # A new data version refreshes the options and keeps the chosen reference month while it still exists
+        if reference in active_snapshot().options[selected_option] and not current_month_changed():
+            return options, dash.no_update
+        value = options[0]['label']
+        return options, value
 
 
-@app.callback(
-    Output('graph2', 'figure'),
-    Input('current', 'value'),
-    Input('reference', 'value')
-)
-def update_graph2(current, reference):
+def update_dashboard(current, reference, version=None):
     if ((current is None) or (reference is None)):
         raise PreventUpdate
+    elif current not in active_snapshot().backend or reference not in active_snapshot().backend:
+        # A month dropped by a reload, until the refreshed dropdowns arrive
+        raise PreventUpdate
     else:
-        current_dept = dept_sales_data[dept_sales_data['Month'] == current].sort_values('Weekly_Sales',
-                                                                                        ascending=False).reset_index()[
-                       :10]
-        current_dept = current_dept.rename(columns={'Weekly_Sales': 'Current_Weekly_Sales'})
-        reference_dept = dept_sales_data[dept_sales_data['Month'] == reference].sort_values('Weekly_Sales',
-                                                                                            ascending=False).reset_index()
-        reference_dept = reference_dept.rename(columns={'Weekly_Sales': 'Reference_Weekly_Sales'})
-        merged_dept = pd.merge(current_dept, reference_dept, on='Dept', how='left')
-        merged_dept['Difference'] = np.round(
-            merged_dept['Current_Weekly_Sales'] - merged_dept['Reference_Weekly_Sales'], 1)
-
-        fig2 = go.Figure()
-
-        fig2.add_trace(
-            go.Bar(
-                x=merged_dept['Difference'],
-                y=merged_dept['Dept'],
-                marker=dict(
-                    color='lightsteelblue'
-                ),
-                orientation='h',
-                text=merged_dept['Difference'],
-                textposition='outside',
-                textfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                hovertemplate=
-                "<i><b>%{y}</b></i><br>" +
-                "<i><b>Sales Diff:</b> %{x}</i><br>" +
-                "<extra></extra>"
-            )
-        )
-
-        fig2.update_layout(
-            xaxis=dict(
-                showline=True,
-                showgrid=False,
-                zeroline=False,
-                showticklabels=True,
-                linecolor='white',
-                linewidth=2,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                range=['{}'.format(merged_dept['Difference'].min() - 3),
-                       '{}'.format(merged_dept['Difference'].max() + 3)]
-            ),
-            yaxis=dict(
-                showgrid=False,
-                showline=False,
-                showticklabels=True,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                )
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=0, b=0),
-            xaxis_tickformat='$',
-            xaxis_ticksuffix='M'
-        )
-        return fig2
+        return (update_card2(current, reference), update_card3(current, reference), update_card4(current, reference),
+                update_graph1(current, reference), update_header(current, reference),
+                update_graph2(current, reference), update_graph3(current), update_graph4(reference))
 
 
-@app.callback(
-    Output('graph3', 'figure'),
-    Input('current', 'value')
-)
-def update_graph3(current):
-    if current is None:
+def update_filtered_dashboard(current, reference, version=None, stores=None, depts=None):
+    if ((current is None) or (reference is None)):
+        raise PreventUpdate
+    elif current not in active_snapshot().sales_cube or reference not in active_snapshot().sales_cube:
         raise PreventUpdate
+    elif not stores and not depts:
+        return update_dashboard(current, reference)
     else:
-        current_store_sales = store_sales_data[store_sales_data['Month'] == current].sort_values(by='Weekly_Sales',
-                                                                                                 ascending=False).reset_index()[
-                              :10]
-
-        fig3 = go.Figure()
-
-        fig3.add_trace(
-            go.Bar(
-                x=current_store_sales['Weekly_Sales'],
-                y=current_store_sales['Store'],
-                marker=dict(
-                    color='cyan'
-                ),
-                orientation='h',
-                text=current_store_sales['Weekly_Sales'],
-                textposition='outside',
-                textfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                name='{}'.format(current),
-                hovertemplate=
-                "<i><b>%{y}</b></i><br>" +
-                "<i><b>Sales:</b> %{x}</i><br>" +
-                "<extra></extra>"
-            )
-        )
-
-        fig3.update_layout(
-            xaxis=dict(
-                showline=True,
-                showgrid=False,
-                zeroline=False,
-                showticklabels=True,
-                linecolor='white',
-                linewidth=2,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                range=[0, '{}'.format(current_store_sales['Weekly_Sales'].max() + 2.75)]
-            ),
-            yaxis=dict(
-                showgrid=False,
-                showline=False,
-                showticklabels=True,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                )
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=27.5, b=0),
-            xaxis_tickformat='$',
-            xaxis_ticksuffix='M',
-            title='{}'.format(current),
-            title_x=0.5,
-            title_y=0.99,
-            title_font_family='Arial',
-            title_font_color='white',
-            title_font_size=15
-        )
-        return fig3
+        return update_filtered_figures(current, reference, tuple(sorted(stores or [])), tuple(sorted(depts or [])))
 
 
-@app.callback(
-    Output('graph4', 'figure'),
-    Input('reference', 'value')
-)
-def update_graph4(reference):
-    if reference is None:
+def update_range_dashboard(current_start, current_end, reference_start, reference_end, version=None):
+    if any(date is None for date in (current_start, current_end, reference_start, reference_end)):
+        raise PreventUpdate
+    current = (current_start[:10], current_end[:10])
+    reference = (reference_start[:10], reference_end[:10])
+    range_index = active_snapshot().range_index
+    if current not in range_index or reference not in range_index:
         raise PreventUpdate
+    return update_range_figures(current, reference)
+
+
+if date_ranges:
+    app.callback(
+        *dashboard_outputs,
+        Input('current-range', 'start_date'),
+        Input('current-range', 'end_date'),
+        Input('reference-range', 'start_date'),
+        Input('reference-range', 'end_date'),
+        Input('data-version', 'data'),
+        *dataset_states
+    )(allocation_tracker.callback(instrumentation.callback(wait_for_data(update_range_dashboard))))
+elif clientside:
+    # Month switching runs in the browser on the aggregates preloaded into 'aggregate-store'
+    app.clientside_callback(
+        ClientsideFunction(namespace='retail', function_name='set_reference_options_and_value'),
+        Output('reference', 'options'),
+        Output('reference', 'value'),
+        Input('current', 'value'),
+        Input('data-version', 'data'),
+        State('aggregate-store', 'data'),
+        State('reference', 'value')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='retail', function_name='update_dashboard'),
+        *dashboard_outputs,
+        Input('current', 'value'),
+        Input('reference', 'value'),
+        Input('aggregate-store', 'data')
+    )
+else:
+    app.callback(
+        Output('reference', 'options'),
+        Output('reference', 'value'),
+        Input('current', 'value'),
+        Input('data-version', 'data'),
+        State('reference', 'value'),
+        *dataset_states
+    )(allocation_tracker.callback(instrumentation.callback(wait_for_data(set_reference_options_and_value))))
+    if cube_filters:
+        app.callback(
+            *dashboard_outputs,
+            Input('current', 'value'),
+            Input('reference', 'value'),
+            Input('data-version', 'data'),
+            Input('store-filter', 'value'),
+            Input('dept-filter', 'value'),
+            *dataset_states
+        )(allocation_tracker.callback(instrumentation.callback(wait_for_data(update_filtered_dashboard))))
     else:
-        reference_store_sales = store_sales_data[store_sales_data['Month'] == reference].sort_values(by='Weekly_Sales',
-                                                                                                     ascending=False).reset_index()[
-                                :10]
-
-        fig4 = go.Figure()
-
-        fig4.add_trace(
-            go.Bar(
-                x=reference_store_sales['Weekly_Sales'],
-                y=reference_store_sales['Store'],
-                marker=dict(
-                    color='dodgerblue'
-                ),
-                orientation='h',
-                text=reference_store_sales['Weekly_Sales'],
-                textposition='outside',
-                textfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                name='{}'.format(reference),
-                hovertemplate=
-                "<i><b>%{y}</b></i><br>" +
-                "<i><b>Sales:</b> %{x}</i><br>" +
-                "<extra></extra>"
-            )
-        )
-
-        fig4.update_layout(
-            xaxis=dict(
-                showline=True,
-                showgrid=False,
-                zeroline=False,
-                showticklabels=True,
-                linecolor='white',
-                linewidth=2,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                ),
-                range=[0, '{}'.format(reference_store_sales['Weekly_Sales'].max() + 2.75)]
-            ),
-            yaxis=dict(
-                showgrid=False,
-                showline=False,
-                showticklabels=True,
-                ticks='outside',
-                tickfont=dict(
-                    family='Arial',
-                    size=12,
-                    color='white'
-                )
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=27.5, b=0),
-            xaxis_tickformat='$',
-            xaxis_ticksuffix='M',
-            title='{}'.format(reference),
-            title_x=0.5,
-            title_y=0.99,
-            title_font_family='Arial',
-            title_font_color='white',
-            title_font_size=15
-        )
-        return fig4
+        app.callback(
+            *dashboard_outputs,
+            Input('current', 'value'),
+            Input('reference', 'value'),
+            Input('data-version', 'data'),
+            *dataset_states
+        )(allocation_tracker.callback(instrumentation.callback(wait_for_data(update_dashboard))))
+
+
+# Cache Warm-Up
+
+def warm_figure_cache():
+    # Computes the dashboard outputs of every month pair of every dataset, so that the workers sharing
+    # FIGURE_CACHE_DIR answer the first request for a pair from the cache
+    pairs = 0
+    for name in (dataset_registry.names() if dataset_registry is not None else [None]):
+        with snapshots.pinned(dataset_snapshot(name, count=False)):
+            options = active_snapshot().options
+            for current in options:
+                for reference in options[current]:
+                    update_dashboard(current, reference)
+                    pairs += 1
+    return pairs
+
 
 # App Execution
 
+def wait_for_startup():
+    while not startup_ready.wait(1):
+        if startup_error is not None:
+            sys.exit('Loading the sales data failed: {0}'.format(startup_error))
+
+
 if __name__ == '__main__':
+    if warm_cache_only:
+        if figure_cache_dir is None or date_ranges or clientside:
+            sys.exit('--warm-cache needs FIGURE_CACHE_DIR, and month pairs answered on the server')
+        wait_for_startup()
+        start = time.perf_counter()
+        pairs = warm_figure_cache()
+        print('Cached {0} month pairs in {1} in {2:.2f}s'.format(pairs, figure_cache.shared.path,
+                                                                time.perf_counter() - start))
+        sys.exit(0)
+    if memory_report_only:
+        wait_for_startup()
+        report = memory_report()
+        print(format_memory_report(report))
+        sys.exit(1 if report['budget']['exceeded'] else 0)
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,567 @@
+# Importing Required Libraries
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# Helper Functions For Data Preparation
+
+def monthly_data(dataframe):
+    monthly_sales = dataframe.groupby(['month', 'Month'], observed=True)['Weekly_Sales'].sum().reset_index()
+    monthly_sales = monthly_sales.rename(columns={'Weekly_Sales': 'Monthly_Sales'})
+    holiday_rows = dataframe[dataframe['IsHoliday'] == True]
+    holiday_sales = holiday_rows.groupby(['month'], observed=True)['Weekly_Sales'].sum().reset_index()
+    holiday_sales = holiday_sales.rename(columns={'Weekly_Sales': 'Holiday_Sales'})
+    merge_data = pd.merge(monthly_sales, holiday_sales, on='month', how='left').fillna(value=0)
+    merge_data['Monthly_Sales'] = merge_data['Monthly_Sales'].astype(float).round(1)
+    merge_data['Holiday_Sales'] = merge_data['Holiday_Sales'].astype(float).round(1)
+    return merge_data
+
+
+def weekly_data(dataframe):
+    weekly_sales = dataframe.groupby(['month', 'Month', 'Date'], observed=True)['Weekly_Sales'].sum().reset_index()
+    weekly_sales['Weekly_Sales'] = weekly_sales['Weekly_Sales'].astype(float).round(1)
+    weekly_sales['Week_Number'] = weekly_sales.groupby(['month'], observed=True)['Date'].rank(method='min').astype('int')
+    return weekly_sales
+
+
+def store_data(dataframe):
+    store_sales = dataframe.groupby(['month', 'Month', 'Store'], observed=True)['Weekly_Sales'].sum().reset_index()
+    store_sales['Weekly_Sales'] = store_sales['Weekly_Sales'].astype(float).round(1)
+    store_sales['Store'] = 'Store ' + store_sales['Store'].astype(str)
+    return store_sales
+
+
+def dept_data(dataframe):
+    dept_sales = dataframe.groupby(['month', 'Month', 'Dept'], observed=True)['Weekly_Sales'].sum().reset_index()
+    dept_sales['Weekly_Sales'] = dept_sales['Weekly_Sales'].astype(float).round(1)
+    dept_sales['Dept'] = 'Dept ' + dept_sales['Dept'].astype(str)
+    return dept_sales
+
+
+def count_data(dataframe):
+    distinct_counts = dataframe.groupby(['month', 'Month'], observed=True).agg(Store_Count=('Store', 'nunique'),
+                                                                              Dept_Count=('Dept', 'nunique')).reset_index()
+    return distinct_counts
+
+
+# Month-Indexed Aggregate Store
+
+def by_month(dataframe):
+    return dataframe.groupby('Month', sort=False, observed=True)
+
+
+def ranked(dataframe, top_k=None):
+    ranking = dataframe.sort_values(by='Weekly_Sales', ascending=False).reset_index()
+    return ranking if top_k is None else ranking[:top_k]
+
+
+class SalesBackend:
+    # The month queries the helper functions and callbacks run; AggregateStore answers them from in-memory tables,
+    # backends.SQLBackend with indexed SQL on an embedded database
+
+    def __contains__(self, month):
+        raise NotImplementedError
+
+    def total_sales(self, month):
+        raise NotImplementedError
+
+    def holiday_sales(self, month):
+        raise NotImplementedError
+
+    def store_count(self, month):
+        raise NotImplementedError
+
+    def dept_count(self, month):
+        raise NotImplementedError
+
+    def weekly_sales(self, month):
+        raise NotImplementedError
+
+    def top_stores(self, month):
+        raise NotImplementedError
+
+    def top_depts(self, month):
+        raise NotImplementedError
+
+    def dept_sales(self, month):
+        raise NotImplementedError
+
+    def month_payload(self, month):
+        # Plain lists and dicts of one month's aggregates, for the clientside callbacks
+        weekly = self.weekly_sales(month)
+        stores = self.top_stores(month)
+        depts = self.top_depts(month)
+        return {
+            'total': float(self.total_sales(month)),
+            'holiday': float(self.holiday_sales(month)),
+            'stores': int(self.store_count(month)),
+            'weeks': weekly['Week_Number'].tolist(),
+            'weekly': weekly['Weekly_Sales'].tolist(),
+            'top_stores': [stores['Store'].tolist(), stores['Weekly_Sales'].tolist()],
+            'top_depts': [depts['Dept'].tolist(), depts['Weekly_Sales'].tolist()],
+            'depts': self.dept_sales(month).to_dict()
+        }
+
+    def dept_difference(self, current, reference):
+        current_dept = self.top_depts(current)
+        reference_sales = self.dept_sales(reference).reindex(current_dept['Dept']).to_numpy()
+        return pd.DataFrame({'Dept': current_dept['Dept'],
+                             'Difference': np.round(current_dept['Weekly_Sales'].to_numpy() - reference_sales, 1)})
+
+
+class AggregateStore(SalesBackend):
+    # Built once from the aggregate tables; every lookup by month is a dictionary access
+
+    def __init__(self, monthly_sales, weekly_sales, store_sales, dept_sales, distinct_counts, top_k=10):
+        self.top_k = top_k
+        totals = monthly_sales.set_index('Month')
+        self._totals = dict(zip(totals.index, zip(totals['Monthly_Sales'], totals['Holiday_Sales'])))
+        counts = distinct_counts.set_index('Month')
+        self._counts = dict(zip(counts.index, zip(counts['Store_Count'], counts['Dept_Count'])))
+        self._weekly = {month: frame for month, frame in by_month(weekly_sales)}
+        self._top_stores = {month: ranked(frame, top_k) for month, frame in by_month(store_sales)}
+        self._top_depts = {month: ranked(frame, top_k) for month, frame in by_month(dept_sales)}
+        self._dept_sales = {month: frame.set_index('Dept')['Weekly_Sales'] for month, frame in by_month(dept_sales)}
+
+    def __contains__(self, month):
+        return month in self._totals
+
+    def total_sales(self, month):
+        return self._totals[month][0]
+
+    def holiday_sales(self, month):
+        return self._totals[month][1]
+
+    def store_count(self, month):
+        return self._counts[month][0]
+
+    def dept_count(self, month):
+        return self._counts[month][1]
+
+    def weekly_sales(self, month):
+        return self._weekly[month]
+
+    def top_stores(self, month):
+        return self._top_stores[month]
+
+    def top_depts(self, month):
+        return self._top_depts[month]
+
+    def dept_sales(self, month):
+        return self._dept_sales[month]
+
+
+# Incremental Aggregation
+
+def month_tables(month, label, partial):
+    # Rounds one month of partial sums into the rows monthly_data, weekly_data, store_data, dept_data and
+    # count_data would produce for it
+    monthly_sales = pd.DataFrame({'month': [month], 'Month': [label],
+                                  'Monthly_Sales': [round(float(partial['total']), 1)],
+                                  'Holiday_Sales': [round(float(partial['holiday']), 1)]})
+    weekly = partial['weekly'].sort_index()
+    weekly_sales = pd.DataFrame({'month': month, 'Month': label, 'Date': weekly.index,
+                                 'Weekly_Sales': weekly.astype(float).round(1).to_numpy(),
+                                 'Week_Number': np.arange(1, len(weekly) + 1)})
+    stores = partial['store'].sort_index()
+    store_sales = pd.DataFrame({'month': month, 'Month': label, 'Store': stores.index,
+                                'Weekly_Sales': stores.astype(float).round(1).to_numpy()})
+    store_sales['Store'] = 'Store ' + store_sales['Store'].astype(str)
+    depts = partial['dept'].sort_index()
+    dept_sales = pd.DataFrame({'month': month, 'Month': label, 'Dept': depts.index,
+                               'Weekly_Sales': depts.astype(float).round(1).to_numpy()})
+    dept_sales['Dept'] = 'Dept ' + dept_sales['Dept'].astype(str)
+    distinct_counts = pd.DataFrame({'month': [month], 'Month': [label],
+                                    'Store_Count': [len(stores)], 'Dept_Count': [len(depts)]})
+    return monthly_sales, weekly_sales, store_sales, dept_sales, distinct_counts
+
+
+def sums_by_month(month_codes, keys, sales, column):
+    sums = sales.groupby([month_codes, column.to_numpy()], sort=False).sum()
+    return {keys[code]: group.droplevel(0) for code, group in sums.groupby(level=0, sort=False)}
+
+
+class SalesAggregator:
+    # Keeps unrounded partial sums per month, so new rows only touch the months they belong to
+
+    def __init__(self):
+        self.months = []
+        self._partials = {}
+        self._tables = {}
+        self._stale = set()
+
+    def add(self, dataframe):
+        if len(dataframe) == 0:
+            return []
+        # The (month, Month) key is hashed once; the finer groupbys run on its integer codes
+        by_month = dataframe.groupby(['month', 'Month'], sort=False, observed=True)
+        month_codes = by_month.ngroup().to_numpy()
+        totals = by_month['Weekly_Sales'].sum()
+        keys = list(totals.index)
+        sales = pd.Series(dataframe['Weekly_Sales'].to_numpy())
+        holiday = (dataframe['IsHoliday'] == True).to_numpy()
+        holidays = sales[holiday].groupby(month_codes[holiday]).sum()
+        weekly = sums_by_month(month_codes, keys, sales, dataframe['Date'])
+        stores = sums_by_month(month_codes, keys, sales, dataframe['Store'])
+        depts = sums_by_month(month_codes, keys, sales, dataframe['Dept'])
+
+        self._add_months(dataframe['Month'].unique())
+        for code, key in enumerate(keys):
+            self._fold(key, totals.iloc[code], holidays.get(code, 0.0), weekly[key], stores[key], depts[key])
+        return keys
+
+    def merge(self, other):
+        self._add_months(other.months)
+        for key, partial in other._partials.items():
+            self._fold(key, partial['total'], partial['holiday'], partial['weekly'], partial['store'], partial['dept'])
+        return list(other._partials)
+
+    def copy(self):
+        # Partial sums are replaced rather than changed in place, so the copy shares them until either one adds rows
+        other = SalesAggregator()
+        other.months = list(self.months)
+        other._partials = {key: dict(partial) for key, partial in self._partials.items()}
+        other._tables = dict(self._tables)
+        other._stale = set(self._stale)
+        return other
+
+    def _add_months(self, labels):
+        for label in labels:
+            if label not in self.months:
+                self.months.append(label)
+
+    def _fold(self, key, total, holiday, weekly, stores, depts):
+        partial = self._partials.get(key)
+        if partial is None:
+            self._partials[key] = {'total': total, 'holiday': holiday, 'weekly': weekly, 'store': stores,
+                                   'dept': depts}
+        else:
+            partial['total'] += total
+            partial['holiday'] += holiday
+            partial['weekly'] = partial['weekly'].add(weekly, fill_value=0)
+            partial['store'] = partial['store'].add(stores, fill_value=0)
+            partial['dept'] = partial['dept'].add(depts, fill_value=0)
+        self._stale.add(key)
+
+    def tables(self):
+        for key in self._stale:
+            self._tables[key] = month_tables(key[0], key[1], self._partials[key])
+        self._stale.clear()
+        keys = sorted(self._tables)
+        if not keys:
+            raise ValueError('No sales rows have been aggregated yet')
+        return tuple(pd.concat([self._tables[key][position] for key in keys], ignore_index=True)
+                     for position in range(5))
+
+
+# Parallel Aggregation
+
+_shared_frame = None
+_shared_partitions = None
+
+
+def aggregate_frame(dataframe):
+    aggregator = SalesAggregator()
+    aggregator.add(dataframe)
+    return aggregator
+
+
+def aggregate_shared_partition(partition):
+    return aggregate_frame(_shared_frame[_shared_partitions == partition])
+
+
+def single_threaded():
+    return threading.current_thread() is threading.main_thread() and threading.active_count() == 1
+
+
+def parallel_aggregate(dataframe, workers, partition_by='Store'):
+    # Each worker aggregates the rows of its partition in one pass and the partial sums are merged here
+    global _shared_frame, _shared_partitions
+    if workers <= 1:
+        return aggregate_frame(dataframe)
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    if fork and not single_threaded():
+        # A child forked while other threads run, e.g. for a reload or a lazy startup next to the server, inherits
+        # the locks they held and can hang on them. Spawned children would run the main module again, which loads
+        # the whole app, so the rows are aggregated in this process instead
+        return aggregate_frame(dataframe)
+    partitions = pd.factorize(dataframe[partition_by])[0] % workers
+    if fork:
+        # Forked workers read the frame inherited from this process instead of a pickled copy
+        _shared_frame, _shared_partitions = dataframe, partitions
+        try:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                results = list(executor.map(aggregate_shared_partition, range(workers)))
+        finally:
+            _shared_frame = _shared_partitions = None
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(aggregate_frame,
+                                        [dataframe[partitions == partition] for partition in range(workers)]))
+
+    aggregator = SalesAggregator()
+    for result in results:
+        aggregator.merge(result)
+    aggregator.months = list(dataframe['Month'].unique())
+    return aggregator
+
+
+# Date-Range Index
+
+def period_label(period):
+    return '{0} to {1}'.format(*(pd.Timestamp(date).strftime('%Y-%m-%d') for date in period))
+
+
+def prefix_sums(values):
+    # Cumulative sums along the week axis with a leading row of zeros, so that a range is prefix[end] - prefix[start]
+    values = np.asarray(values, dtype=float)
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+class WeeklySales:
+    # Unrounded sales and row counts per week and store and per week and dept, collected from any number of batches
+
+    def __init__(self):
+        self._store = None
+        self._dept = None
+        self._holiday = None
+
+    def add(self, dataframe):
+        if len(dataframe) == 0:
+            return
+        sales = dataframe['Weekly_Sales'].astype(float)
+        dates = dataframe['Date'].to_numpy()
+        store = sales.groupby([dates, dataframe['Store'].to_numpy()]).agg(['sum', 'size'])
+        dept = sales.groupby([dates, dataframe['Dept'].to_numpy()]).agg(['sum', 'size'])
+        holiday = sales.where(dataframe['IsHoliday'] == True, 0.0).groupby(dates).sum()
+        self._store = store if self._store is None else self._store.add(store, fill_value=0)
+        self._dept = dept if self._dept is None else self._dept.add(dept, fill_value=0)
+        self._holiday = holiday if self._holiday is None else self._holiday.add(holiday, fill_value=0)
+
+    def copy(self):
+        other = WeeklySales()
+        other._store, other._dept, other._holiday = self._store, self._dept, self._holiday
+        return other
+
+    def index(self, top_k=10):
+        if self._store is None:
+            raise ValueError('No sales rows have been added yet')
+        dates = self._holiday.index.sort_values()
+        store = self._store.unstack(fill_value=0).reindex(dates, fill_value=0)
+        dept = self._dept.unstack(fill_value=0).reindex(dates, fill_value=0)
+        return PrefixSumIndex(dates.to_numpy(), store.columns.get_level_values(1).to_numpy(), store['sum'],
+                              store['size'], dept.columns.get_level_values(1).to_numpy(), dept['sum'], dept['size'],
+                              self._holiday.reindex(dates).to_numpy(), top_k=top_k)
+
+
+class PrefixSumIndex:
+    # Cumulative sums over the weekly series per store and per dept; every date-range lookup is a difference of two
+    # rows, so its cost does not depend on the length of the range. Periods are (start, end) pairs of dates,
+    # both inclusive
+
+    def __init__(self, dates, stores, store_sales, store_rows, depts, dept_sales, dept_rows, holiday_sales, top_k=10):
+        self.top_k = top_k
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.store_labels = np.array(['Store {0}'.format(store) for store in stores], dtype=object)
+        self.dept_labels = np.array(['Dept {0}'.format(dept) for dept in depts], dtype=object)
+        self._weekly = np.asarray(store_sales, dtype=float).sum(axis=1)
+        self._total = prefix_sums(self._weekly)
+        self._holiday = prefix_sums(holiday_sales)
+        self._store = prefix_sums(store_sales)
+        self._store_rows = prefix_sums(store_rows)
+        self._dept = prefix_sums(dept_sales)
+        self._dept_rows = prefix_sums(dept_rows)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.dates, self._weekly, self._total, self._holiday, self._store,
+                                              self._store_rows, self._dept, self._dept_rows))
+
+    def span(self, period):
+        start, end = (np.datetime64(pd.Timestamp(date), 'ns') for date in period)
+        return np.searchsorted(self.dates, start, 'left'), np.searchsorted(self.dates, end, 'right')
+
+    def __contains__(self, period):
+        first, last = self.span(period)
+        return last > first
+
+    def total_sales(self, period):
+        first, last = self.span(period)
+        return round(self._total[last] - self._total[first], 1)
+
+    def holiday_sales(self, period):
+        first, last = self.span(period)
+        return round(self._holiday[last] - self._holiday[first], 1)
+
+    def store_count(self, period):
+        first, last = self.span(period)
+        return int(np.count_nonzero(self._store_rows[last] - self._store_rows[first]))
+
+    def weekly_sales(self, period):
+        first, last = self.span(period)
+        return pd.DataFrame({'Date': self.dates[first:last],
+                             'Weekly_Sales': np.round(self._weekly[first:last], 1),
+                             'Week_Number': np.arange(1, last - first + 1),
+                             'Month': period_label(period)})
+
+    def period_sales(self, prefix, rows, period):
+        # Rounded sales per store or dept in the period, NaN where it has no rows
+        first, last = self.span(period)
+        sales = np.round(prefix[last] - prefix[first], 1)
+        return np.where(rows[last] - rows[first] > 0, sales, np.nan)
+
+    def ranking(self, prefix, rows, period):
+        sales = self.period_sales(prefix, rows, period)
+        order = np.argsort(-np.nan_to_num(sales, nan=-np.inf), kind='stable')
+        return order[:min(self.top_k, np.count_nonzero(~np.isnan(sales)))], sales
+
+    def top_stores(self, period):
+        order, sales = self.ranking(self._store, self._store_rows, period)
+        return pd.DataFrame({'Store': self.store_labels[order], 'Weekly_Sales': sales[order]})
+
+    def top_depts(self, period):
+        order, sales = self.ranking(self._dept, self._dept_rows, period)
+        return pd.DataFrame({'Dept': self.dept_labels[order], 'Weekly_Sales': sales[order]})
+
+    def dept_difference(self, current, reference):
+        order, sales = self.ranking(self._dept, self._dept_rows, current)
+        reference_sales = self.period_sales(self._dept, self._dept_rows, reference)
+        return pd.DataFrame({'Dept': self.dept_labels[order],
+                             'Difference': np.round(sales[order] - reference_sales[order], 1)})
+
+
+# Store-Dept Cube
+
+class StoreDeptSales:
+    # Unrounded sales per week, store and dept, collected from any number of batches into a dense cube
+
+    def __init__(self):
+        self._parts = []
+        self._months = []
+
+    def add(self, dataframe):
+        if len(dataframe) == 0:
+            return
+        keys = [dataframe['Date'].to_numpy(), dataframe['Store'].to_numpy(), dataframe['Dept'].to_numpy()]
+        frame = pd.DataFrame({'sales': dataframe['Weekly_Sales'].astype(float).to_numpy(),
+                              'holiday': (dataframe['IsHoliday'] == True).to_numpy(), 'rows': 1})
+        self._parts.append(frame.groupby(keys).agg({'sales': 'sum', 'holiday': 'max', 'rows': 'sum'}))
+        self._months.append(pd.Series(np.asarray(dataframe['Month'], dtype=object), index=keys[0]))
+
+    def copy(self):
+        other = StoreDeptSales()
+        other._parts, other._months = list(self._parts), list(self._months)
+        return other
+
+    def combined(self):
+        # Batches are only aligned here, once per cube, and kept combined for later batches
+        if len(self._parts) > 1:
+            cells = pd.concat(self._parts).groupby(level=[0, 1, 2]).agg({'sales': 'sum', 'holiday': 'max',
+                                                                          'rows': 'sum'})
+            self._parts = [cells]
+        if len(self._months) > 1 or (self._months and self._months[0].index.has_duplicates):
+            months = pd.concat(self._months)
+            self._months = [months[~months.index.duplicated()]]
+        return self._parts[0], self._months[0]
+
+    def cube(self, top_k=10):
+        if not self._parts:
+            raise ValueError('No sales rows have been added yet')
+        cells, months = self.combined()
+        dates, stores, depts = (level.sort_values() for level in cells.index.levels)
+        shape = (len(dates), len(stores), len(depts))
+        positions = tuple(level.get_indexer(cells.index.get_level_values(axis))
+                          for axis, level in enumerate([dates, stores, depts]))
+        sales = np.zeros(shape)
+        holiday = np.zeros(shape, dtype=bool)
+        present = np.zeros(shape, dtype=bool)
+        sales[positions] = cells['sales'].to_numpy()
+        holiday[positions] = cells['holiday'].to_numpy().astype(bool)
+        present[positions] = cells['rows'].to_numpy() > 0
+        return SalesCube(dates.to_numpy(), months.reindex(dates).to_numpy(), stores.to_numpy(), depts.to_numpy(),
+                         sales, holiday, present, top_k=top_k)
+
+
+def cube_bytes(weeks, stores, depts):
+    # Float64 sales plus the boolean holiday and presence masks
+    return weeks * stores * depts * (8 + 1 + 1)
+
+
+class SalesCube:
+    # Dense sales cube indexed by week, store and dept with parallel holiday and presence masks; a filtered month is
+    # a slice of its weeks summed against store and dept selection vectors
+
+    def __init__(self, dates, months, stores, depts, sales, holiday, present, top_k=10):
+        self.top_k = top_k
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.stores = np.asarray(stores)
+        self.depts = np.asarray(depts)
+        self.store_labels = np.array(['Store {0}'.format(store) for store in stores], dtype=object)
+        self.dept_labels = np.array(['Dept {0}'.format(dept) for dept in depts], dtype=object)
+        self.sales = sales
+        self.holiday = holiday
+        self.present = present
+        self._month_weeks = {}
+        for position, month in enumerate(months):
+            first, _ = self._month_weeks.get(month, (position, position))
+            self._month_weeks[month] = (first, position + 1)
+
+    def __contains__(self, month):
+        return month in self._month_weeks
+
+    def nbytes(self):
+        return self.sales.nbytes + self.holiday.nbytes + self.present.nbytes
+
+    def selection(self, values, axis_values):
+        # 1.0 for the selected stores or depts, every one when nothing is selected
+        if not values:
+            return np.ones(len(axis_values))
+        return np.isin(axis_values, list(values)).astype(float)
+
+    def month_slice(self, month, stores=None, depts=None):
+        first, last = self._month_weeks[month]
+        store_mask = self.selection(stores, self.stores)
+        dept_mask = self.selection(depts, self.depts)
+        sales = self.sales[first:last]
+        present = self.present[first:last]
+
+        by_store_dept = sales.sum(axis=0)
+        present_store_dept = present.any(axis=0)
+        weekly = np.einsum('wsd,s,d->w', sales, store_mask, dept_mask)
+        holiday = np.einsum('wsd,s,d->', np.where(self.holiday[first:last], sales, 0.0), store_mask, dept_mask)
+        store_sales = by_store_dept @ dept_mask
+        dept_sales = store_mask @ by_store_dept
+        stores_present = (present_store_dept @ dept_mask > 0) & (store_mask > 0)
+        depts_present = (store_mask @ present_store_dept > 0) & (dept_mask > 0)
+        weeks_present = np.einsum('wsd,s,d->w', present, store_mask, dept_mask) > 0
+        return CubeSlice(month, self.dates[first:last][weeks_present], weekly[weeks_present], weekly.sum(), holiday,
+                         self.store_labels[stores_present], store_sales[stores_present],
+                         self.dept_labels[depts_present], dept_sales[depts_present], self.top_k)
+
+
+class CubeSlice:
+    # One filtered month with the same accessors the callbacks use on AggregateStore
+
+    def __init__(self, month, dates, weekly, total, holiday, store_labels, store_sales, dept_labels, dept_sales, top_k):
+        self.month = month
+        self.total_sales = round(float(total), 1)
+        self.holiday_sales = round(float(holiday), 1)
+        self.store_count = len(store_labels)
+        self.weekly_sales = pd.DataFrame({'Date': dates, 'Weekly_Sales': np.round(weekly, 1),
+                                          'Week_Number': np.arange(1, len(dates) + 1), 'Month': month})
+        store_sales = np.round(store_sales, 1)
+        order = np.argsort(-store_sales, kind='stable')[:top_k]
+        self.top_stores = pd.DataFrame({'Store': store_labels[order], 'Weekly_Sales': store_sales[order]})
+        self.dept_sales = pd.Series(np.round(dept_sales, 1), index=dept_labels)
+        order = np.argsort(-self.dept_sales.to_numpy(), kind='stable')[:top_k]
+        self.top_depts = pd.DataFrame({'Dept': dept_labels[order], 'Weekly_Sales': self.dept_sales.to_numpy()[order]})
+
+
+def slice_dept_difference(current, reference):
+    reference_sales = reference.dept_sales.reindex(current.top_depts['Dept']).to_numpy()
+    return pd.DataFrame({'Dept': current.top_depts['Dept'],
+                         'Difference': np.round(current.top_depts['Weekly_Sales'].to_numpy() - reference_sales, 1)})
@@ -0,0 +1,148 @@
+// Clientside callbacks used when the app runs with CLIENTSIDE=1, and the reload of the LAZY_STARTUP=1 loading page.
+// They draw the same figures as figures.py from the aggregates preloaded into the 'aggregate-store' component.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    retail: {
+        set_reference_options_and_value: function (current, version, store, reference) {
+            if (current === null || current === undefined || !store || !store.options[current]) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var options = store.options[current].map(function (month) {
+                return {'label': month, 'value': month};
+            });
+            // A new data version refreshes the options and keeps the chosen reference month while it still exists
+            var currentChanged = window.dash_clientside.callback_context.triggered.some(function (trigger) {
+                return trigger.prop_id === 'current.value';
+            });
+            if (!currentChanged && store.options[current].indexOf(reference) !== -1) {
+                return [options, window.dash_clientside.no_update];
+            }
+            return [options, options[0].label];
+        },
+
+        update_dashboard: function (current, reference, store) {
+            if (current === null || current === undefined || reference === null || reference === undefined ||
+                !store || !store.months[current] || !store.months[reference]) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var currentMonth = store.months[current];
+            var referenceMonth = store.months[reference];
+            var layouts = store.layouts;
+            return [
+                indicatorFigure(layouts, currentMonth.total, referenceMonth.total, true),
+                indicatorFigure(layouts, currentMonth.holiday, referenceMonth.holiday, true),
+                indicatorFigure(layouts, currentMonth.stores, referenceMonth.stores, false),
+                weeklyFigure(layouts, currentMonth, referenceMonth, current, reference),
+                'Sales Difference Between Top Departments (' + current + '-' + reference + ')',
+                deptDifferenceFigure(layouts, currentMonth, referenceMonth),
+                storeRankingFigure(layouts, currentMonth, current, 'cyan'),
+                storeRankingFigure(layouts, referenceMonth, reference, 'dodgerblue')
+            ];
+        },
+
+        // LAZY_STARTUP=1: the loading layout polls the readiness probe and reloads into the dashboard
+        reload_when_ready: function (n_intervals, url) {
+            fetch(url, {cache: 'no-store'}).then(function (response) {
+                if (response.ok) {
+                    window.location.reload();
+                }
+            }).catch(function () {});
+            return window.dash_clientside.no_update;
+        }
+    }
+});
+
+// Figure builders
+
+function indicatorFigure(layouts, value, reference, money) {
+    var indicator = {
+        'type': 'indicator',
+        'mode': 'number+delta',
+        'value': value,
+        'align': 'center',
+        'delta': {'reference': reference, 'relative': false, 'position': 'bottom'},
+        'domain': {'x': [0.15, 0.85], 'y': [0, 1]}
+    };
+    if (money) {
+        indicator.number = {'valueformat': '$.2f', 'suffix': 'M'};
+        indicator.delta.valueformat = '$.2f';
+        indicator.delta.suffix = 'M';
+    }
+    return {'data': [indicator], 'layout': layouts.card};
+}
+
+function weeklyLine(month, name, color) {
+    return {
+        'type': 'scatter',
+        'x': month.weeks,
+        'y': month.weekly,
+        'line': {'color': color, 'width': 3},
+        'name': name,
+        'text': month.weeks.map(function () { return name; }),
+        'hovertemplate': '<i><b>Week %{x}</b></i><br><i><b>Sales:</b> %{y}</i><br><extra></extra>'
+    };
+}
+
+function weeklyFigure(layouts, currentMonth, referenceMonth, current, reference) {
+    return {
+        'data': [weeklyLine(currentMonth, current, 'cyan'), weeklyLine(referenceMonth, reference, 'dodgerblue')],
+        'layout': layouts.line
+    };
+}
+
+function horizontalBar(values, labels, color, hoverLabel) {
+    return {
+        'type': 'bar',
+        'x': values,
+        'y': labels,
+        'marker': {'color': color},
+        'orientation': 'h',
+        'text': values,
+        'textposition': 'outside',
+        'textfont': {'family': 'Arial', 'size': 12, 'color': 'white'},
+        'hovertemplate': '<i><b>%{y}</b></i><br><i><b>' + hoverLabel + ':</b> %{x}</i><br><extra></extra>'
+    };
+}
+
+function roundHalfEven(value, digits) {
+    // Matches numpy.round, which the server side uses for the department differences
+    var scale = Math.pow(10, digits);
+    var scaled = value * scale;
+    var rounded = Math.round(scaled);
+    if (Math.abs(scaled % 1) === 0.5) {
+        rounded = 2 * Math.round(scaled / 2);
+    }
+    return rounded / scale;
+}
+
+function floatString(value) {
+    // Same text as '{}'.format(value) for the float ranges figures.py builds
+    return Number.isInteger(value) ? value.toFixed(1) : String(value);
+}
+
+function deptDifferenceFigure(layouts, currentMonth, referenceMonth) {
+    var labels = currentMonth.top_depts[0];
+    var difference = labels.map(function (label, position) {
+        var reference = referenceMonth.depts[label];
+        return reference === undefined ? null : roundHalfEven(currentMonth.top_depts[1][position] - reference, 1);
+    });
+    var known = difference.filter(function (value) { return value !== null; });
+    var layout = Object.assign({}, layouts.dept, {
+        'xaxis': Object.assign({}, layouts.dept.xaxis, {
+            'range': [floatString(Math.min.apply(null, known) - 3), floatString(Math.max.apply(null, known) + 3)]
+        })
+    });
+    return {'data': [horizontalBar(difference, labels, 'lightsteelblue', 'Sales Diff')], 'layout': layout};
+}
+
+function storeRankingFigure(layouts, month, name, color) {
+    var bar = horizontalBar(month.top_stores[1], month.top_stores[0], color, 'Sales');
+    bar.name = name;
+    var layout = Object.assign({}, layouts.store, {
+        'xaxis': Object.assign({}, layouts.store.xaxis, {
+            'range': [0, floatString(Math.max.apply(null, month.top_stores[1]) + 2.75)]
+        }),
+        'title': Object.assign({}, layouts.store.title, {'text': name})
+    });
+    return {'data': [bar], 'layout': layout};
+}
@@ -0,0 +1,308 @@
+# Importing Required Libraries
+
+import glob
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregates import SalesBackend, ranked
+from data_source import iter_csv_chunks, read_appended_rows, source_fingerprint
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Backend Settings
+
+ENGINES = {'sqlite': '.sqlite', 'duckdb': '.duckdb'}
+
+LOAD_CHUNKSIZE = 100000
+
+SCHEMA = [
+    'CREATE TABLE months (id INTEGER PRIMARY KEY, month TEXT, label TEXT)',
+    'CREATE TABLE sales (month_id INTEGER, Date TEXT, Store INTEGER, Dept INTEGER, Weekly_Sales DOUBLE, '
+    'IsHoliday INTEGER)',
+    'CREATE TABLE source (source_offset BIGINT)'
+]
+
+SUMMARY_QUERY = ('SELECT SUM(Weekly_Sales), SUM(CASE WHEN IsHoliday = 1 THEN Weekly_Sales ELSE 0 END), '
+                 'COUNT(DISTINCT Store), COUNT(DISTINCT Dept) FROM sales WHERE month_id = ?{0}')
+
+# Covering indexes, so every month query reads one index range and never the table; DuckDB scans its columns
+# with min/max zone maps instead, which prune well because rows are inserted month by month
+SQLITE_INDEXES = [
+    'CREATE INDEX sales_month_store ON sales (month_id, Store, Dept, IsHoliday, Weekly_Sales)',
+    'CREATE INDEX sales_month_dept ON sales (month_id, Dept, Weekly_Sales)',
+    'CREATE INDEX sales_month_date ON sales (month_id, Date, Weekly_Sales)'
+]
+
+
+# Database Files
+
+def default_database_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '.sales_db')
+
+
+def connect(engine, path, read_only=False):
+    if engine == 'duckdb':
+        if duckdb is None:
+            raise RuntimeError('DATA_BACKEND=duckdb needs the duckdb package')
+        return duckdb.connect(path, read_only=read_only)
+    # Autocommit; add() opens its own write transaction
+    return sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+
+
+def month_rows(dataframe, month_ids):
+    # New (month, Month) keys get the next ids in order of appearance, which is the order of the month dropdown
+    new_months = []
+    for month, label in dataframe[['month', 'Month']].drop_duplicates().itertuples(index=False):
+        if label not in month_ids:
+            month_ids[label] = len(month_ids) + 1
+            new_months.append((month_ids[label], str(month), str(label)))
+    return new_months
+
+
+def sales_frame(dataframe, month_ids):
+    return pd.DataFrame({
+        'month_id': dataframe['Month'].map(month_ids).to_numpy(dtype=np.int64),
+        'Date': np.datetime_as_string(dataframe['Date'].to_numpy(dtype='datetime64[D]'), unit='D'),
+        'Store': dataframe['Store'].to_numpy(dtype=np.int64),
+        'Dept': dataframe['Dept'].to_numpy(dtype=np.int64),
+        'Weekly_Sales': dataframe['Weekly_Sales'].to_numpy(dtype=float),
+        'IsHoliday': (dataframe['IsHoliday'] == True).to_numpy(dtype=np.int64)
+    })
+
+
+def insert_rows(engine, connection, dataframe, month_ids):
+    new_months = month_rows(dataframe, month_ids)
+    if new_months:
+        connection.executemany('INSERT INTO months VALUES (?, ?, ?)', new_months)
+    rows = sales_frame(dataframe, month_ids)
+    if engine == 'duckdb':
+        connection.register('new_rows', rows)
+        connection.execute('INSERT INTO sales SELECT * FROM new_rows')
+        connection.unregister('new_rows')
+    else:
+        connection.executemany('INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?)',
+                               zip(*(rows[column].tolist() for column in rows.columns)))
+
+
+def build_database(engine, source_path, path, chunksize=LOAD_CHUNKSIZE):
+    # Written to a temporary file and renamed, so a worker never opens a half-built database
+    source_offset = os.path.getsize(source_path)
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix=ENGINES[engine])
+    os.close(temp_fd)
+    os.remove(temp_path)
+    try:
+        connection = connect(engine, temp_path)
+        try:
+            if engine == 'sqlite':
+                connection.execute('PRAGMA journal_mode=OFF')
+                connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('BEGIN')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            month_ids = {}
+            for chunk in iter_csv_chunks(source_path, chunksize):
+                insert_rows(engine, connection, chunk, month_ids)
+            connection.execute('INSERT INTO source VALUES (?)', [source_offset])
+            if engine == 'sqlite':
+                for statement in SQLITE_INDEXES:
+                    connection.execute(statement)
+            connection.execute('COMMIT')
+            if engine == 'sqlite':
+                # Readers in other workers keep reading while the refresh thread appends
+                connection.execute('PRAGMA journal_mode=WAL')
+        finally:
+            connection.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def open_backend(engine, source_path, database_dir=None, top_k=10):
+    # One database file per source fingerprint, built on first use and shared by every worker and restart. Files
+    # are named after the source and a hash of its absolute path, so several sources can share the directory, even
+    # sources with the same file name in different folders
+    if engine not in ENGINES:
+        raise ValueError('Unknown data backend {0!r}, expected pandas or one of {1}'.format(engine, ', '.join(ENGINES)))
+    database_dir = database_dir or default_database_dir(source_path)
+    os.makedirs(database_dir, exist_ok=True)
+    name = '{0}-{1}'.format(os.path.splitext(os.path.basename(source_path))[0],
+                            hashlib.sha1(os.path.abspath(source_path).encode()).hexdigest()[:8])
+    fingerprint = source_fingerprint(source_path)
+    path = os.path.join(database_dir, '{0}-{1}{2}'.format(name, fingerprint, ENGINES[engine]))
+    if not os.path.exists(path):
+        build_database(engine, source_path, path)
+        pattern = '{0}-{1}{2}*'.format(glob.escape(name), '?' * len(fingerprint), ENGINES[engine])
+        for stale in glob.glob(os.path.join(database_dir, pattern)):
+            if not stale.startswith(path):
+                os.remove(stale)
+    return SQLBackend(engine, path, top_k=top_k)
+
+
+# SQL Backend
+
+class DatabaseConnection:
+    # One connection per process, shared by every view of the database file. Each process opens its own, since
+    # neither SQLite nor DuckDB connections survive a fork
+
+    def __init__(self, engine, path):
+        self.engine = engine
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def get(self):
+        if self._pid != os.getpid():
+            # DuckDB allows many processes on one file only if none of them writes
+            self._connection = connect(self.engine, self.path, read_only=self.engine == 'duckdb')
+            self._pid = os.getpid()
+        return self._connection
+
+
+def read_view(connection):
+    # The source offset, last sales row and months of one consistent state of the file; called in a transaction
+    source_offset = connection.execute('SELECT MAX(source_offset) FROM source').fetchone()[0]
+    last_rowid = connection.execute('SELECT COALESCE(MAX(rowid), 0) FROM sales').fetchone()[0]
+    months = connection.execute('SELECT id, label FROM months ORDER BY id').fetchall()
+    return source_offset, last_rowid, {label: month_id for month_id, label in months}
+
+
+class SQLBackend(SalesBackend):
+    # Answers every month query with SQL on the database file; only query results are held in memory. A backend is
+    # a view of the rows up to `last_rowid`, which cover the source up to `offset`: add() answers a new view with
+    # the new rows, so a published snapshot, its months and its cached summaries never change under a request,
+    # whatever this or another worker inserts later
+
+    def __init__(self, engine, path, top_k=10, database=None, view=None):
+        self.engine = engine
+        self.path = path
+        self.top_k = top_k
+        self.database = database or DatabaseConnection(engine, path)
+        self._summaries = {}
+        if view is None:
+            with self.database.lock:
+                connection = self.database.get()
+                connection.execute('BEGIN')
+                try:
+                    view = read_view(connection)
+                finally:
+                    connection.execute('COMMIT')
+        self.offset, self.last_rowid, self._month_ids = view
+
+    def query(self, sql, parameters=()):
+        with self.database.lock:
+            return self.database.get().execute(sql, parameters).fetchall()
+
+    def month_query(self, sql, month):
+        # Month queries read only the rows of this view. Until rows are added after it, that is the whole table,
+        # which is read without the rowid filter in the same read transaction
+        with self.database.lock:
+            connection = self.database.get()
+            connection.execute('BEGIN')
+            try:
+                if connection.execute('SELECT MAX(rowid) FROM sales').fetchone()[0] == self.last_rowid:
+                    return connection.execute(sql.format(''), [self._month_ids[month]]).fetchall()
+                return connection.execute(sql.format(' AND rowid <= ?'),
+                                          [self._month_ids[month], self.last_rowid]).fetchall()
+            finally:
+                connection.execute('COMMIT')
+
+    def months(self):
+        return list(self._month_ids)
+
+    def source_offset(self):
+        return self.offset
+
+    def nbytes(self):
+        return os.path.getsize(self.path)
+
+    def add(self, dataframe, source_offset=None, start_offset=None, source_path=None):
+        # dataframe holds the rows of source_path between start_offset and source_offset. Another worker sharing
+        # the file may already have inserted some of them: only the rows after the stored offset are inserted, read
+        # again from the source if the batch starts before it. The new view holds every stored row, so its offset
+        # is past source_offset when another worker already inserted rows beyond it
+        if self.engine == 'duckdb':
+            raise RuntimeError('Incremental refresh needs DATA_BACKEND=sqlite or pandas')
+        with self.database.lock:
+            connection = self.database.get()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                stored_offset = connection.execute('SELECT MAX(source_offset) FROM source').fetchone()[0]
+                rows = dataframe
+                if source_offset is not None and source_offset <= stored_offset:
+                    rows = None
+                elif source_offset is not None and start_offset is not None and start_offset < stored_offset:
+                    if source_path is None:
+                        raise ValueError('A batch that overlaps the stored rows needs its source_path')
+                    rows = read_appended_rows(source_path, stored_offset, end=source_offset)[0]
+                if rows is not None:
+                    month_ids = dict(connection.execute('SELECT label, id FROM months').fetchall())
+                    insert_rows(self.engine, connection, rows, month_ids)
+                if source_offset is not None and source_offset > stored_offset:
+                    connection.execute('UPDATE source SET source_offset = ?', [source_offset])
+                view = read_view(connection)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return SQLBackend(self.engine, self.path, top_k=self.top_k, database=self.database, view=view)
+
+    def __contains__(self, month):
+        return month in self._month_ids
+
+    def summary(self, month):
+        # Totals and distinct counts come from one scan and are kept with the view
+        summary = self._summaries.get(month)
+        if summary is None:
+            summary = self.month_query(SUMMARY_QUERY, month)[0]
+            self._summaries[month] = summary
+        return summary
+
+    def total_sales(self, month):
+        return round(float(self.summary(month)[0]), 1)
+
+    def holiday_sales(self, month):
+        return round(float(self.summary(month)[1]), 1)
+
+    def store_count(self, month):
+        return self.summary(month)[2]
+
+    def dept_count(self, month):
+        return self.summary(month)[3]
+
+    def weekly_sales(self, month):
+        rows = self.month_query('SELECT Date, SUM(Weekly_Sales) FROM sales WHERE month_id = ?{0} '
+                                'GROUP BY Date ORDER BY Date', month)
+        dates, sales = zip(*rows)
+        return pd.DataFrame({'Month': month, 'Date': pd.to_datetime(dates),
+                             'Weekly_Sales': np.round(np.asarray(sales, dtype=float), 1),
+                             'Week_Number': np.arange(1, len(rows) + 1)})
+
+    def top_stores(self, month):
+        # Every store is fetched and ranked like AggregateStore does, so ties are ordered the same way
+        rows = self.month_query('SELECT Store, SUM(Weekly_Sales) FROM sales WHERE month_id = ?{0} '
+                                'GROUP BY Store ORDER BY Store', month)
+        stores, sales = zip(*rows)
+        return ranked(pd.DataFrame({'Store': ['Store {0}'.format(store) for store in stores],
+                                    'Weekly_Sales': np.round(np.asarray(sales, dtype=float), 1)}), self.top_k)
+
+    def dept_sales(self, month):
+        rows = self.month_query('SELECT Dept, SUM(Weekly_Sales) FROM sales WHERE month_id = ?{0} '
+                                'GROUP BY Dept ORDER BY Dept', month)
+        depts, sales = zip(*rows)
+        return pd.Series(np.round(np.asarray(sales, dtype=float), 1), name='Weekly_Sales',
+                         index=pd.Index(['Dept {0}'.format(dept) for dept in depts], name='Dept'))
+
+    def top_depts(self, month):
+        return ranked(self.dept_sales(month).reset_index(), self.top_k)
@@ -0,0 +1,115 @@
+# Backend Benchmark: startup time, resident memory and query latency of the pandas and the database backends
+#
+# Usage: python -m benchmarks.backend_benchmark [--source path/to/sales.csv] [--backends pandas sqlite duckdb]
+#                                               [--years 3] [--number 3]
+#
+# Without --source synthetic data is written for --years years. Every backend is started twice, each time in a
+# fresh process: the first start builds the database file, the second opens it like a restarted or forked worker
+# would, and its memory and query latency are reported. The pandas backend drops the raw rows once the aggregates
+# are built, as in AGGREGATES_ONLY mode. An interaction runs the queries of one dashboard update, and the answers
+# of every backend must agree with the pandas backend.
+
+import argparse
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+from benchmarks.synthetic_data import write_sales_csv
+from memory_usage import format_bytes, resident_memory
+
+
+def open_sales_backend(name, source, database_dir):
+    if name != 'pandas':
+        from backends import open_backend
+        backend = open_backend(name, source, database_dir=database_dir)
+        return backend, backend.months()
+
+    from aggregates import AggregateStore, count_data, dept_data, monthly_data, store_data, weekly_data
+    from data_source import read_csv_source
+    data = read_csv_source(source)
+    backend = AggregateStore(monthly_data(data), weekly_data(data), store_data(data), dept_data(data),
+                             count_data(data))
+    months = list(data['Month'].unique())
+    del data
+    gc.collect()
+    return backend, months
+
+
+def interaction(backend, current, reference):
+    # The queries update_dashboard runs for one pair of months
+    return (backend.total_sales(current), backend.total_sales(reference),
+            backend.holiday_sales(current), backend.holiday_sales(reference),
+            backend.store_count(current), backend.store_count(reference),
+            backend.weekly_sales(current)['Weekly_Sales'].tolist(),
+            backend.weekly_sales(reference)['Weekly_Sales'].tolist(),
+            backend.dept_difference(current, reference)['Difference'].tolist(),
+            backend.top_stores(current)['Weekly_Sales'].tolist(),
+            backend.top_stores(reference)['Weekly_Sales'].tolist())
+
+
+def run_backend(name, source, database_dir, number):
+    import pandas
+    # Memory is counted from here, after the libraries every backend needs are imported
+    baseline = resident_memory()
+    start = time.perf_counter()
+    backend, months = open_sales_backend(name, source, database_dir)
+    startup = time.perf_counter() - start
+
+    pairs = list(zip(months, months[1:] + months[:1]))
+    answers = [interaction(backend, current, reference) for current, reference in pairs]
+    timings = []
+    for _ in range(number):
+        for current, reference in pairs:
+            start = time.perf_counter()
+            interaction(backend, current, reference)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    memory = resident_memory()
+    return {'startup': startup, 'memory': memory - baseline, 'rss': memory,
+            'median': percentile(timings, 0.5), 'p95': percentile(timings, 0.95),
+            'size': backend.nbytes() if name != 'pandas' else None, 'answers': answers}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source')
+    parser.add_argument('--backends', nargs='+', default=['pandas', 'sqlite'])
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--number', type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='retail-backends-')
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(work_dir, 'synthetic_sales.csv')
+            rows = write_sales_csv(source, years=args.years)
+            print('synthetic data: {0} rows, {1}'.format(rows, format_bytes(os.path.getsize(source))))
+        database_dir = os.path.join(work_dir, 'databases')
+
+        context = multiprocessing.get_context('spawn')
+        builds, results = {}, {}
+        for name in args.backends:
+            for runs in (builds, results):
+                with context.Pool(1) as pool:
+                    runs[name] = pool.apply(run_backend, (name, source, database_dir, args.number))
+
+        print('{0:<8} {1:>10} {2:>10} {3:>12} {4:>12} {5:>12} {6:>12} {7:>12}'.format(
+            'backend', 'build', 'startup', 'memory', 'rss', 'file', 'median', 'p95'))
+        for name, result in results.items():
+            print('{0:<8} {1:>9.2f}s {2:>9.2f}s {3:>12} {4:>12} {5:>12} {6:>10.2f}ms {7:>10.2f}ms'.format(
+                name, builds[name]['startup'], result['startup'], format_bytes(result['memory']),
+                format_bytes(result['rss']), format_bytes(result['size']) if result['size'] else '-',
+                result['median'] * 1000, result['p95'] * 1000))
+            if 'pandas' in results:
+                assert result['answers'] == results['pandas']['answers'], name
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
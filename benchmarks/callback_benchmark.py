@@ -0,0 +1,82 @@
+# Callback Benchmark: requests per dropdown interaction and end-to-end update latency
+#
+# Usage: RETAIL_SALES_SOURCE=path/to/retail_sales.csv python -m benchmarks.callback_benchmark [--interactions 20]
+#
+# Every interaction selects a new current month and replays the update requests the Dash renderer
+# sends for it against the Flask test client. The figure cache is off unless FIGURE_CACHE_SIZE is set,
+# so the latency covers the full computation.
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault('FIGURE_CACHE_SIZE', '0')
+
+TRIGGERS = ('current.value', 'reference.value')
+
+
+def callback_payload(output, spec, values, changed):
+    outputs = spec['output']
+    if isinstance(outputs, (list, tuple)):
+        outputs = [{'id': item.component_id, 'property': item.component_property} for item in outputs]
+    else:
+        outputs = {'id': outputs.component_id, 'property': outputs.component_property}
+    inputs = [{'id': item['id'], 'property': item['property'],
+               'value': values['{0}.{1}'.format(item['id'], item['property'])]} for item in spec['inputs']]
+    # States the interaction does not set, like the page's dataset, are sent empty
+    state = [{'id': item['id'], 'property': item['property'],
+              'value': values.get('{0}.{1}'.format(item['id'], item['property']))} for item in spec['state']]
+    return {'output': output, 'outputs': outputs, 'inputs': inputs, 'state': state, 'changedPropIds': changed}
+
+
+def interaction_callbacks(app):
+    # The reference dropdown callback runs first, everything fed by the two month dropdowns follows it.
+    # Clientside callbacks run in the browser and send no request.
+    callbacks = []
+    for output, spec in app.callback_map.items():
+        if 'callback' not in spec:
+            continue
+        triggers = ['{0}.{1}'.format(item['id'], item['property']) for item in spec['inputs']]
+        if any(trigger in TRIGGERS for trigger in triggers):
+            callbacks.append((output, spec, triggers))
+    return sorted(callbacks, key=lambda item: 'reference.value' in item[2])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interactions', type=int, default=20)
+    args = parser.parse_args()
+
+    import Application
+    Application.startup_ready.wait()
+
+    client = Application.app.server.test_client()
+    callbacks = interaction_callbacks(Application.app)
+    months = list(Application.snapshots.current.options.keys())
+
+    latencies = []
+    response_bytes = 0
+    for position in range(args.interactions):
+        current = months[position % len(months)]
+        values = {'current.value': current, 'reference.value': Application.snapshots.current.options[current][0],
+                  'data-version.data': Application.snapshots.current.version}
+        start = time.perf_counter()
+        for output, spec, triggers in callbacks:
+            changed = [trigger for trigger in triggers if trigger in TRIGGERS]
+            response = client.post('/_dash-update-component',
+                                   data=json.dumps(callback_payload(output, spec, values, changed)),
+                                   content_type='application/json')
+            assert response.status_code == 200, response.status_code
+            response_bytes += len(response.data)
+        latencies.append(time.perf_counter() - start)
+
+    print('requests per interaction   {0}'.format(len(callbacks)))
+    print('bytes per interaction      {0:.0f}'.format(response_bytes / args.interactions))
+    print('mean latency               {0:.1f}ms'.format(statistics.mean(latencies) * 1000))
+    print('median latency             {0:.1f}ms'.format(statistics.median(latencies) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# Compact Schema Benchmark: memory and groupby time of the default dtypes against the compact schema
+#
+# Usage: python -m benchmarks.compact_benchmark path/to/retail_sales.csv
+
+import argparse
+import time
+import tracemalloc
+
+from aggregates import count_data, dept_data, monthly_data, store_data, weekly_data
+from data_source import compact_frame, read_csv_source
+
+
+def aggregate(data):
+    return monthly_data(data), weekly_data(data), store_data(data), dept_data(data), count_data(data)
+
+
+def measure(data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        aggregate(data)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    aggregate(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return data.memory_usage(deep=True).sum(), peak, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = read_csv_source(args.source)
+    schemas = [('default dtypes', data),
+               ('compact', compact_frame(data)),
+               ('compact + float32', compact_frame(data, float32=True))]
+    print('{0:<20} {1:>12} {2:>16} {3:>10}'.format('schema', 'frame', 'groupby peak', 'groupby'))
+    for name, frame in schemas:
+        resident, peak, elapsed = measure(frame, args.repeat)
+        print('{0:<20} {1:>9.1f} MB {2:>13.1f} MB {3:>9.3f}s'.format(name, resident / 1024 / 1024,
+                                                                    peak / 1024 / 1024, elapsed))
+
+
+if __name__ == '__main__':
+    main()
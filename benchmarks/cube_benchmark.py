@@ -0,0 +1,80 @@
+# Cube Benchmark: filtered month lookups on the store-dept sales cube against filtering and grouping the rows
+#
+# Usage: python -m benchmarks.cube_benchmark [--source path/to/sales.csv] [--number 50]
+#
+# Without --source the synthetic data is used. For every store and dept selection both paths answer the same
+# requests (totals, holiday totals, store count, weekly series, top stores and top departments) and must agree.
+
+import argparse
+import time
+
+import numpy as np
+
+from aggregates import StoreDeptSales, cube_bytes
+from benchmarks.synthetic_data import generate_sales
+from data_source import read_csv_source
+from memory_usage import format_bytes
+
+
+def pandas_lookup(dataframe, month, stores, depts, top_k):
+    rows = dataframe[dataframe['Month'] == month]
+    if stores:
+        rows = rows[rows['Store'].isin(stores)]
+    if depts:
+        rows = rows[rows['Dept'].isin(depts)]
+    sales = rows['Weekly_Sales']
+    store_sales = sales.groupby(rows['Store']).sum().round(1).sort_values(ascending=False, kind='stable')[:top_k]
+    dept_sales = sales.groupby(rows['Dept']).sum().round(1).sort_values(ascending=False, kind='stable')[:top_k]
+    return (round(sales.sum(), 1), round(sales[rows['IsHoliday'] == True].sum(), 1), rows['Store'].nunique(),
+            sales.groupby(rows['Date']).sum().round(1).to_numpy(), store_sales.to_numpy(), dept_sales.to_numpy())
+
+
+def cube_lookup(cube, month, stores, depts):
+    piece = cube.month_slice(month, stores, depts)
+    return (piece.total_sales, piece.holiday_sales, piece.store_count, piece.weekly_sales['Weekly_Sales'].to_numpy(),
+            piece.top_stores['Weekly_Sales'].to_numpy(), piece.top_depts['Weekly_Sales'].to_numpy())
+
+
+def per_call(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source')
+    parser.add_argument('--number', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    dataframe = read_csv_source(args.source) if args.source else generate_sales()
+    start = time.perf_counter()
+    store_dept_sales = StoreDeptSales()
+    store_dept_sales.add(dataframe)
+    cube = store_dept_sales.cube(top_k=args.top_k)
+    print('rows {0}, cube built in {1:.3f}s, {2} (estimate {3})'.format(
+        len(dataframe), time.perf_counter() - start, format_bytes(cube.nbytes()),
+        format_bytes(cube_bytes(len(cube.dates), len(cube.stores), len(cube.depts)))))
+
+    month = dataframe['Month'].iloc[len(dataframe) // 2]
+    stores, depts = [int(store) for store in cube.stores], [int(dept) for dept in cube.depts]
+    selections = [('all', [], []), ('1 store', stores[:1], []), ('5 stores', stores[:5], []),
+                  ('1 dept', [], depts[:1]), ('10 depts', [], depts[:10]), ('5 stores, 10 depts', stores[:5], depts[:10])]
+
+    print('{0:<20} {1:>20} {2:>12} {3:>12} {4:>9}'.format('selection', 'month', 'pandas', 'cube', 'speedup'))
+    for name, selected_stores, selected_depts in selections:
+        expected = pandas_lookup(dataframe, month, selected_stores, selected_depts, args.top_k)
+        actual = cube_lookup(cube, month, selected_stores, selected_depts)
+        for expected_value, actual_value in zip(expected, actual):
+            assert np.allclose(expected_value, actual_value), name
+        slow = per_call(lambda: pandas_lookup(dataframe, month, selected_stores, selected_depts, args.top_k),
+                        args.number)
+        fast = per_call(lambda: cube_lookup(cube, month, selected_stores, selected_depts), args.number)
+        print('{0:<20} {1:>20} {2:>10.2f}ms {3:>10.2f}ms {4:>8.1f}x'.format(
+            name, month, slow * 1000, fast * 1000, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
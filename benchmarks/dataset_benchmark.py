@@ -0,0 +1,96 @@
+# Dataset Benchmark: hit rate, load time and footprint of the dataset registry under different memory budgets
+#
+# Usage: python -m benchmarks.dataset_benchmark [--datasets 6] [--years 1] [--requests 300] [--skew 1.2]
+#                                               [--fractions 0.8 0.6 0.4]
+#
+# Writes --datasets synthetic sources and replays --requests dashboard updates whose dataset is drawn from a Zipf
+# distribution, like a few busy banners and a long tail. The first run has no budget and measures the footprint
+# of all datasets; the following runs get --fractions of it as DATASET_MEMORY_BUDGET. Every run starts with only
+# the default dataset loaded, as after a restart.
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+from benchmarks.synthetic_data import write_sales_csv
+from memory_usage import format_bytes, resident_memory
+
+
+def replay(Application, registry, names, months, requests, skew, seed=0):
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(names))]
+    latencies = []
+    peak = 0
+    for _ in range(requests):
+        name = generator.choices(names, weights)[0]
+        current, reference = generator.sample(months, 2)
+        start = time.perf_counter()
+        with Application.snapshots.pinned(registry.get(name)):
+            Application.update_dashboard(current, reference)
+        latencies.append(time.perf_counter() - start)
+        peak = max(peak, registry.loaded_bytes())
+    latencies.sort()
+    return latencies, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasets', type=int, default=6)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--skew', type=float, default=1.2)
+    parser.add_argument('--fractions', type=float, nargs='+', default=[0.8, 0.6, 0.4])
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-datasets-')
+    try:
+        paths = {}
+        for seed in range(args.datasets):
+            paths['banner-{0}'.format(seed)] = os.path.join(data_dir, 'banner-{0}.csv'.format(seed))
+            write_sales_csv(paths['banner-{0}'.format(seed)], years=args.years, seed=seed)
+        os.environ['RETAIL_SALES_DATASETS'] = ','.join('{0}={1}'.format(name, path) for name, path in paths.items())
+
+        import Application
+        from datasets import DatasetRegistry
+        Application.startup_ready.wait()
+        names = list(paths)
+        months = list(Application.snapshots.current.options)
+        default_seconds = Application.startup_seconds
+
+        total = None
+        print('{0:<10} {1:>10} {2:>9} {3:>7} {4:>10} {5:>10} {6:>10} {7:>10}'.format(
+            'budget', 'peak', 'hit rate', 'loads', 'evictions', 'p50', 'p95', 'rss'))
+        for fraction in [None] + args.fractions:
+            budget = 0 if fraction is None else total * fraction
+            registry = DatasetRegistry(paths, Application.build_snapshot, budget=budget)
+            registry.attach(names[0], Application.snapshots, load_seconds=default_seconds)
+            latencies, peak = replay(Application, registry, names, months, args.requests, args.skew)
+            stats = registry.stats()['datasets']
+            hits = sum(item['hits'] for item in stats.values())
+            misses = sum(item['misses'] for item in stats.values())
+            if fraction is None:
+                total = peak
+            print('{0:<10} {1:>10} {2:>9.1%} {3:>7} {4:>10} {5:>8.1f}ms {6:>8.1f}ms {7:>10}'.format(
+                'none' if fraction is None else '{0:.0%}'.format(fraction), format_bytes(peak),
+                hits / (hits + misses), sum(item['loads'] for item in stats.values()),
+                sum(item['evictions'] for item in stats.values()), percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.95) * 1000, format_bytes(resident_memory())))
+
+        print()
+        print('{0:<10} {1:>10} {2:>7} {3:>9} {4:>12} {5:>10}'.format(
+            'dataset', 'bytes', 'loads', 'hit rate', 'load time', 'evictions'))
+        for name, item in stats.items():
+            print('{0:<10} {1:>10} {2:>7} {3:>9} {4:>11.2f}s {5:>10}'.format(
+                name, format_bytes(item['bytes']), item['loads'],
+                '-' if item['hit_rate'] is None else '{0:.1%}'.format(item['hit_rate']),
+                item['load_seconds'] / max(item['loads'], 1), item['evictions']))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# Export Benchmark: memory of the streamed exports, and dashboard latency while exports download
+#
+# Usage: python -m benchmarks.export_benchmark [--source path/to/sales.csv] [--years 3] [--exporters 2]
+#                                              [--sessions 4] [--interactions 100]
+#
+# First every all-months export is encoded in this process twice: streamed chunk by chunk like the /export routes
+# do, and materialized as one DataFrame and one file, and the peak of the memory traced meanwhile is reported.
+# Then the app is served in a child process and the load test sessions are run alone and next to --exporters
+# threads that download all-months exports in a loop, on synthetic data unless --source is given.
+
+import argparse
+import http.client
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.load_test import free_port, run_sessions, serve, server_callbacks, wait_until_ready
+from benchmarks.synthetic_data import write_sales_csv
+
+ENCODINGS = ('csv', 'parquet')
+
+
+def traced(func):
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        return result, elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def streamed(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+def materialized(frames, encoding):
+    frame = pd.concat(list(frames), ignore_index=True)
+    buffer = io.BytesIO()
+    if encoding == 'csv':
+        frame.to_csv(buffer, index=False, date_format='%Y-%m-%d')
+    else:
+        frame.to_parquet(buffer, index=False)
+    return len(buffer.getvalue())
+
+
+def memory_report(backend, months, encodings):
+    from export import EXPORT_TABLES, csv_chunks, export_frames, parquet_chunks
+    print('{0:<16} {1:<8} {2:>10} {3:>10} {4:>14} {5:>14}'.format(
+        'table', 'format', 'size', 'seconds', 'streamed peak', 'whole peak'))
+    for table in EXPORT_TABLES:
+        for encoding in encodings:
+            encode = csv_chunks if encoding == 'csv' else parquet_chunks
+            # Untraced first pass, so the peaks leave out the caches pandas and pyarrow fill on first use
+            streamed(encode(export_frames(backend, table, months)))
+            materialized(export_frames(backend, table, months), encoding)
+            size, elapsed, stream_peak = traced(lambda: streamed(encode(export_frames(backend, table, months))))
+            _, _, whole_peak = traced(lambda: materialized(export_frames(backend, table, months), encoding))
+            print('{0:<16} {1:<8} {2:>9.0f}K {3:>9.3f}s {4:>13.0f}K {5:>13.0f}K'.format(
+                table, encoding, size / 1024, elapsed, stream_peak / 1024, whole_peak / 1024))
+
+
+class Exporter(threading.Thread):
+    # Downloads every all-months export in turn until stopped, reading the response in small pieces
+
+    def __init__(self, host, port, encodings):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.encodings = encodings
+        self.downloads = 0
+        self.refused = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        from export import EXPORT_TABLES
+        paths = ['/export/{0}.{1}'.format(table, encoding) for table in EXPORT_TABLES for encoding in self.encodings]
+        while not self.stopped.is_set():
+            for path in paths:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                try:
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    while response.read(16384):
+                        pass
+                    if response.status == 200:
+                        self.downloads += 1
+                    else:
+                        self.refused += 1
+                finally:
+                    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--exporters', type=int, default=2)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--interactions', type=int, default=100)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    from export import pq
+    encodings = ENCODINGS if pq is not None else ('csv',)
+
+    data_dir = tempfile.mkdtemp(prefix='retail-export-')
+    server = None
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(data_dir, 'synthetic_sales.csv')
+            write_sales_csv(source, years=args.years)
+        os.environ['RETAIL_SALES_SOURCE'] = source
+
+        host, port = '127.0.0.1', free_port('127.0.0.1')
+        server = multiprocessing.Process(target=serve, args=(source, host, port), daemon=True)
+        server.start()
+        wait_until_ready(host, port, server, args.startup_timeout)
+
+        import Application
+        Application.startup_ready.wait()
+        state = Application.snapshots.current
+        memory_report(state.backend, list(state.options), encodings)
+        print()
+
+        callbacks = server_callbacks(Application.app)
+        months = list(state.options.keys())
+        reports = {'alone': run_sessions(host, port, callbacks, months, args.sessions, args.interactions)}
+        exporters = [Exporter(host, port, encodings) for _ in range(args.exporters)]
+        for exporter in exporters:
+            exporter.start()
+        reports['exporting'] = run_sessions(host, port, callbacks, months, args.sessions, args.interactions)
+        for exporter in exporters:
+            exporter.stopped.set()
+        for exporter in exporters:
+            exporter.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print('{0:<10} {1:<10} {2:>9} {3:>10} {4:>10} {5:>10} {6:>7}'.format(
+        'run', 'callback', 'requests', 'p50', 'p95', 'p99', 'errors'))
+    for run, report in reports.items():
+        for name, stats in report['callbacks'].items():
+            print('{0:<10} {1:<10} {2:>9} {3:>8.1f}ms {4:>8.1f}ms {5:>8.1f}ms {6:>7}'.format(
+                run, name, stats['requests'], stats['p50'] * 1000, stats['p95'] * 1000, stats['p99'] * 1000,
+                report['errors']))
+    print('exports downloaded meanwhile: {0}, refused with 429: {1}'.format(
+        sum(exporter.downloads for exporter in exporters), sum(exporter.refused for exporter in exporters)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Figure Benchmark: plain-dict figure builders against validated plotly figures, per chart type
+#
+# Usage: RETAIL_SALES_SOURCE=path/to/retail_sales.csv python -m benchmarks.figure_benchmark [--number 200]
+#
+# The validated path passes the same figure through go.Figure, which is what constructing the figure with
+# add_trace and update_layout costs. Both paths must serialize to the same JSON.
+
+import argparse
+import json
+import timeit
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from figures import dept_difference_figure, indicator_figure, store_ranking_figure, weekly_figure
+
+
+def validated(figure):
+    return go.Figure(figure)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    import Application
+    Application.startup_ready.wait()
+
+    store = Application.snapshots.current.backend
+    current, reference = list(Application.snapshots.current.options.keys())[:2]
+    charts = {
+        'indicator': lambda: indicator_figure(store.total_sales(current), store.total_sales(reference), money=True),
+        'line': lambda: weekly_figure(store.weekly_sales(current), store.weekly_sales(reference), current, reference),
+        'dept bar': lambda: dept_difference_figure(store.dept_difference(current, reference)),
+        'store bar': lambda: store_ranking_figure(store.top_stores(current), current, 'cyan')
+    }
+
+    print('{0:<10} {1:>12} {2:>12} {3:>9}'.format('chart', 'plain dict', 'validated', 'speedup'))
+    for name, build in charts.items():
+        figure = build()
+        assert json.loads(pio.to_json(figure, validate=False)) == json.loads(pio.to_json(validated(figure))), name
+        fast = timeit.timeit(build, number=args.number) / args.number
+        slow = timeit.timeit(lambda: validated(build()), number=args.number) / args.number
+        print('{0:<10} {1:>10.1f}us {2:>10.1f}us {3:>8.1f}x'.format(name, fast * 1e6, slow * 1e6, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# Load Test: concurrent dropdown sessions against /_dash-update-component, with throughput and latency percentiles
+#
+# Usage: python -m benchmarks.load_test [--sessions 16] [--interactions 50] [--source path/to/sales.csv]
+#                                       [--url http://127.0.0.1:8050] [--output load_results.json]
+#
+# Without --url the app is booted in a child process on a local werkzeug server, on synthetic data unless
+# --source is given, so the test runs offline. Every simulated session keeps one connection open and replays
+# dropdown changes the way the Dash renderer does: a new current month fires the reference callback, whose
+# value then feeds the dashboard callback; a new reference month only fires the dashboard callback.
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from benchmarks.callback_benchmark import callback_payload
+from benchmarks.synthetic_data import write_sales_csv
+
+TRIGGERS = ('current.value', 'reference.value')
+
+
+def serve(source, host, port):
+    os.environ['RETAIL_SALES_SOURCE'] = source
+    from werkzeug.serving import make_server
+
+    # One access log line per request would dominate the test's own output
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    import Application
+    make_server(host, port, Application.app.server, threaded=True).serve_forever()
+
+
+def free_port(host):
+    with socket.socket() as probe:
+        probe.bind((host, 0))
+        return probe.getsockname()[1]
+
+
+def wait_until_ready(host, port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError('the app exited during startup')
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            # 503 while a LAZY_STARTUP=1 app is still loading its data
+            connection.request('GET', '/ready')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            connection.close()
+    raise RuntimeError('the app did not answer within {0}s'.format(timeout))
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Session(threading.Thread):
+    # One analyst: a persistent connection and a random walk through the month dropdowns
+
+    def __init__(self, host, port, callbacks, months, interactions, seed):
+        super().__init__(daemon=True)
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.callbacks = callbacks
+        self.months = months
+        self.interactions = interactions
+        self.random = random.Random(seed)
+        self.latencies = {name: [] for name in callbacks}
+        self.errors = 0
+
+    def post(self, name, values, changed):
+        output, spec = self.callbacks[name]
+        body = json.dumps(callback_payload(output, spec, values, changed))
+        start = time.perf_counter()
+        self.connection.request('POST', '/_dash-update-component', body=body,
+                                headers={'Content-Type': 'application/json'})
+        response = self.connection.getresponse()
+        data = response.read()
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status != 200:
+            self.errors += 1
+            return None
+        return json.loads(data)
+
+    def run(self):
+        values = {'current.value': self.months[0], 'reference.value': self.months[1], 'data-version.data': None}
+        try:
+            for _ in range(self.interactions):
+                if 'reference' in self.callbacks and self.random.random() < 0.7:
+                    values['current.value'] = self.random.choice(self.months)
+                    response = self.post('reference', values, ['current.value'])
+                    if response is not None:
+                        values['reference.value'] = response['response']['reference']['value']
+                    changed = ['current.value', 'reference.value']
+                else:
+                    values['reference.value'] = self.random.choice(
+                        [month for month in self.months if month != values['current.value']])
+                    changed = ['reference.value']
+                if 'dashboard' in self.callbacks:
+                    self.post('dashboard', values, changed)
+        finally:
+            self.connection.close()
+
+
+def server_callbacks(app):
+    # The month dropdowns feed the reference callback and the batched dashboard callback; clientside
+    # callbacks never reach the server
+    callbacks = {}
+    for output, spec in app.callback_map.items():
+        if 'callback' not in spec:
+            continue
+        inputs = ['{0}.{1}'.format(item['id'], item['property']) for item in spec['inputs']]
+        if 'current.value' in inputs and 'reference.value' not in inputs:
+            callbacks['reference'] = (output, spec)
+        elif any(trigger in TRIGGERS for trigger in inputs):
+            callbacks['dashboard'] = (output, spec)
+    return callbacks
+
+
+def run_sessions(host, port, callbacks, months, session_count, interactions):
+    sessions = [Session(host, port, callbacks, months, interactions, seed) for seed in range(session_count)]
+    start = time.perf_counter()
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - start
+
+    total = len(sessions) * interactions
+    report = {'sessions': len(sessions), 'interactions': total, 'elapsed': elapsed,
+              'interactions_per_second': total / elapsed,
+              'errors': sum(session.errors for session in sessions), 'callbacks': {}}
+    for name in callbacks:
+        latencies = sorted(latency for session in sessions for latency in session.latencies[name])
+        if latencies:
+            report['callbacks'][name] = {'requests': len(latencies), 'requests_per_second': len(latencies) / elapsed,
+                                         'p50': percentile(latencies, 0.50), 'p95': percentile(latencies, 0.95),
+                                         'p99': percentile(latencies, 0.99)}
+    return report
+
+
+def print_report(report):
+    print('{0:<10} {1:>9} {2:>10} {3:>10} {4:>10} {5:>10}'.format('callback', 'requests', 'req/s', 'p50', 'p95',
+                                                                   'p99'))
+    for name, stats in report['callbacks'].items():
+        print('{0:<10} {1:>9} {2:>10.1f} {3:>8.1f}ms {4:>8.1f}ms {5:>8.1f}ms'.format(
+            name, stats['requests'], stats['requests_per_second'], stats['p50'] * 1000, stats['p95'] * 1000,
+            stats['p99'] * 1000))
+    print('interactions per second  {0:.1f}'.format(report['interactions_per_second']))
+    print('errors                   {0}'.format(report['errors']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--interactions', type=int, default=50)
+    parser.add_argument('--source', help='csv to serve instead of synthetic data')
+    parser.add_argument('--stores', type=int, default=45)
+    parser.add_argument('--depts', type=int, default=81)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--url', help='test an app that is already running instead of booting one')
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-load-')
+    server = None
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(data_dir, 'synthetic_sales.csv')
+            write_sales_csv(source, stores=args.stores, depts=args.depts, years=args.years)
+        os.environ['RETAIL_SALES_SOURCE'] = source
+
+        if args.url:
+            parsed = urllib.parse.urlparse(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+        else:
+            host, port = '127.0.0.1', free_port('127.0.0.1')
+            server = multiprocessing.Process(target=serve, args=(source, host, port), daemon=True)
+            server.start()
+            wait_until_ready(host, port, server, args.startup_timeout)
+
+        # The callback map and month list come from the same source the server reads
+        import Application
+        Application.startup_ready.wait()
+        callbacks = server_callbacks(Application.app)
+        months = list(Application.snapshots.current.options.keys())
+
+        report = run_sessions(host, port, callbacks, months, args.sessions, args.interactions)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Parallel Benchmark: startup aggregation time across worker counts
+#
+# Usage: python -m benchmarks.parallel_benchmark path/to/retail_sales.csv [--workers 1 2 4 8] [--partition Store]
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from aggregates import count_data, dept_data, monthly_data, parallel_aggregate, store_data, weekly_data
+from data_source import read_csv_source
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--partition', default='Store')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = read_csv_source(args.source)
+    baseline, expected = best_of(lambda: (monthly_data(data), weekly_data(data), store_data(data), dept_data(data),
+                                          count_data(data)), args.repeat)
+    print('cores available     {0}'.format(os.cpu_count()))
+    print('sequential helpers  {0:.3f}s'.format(baseline))
+    for workers in args.workers:
+        elapsed, tables = best_of(lambda: parallel_aggregate(data, workers, partition_by=args.partition).tables(),
+                                  args.repeat)
+        for expected_table, table in zip(expected, tables):
+            pd.testing.assert_frame_equal(expected_table, table, check_exact=False)
+        print('{0:>2} worker(s)         {1:.3f}s  speedup {2:.2f}x'.format(workers, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
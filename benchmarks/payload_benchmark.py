@@ -0,0 +1,52 @@
+# Payload Benchmark: bytes per figure before and after slimming, and per response before and after compression
+#
+# Usage: RETAIL_SALES_SOURCE=path/to/retail_sales.csv python -m benchmarks.payload_benchmark [--interactions 20]
+#                                                                                            [--encoding gzip]
+#
+# Slimming is on unless SLIM_FIGURES=0 is set, and the figure cache is off unless FIGURE_CACHE_SIZE is set, so
+# every figure of every interaction is measured.
+
+import argparse
+import json
+import os
+
+os.environ.setdefault('SLIM_FIGURES', '1')
+os.environ.setdefault('FIGURE_CACHE_SIZE', '0')
+
+from benchmarks.callback_benchmark import TRIGGERS, callback_payload, interaction_callbacks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interactions', type=int, default=20)
+    parser.add_argument('--encoding', default='gzip', help='Accept-Encoding sent with every request')
+    args = parser.parse_args()
+
+    import Application
+    Application.startup_ready.wait()
+
+    client = Application.app.server.test_client()
+    headers = {'Accept-Encoding': args.encoding}
+    client.get('/_dash-layout', headers=headers)
+    callbacks = interaction_callbacks(Application.app)
+    months = list(Application.snapshots.current.options.keys())
+    for position in range(args.interactions):
+        current = months[position % len(months)]
+        values = {'current.value': current, 'reference.value': Application.snapshots.current.options[current][0],
+                  'data-version.data': Application.snapshots.current.version}
+        for output, spec, triggers in callbacks:
+            changed = [trigger for trigger in triggers if trigger in TRIGGERS]
+            response = client.post('/_dash-update-component',
+                                   data=json.dumps(callback_payload(output, spec, values, changed)),
+                                   content_type='application/json', headers=headers)
+            assert response.status_code == 200, response.status_code
+
+    print('{0:<30} {1:>9} {2:>12} {3:>12} {4:>8}'.format('figure / response', 'count', 'before', 'after', 'ratio'))
+    for name, sizes in Application.payload_sizes.stats().items():
+        print('{0:<30} {1:>9} {2:>10.0f} B {3:>10.0f} B {4:>7.1f}x'.format(
+            name[:30], sizes['responses'], sizes['bytes_before'], sizes['bytes_after'],
+            sizes['bytes_before'] / sizes['bytes_after']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Range Benchmark: date-range lookups on the prefix-sum index against filtering and grouping the rows per request
+#
+# Usage: python -m benchmarks.range_benchmark [--source path/to/sales.csv] [--weeks 1 4 13 52 104] [--number 50]
+#
+# Without --source the synthetic data is used. For every range length both paths answer the same requests
+# (totals, holiday totals, store count, weekly series, top stores and top departments) and must agree.
+
+import argparse
+import time
+
+import numpy as np
+
+from aggregates import WeeklySales, period_label
+from benchmarks.synthetic_data import generate_sales
+from data_source import read_csv_source
+from memory_usage import format_bytes
+
+
+def pandas_lookup(dataframe, period, top_k):
+    rows = dataframe[(dataframe['Date'] >= period[0]) & (dataframe['Date'] <= period[1])]
+    sales = rows['Weekly_Sales']
+    stores = sales.groupby(rows['Store']).sum().round(1).sort_values(ascending=False, kind='stable')[:top_k]
+    depts = sales.groupby(rows['Dept']).sum().round(1).sort_values(ascending=False, kind='stable')[:top_k]
+    return (round(sales.sum(), 1), round(sales[rows['IsHoliday'] == True].sum(), 1), rows['Store'].nunique(),
+            sales.groupby(rows['Date']).sum().round(1).to_numpy(), stores.to_numpy(), depts.to_numpy())
+
+
+def index_lookup(index, period):
+    return (index.total_sales(period), index.holiday_sales(period), index.store_count(period),
+            index.weekly_sales(period)['Weekly_Sales'].to_numpy(), index.top_stores(period)['Weekly_Sales'].to_numpy(),
+            index.top_depts(period)['Weekly_Sales'].to_numpy())
+
+
+def per_call(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source')
+    parser.add_argument('--weeks', type=int, nargs='+', default=[1, 4, 13, 52, 104])
+    parser.add_argument('--number', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    dataframe = read_csv_source(args.source) if args.source else generate_sales()
+    start = time.perf_counter()
+    weekly_sales = WeeklySales()
+    weekly_sales.add(dataframe)
+    index = weekly_sales.index(top_k=args.top_k)
+    print('rows {0}, index built in {1:.3f}s, {2}'.format(len(dataframe), time.perf_counter() - start,
+                                                          format_bytes(index.nbytes())))
+
+    print('{0:>6} {1:>32} {2:>12} {3:>12} {4:>9}'.format('weeks', 'range', 'pandas', 'index', 'speedup'))
+    for weeks in args.weeks:
+        weeks = min(weeks, len(index.dates))
+        period = (index.dates[0], index.dates[weeks - 1])
+        expected, actual = pandas_lookup(dataframe, period, args.top_k), index_lookup(index, period)
+        for expected_value, actual_value in zip(expected, actual):
+            assert np.allclose(expected_value, actual_value), period_label(period)
+        slow = per_call(lambda: pandas_lookup(dataframe, period, args.top_k), args.number)
+        fast = per_call(lambda: index_lookup(index, period), args.number)
+        print('{0:>6} {1:>32} {2:>10.2f}ms {3:>10.2f}ms {4:>8.1f}x'.format(
+            weeks, period_label(period), slow * 1000, fast * 1000, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
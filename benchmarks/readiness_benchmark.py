@@ -0,0 +1,97 @@
+# Readiness Benchmark: time to first byte and time to ready of a cold start, with and without LAZY_STARTUP
+#
+# Usage: python -m benchmarks.readiness_benchmark [--source path/to/sales.csv] [--repeat 3] [--no-cache]
+#
+# Every start is a fresh interpreter serving the app on a local werkzeug server, on synthetic data unless --source
+# is given. Time to first byte is when GET / first answers, time to ready when /ready first answers 200; both are
+# counted from the moment the process is started, so they include the interpreter and library imports.
+
+import argparse
+import http.client
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import free_port
+from benchmarks.synthetic_data import write_sales_csv
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVE_COMMAND = 'import sys; from benchmarks.load_test import serve; serve(sys.argv[1], "127.0.0.1", int(sys.argv[2]))'
+
+
+def request_status(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def cold_start(source, lazy, use_cache, timeout):
+    port = free_port('127.0.0.1')
+    environment = dict(os.environ, LAZY_STARTUP='1' if lazy else '0', RETAIL_SALES_CACHE='1' if use_cache else '0')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', SERVE_COMMAND, source, str(port)], env=environment,
+                               stdout=subprocess.DEVNULL, cwd=PROJECT_DIR)
+    first_byte = ready = None
+    try:
+        while ready is None:
+            if process.poll() is not None:
+                raise RuntimeError('the app exited during startup')
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError('the app was not ready within {0}s'.format(timeout))
+            if first_byte is None:
+                if request_status(port, '/') is not None:
+                    first_byte = time.perf_counter() - start
+                else:
+                    time.sleep(0.02)
+                    continue
+            if request_status(port, '/ready') == 200:
+                ready = time.perf_counter() - start
+            else:
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait()
+    return first_byte, ready
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-cache', action='store_true', help='parse the csv on every start')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-readiness-')
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(data_dir, 'synthetic_sales.csv')
+            write_sales_csv(source)
+        # One start that fills the caches, so every measured start reads the same files
+        cold_start(source, False, not args.no_cache, args.timeout)
+
+        print('{0:<8} {1:>16} {2:>16}'.format('startup', 'first byte', 'ready'))
+        for lazy in (False, True):
+            timings = [cold_start(source, lazy, not args.no_cache, args.timeout) for _ in range(args.repeat)]
+            print('{0:<8} {1:>15.2f}s {2:>15.2f}s'.format(
+                'lazy' if lazy else 'eager', statistics.median(first_byte for first_byte, _ in timings),
+                statistics.median(ready for _, ready in timings)))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
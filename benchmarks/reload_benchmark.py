@@ -0,0 +1,115 @@
+# Reload Benchmark: callback latency while RELOAD_INTERVAL rebuilds the data in the background
+#
+# Usage: python -m benchmarks.reload_benchmark [--sessions 4] [--interactions 300] [--swap-every 3]
+#                                              [--reload-interval 0.5] [--years 3]
+#
+# Two synthetic sources with the same months but different sales are written, and the served file is replaced
+# by the other one every --swap-every seconds while the sessions of the load test run. The same sessions are run
+# once without swaps for comparison. Every request must answer: the published snapshot keeps serving while the
+# next one is built, so the latency during reloads only grows by the CPU the rebuild takes.
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+from benchmarks.load_test import free_port, run_sessions, serve, server_callbacks, wait_until_ready
+from benchmarks.synthetic_data import write_sales_csv
+
+
+def data_version(host, port):
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        connection.request('GET', '/ready')
+        return json.loads(connection.getresponse().read())['data_version']
+    finally:
+        connection.close()
+
+
+class SourceSwapper(threading.Thread):
+    # Replaces the served file with the other source, the way a nightly export would, and records every data
+    # version the server reports
+
+    def __init__(self, source, versions, swap_every, host, port):
+        super().__init__(daemon=True)
+        self.source = source
+        self.versions = versions
+        self.swap_every = swap_every
+        self.host = host
+        self.port = port
+        self.seen = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        swaps = 0
+        while not self.stopped.wait(self.swap_every):
+            swaps += 1
+            staged = self.source + '.staged'
+            shutil.copyfile(self.versions[swaps % 2], staged)
+            os.replace(staged, self.source)
+            version = data_version(self.host, self.port)
+            if not self.seen or self.seen[-1] != version:
+                self.seen.append(version)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--interactions', type=int, default=300)
+    parser.add_argument('--swap-every', type=float, default=3)
+    parser.add_argument('--reload-interval', type=float, default=0.5)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-reload-')
+    server = None
+    try:
+        versions = [os.path.join(data_dir, 'sales-{0}.csv'.format(seed)) for seed in (0, 1)]
+        for seed, path in enumerate(versions):
+            write_sales_csv(path, years=args.years, seed=seed)
+        source = os.path.join(data_dir, 'sales.csv')
+        shutil.copyfile(versions[0], source)
+        os.environ.update(RETAIL_SALES_SOURCE=source, RELOAD_INTERVAL=str(args.reload_interval),
+                          RETAIL_SALES_CACHE='0')
+
+        host, port = '127.0.0.1', free_port('127.0.0.1')
+        server = multiprocessing.Process(target=serve, args=(source, host, port), daemon=True)
+        server.start()
+        wait_until_ready(host, port, server, args.startup_timeout)
+
+        # Only the server watches the source; this process reads the callback map and the months
+        del os.environ['RELOAD_INTERVAL']
+        import Application
+        Application.startup_ready.wait()
+        callbacks = server_callbacks(Application.app)
+        months = list(Application.snapshots.current.options.keys())
+
+        reports = {'idle': run_sessions(host, port, callbacks, months, args.sessions, args.interactions)}
+        swapper = SourceSwapper(source, versions, args.swap_every, host, port)
+        swapper.start()
+        reports['reloading'] = run_sessions(host, port, callbacks, months, args.sessions, args.interactions)
+        swapper.stopped.set()
+        swapper.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print('{0:<10} {1:<10} {2:>9} {3:>10} {4:>10} {5:>10} {6:>7}'.format(
+        'run', 'callback', 'requests', 'p50', 'p95', 'p99', 'errors'))
+    for run, report in reports.items():
+        for name, stats in report['callbacks'].items():
+            print('{0:<10} {1:<10} {2:>9} {3:>8.1f}ms {4:>8.1f}ms {5:>8.1f}ms {6:>7}'.format(
+                run, name, stats['requests'], stats['p50'] * 1000, stats['p95'] * 1000, stats['p99'] * 1000,
+                report['errors']))
+    print('data versions served during the run: {0}'.format(len(swapper.seen)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Serving Benchmark: memory per worker and throughput of serve.py as the number of workers grows
+#
+# Usage: python -m benchmarks.serving_benchmark [--workers 1 2 4] [--sessions 16] [--interactions 50]
+#                                               [--source path/to/sales.csv]
+#
+# For every worker count serve.py is started on synthetic data (or --source), the load test sessions are
+# replayed against it, and the memory of the master and the workers is read from /proc after the load.
+# Pss splits each shared page between the processes that map it, so the Pss of all processes is the real
+# footprint; USS is what a worker holds on its own.
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.load_test import free_port, run_sessions, server_callbacks, wait_until_ready
+from benchmarks.synthetic_data import write_sales_csv
+from memory_usage import format_bytes, shared_memory_breakdown
+
+SERVE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'serve.py')
+
+
+class ServeProcess:
+
+    def __init__(self, workers, port, source):
+        environment = dict(os.environ, RETAIL_SALES_SOURCE=source)
+        self.process = subprocess.Popen([sys.executable, SERVE_SCRIPT, '--workers', str(workers), '--host',
+                                         '127.0.0.1', '--port', str(port), '--quiet'],
+                                        stdout=subprocess.PIPE, text=True, env=environment)
+        self.worker_pids = []
+        for line in self.process.stdout:
+            if line.startswith('Serving on'):
+                self.worker_pids = [int(pid) for pid in line.split('(pids ')[1].rstrip(')\n').split(', ')]
+                break
+        if not self.worker_pids:
+            raise RuntimeError('serve.py exited during startup')
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def memory(self):
+        master = shared_memory_breakdown(self.process.pid)
+        workers = [shared_memory_breakdown(pid) for pid in self.worker_pids]
+        return master, workers
+
+    def stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--interactions', type=int, default=50)
+    parser.add_argument('--source')
+    parser.add_argument('--stores', type=int, default=45)
+    parser.add_argument('--depts', type=int, default=81)
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-serving-')
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(data_dir, 'synthetic_sales.csv')
+            write_sales_csv(source, stores=args.stores, depts=args.depts, years=args.years)
+        os.environ['RETAIL_SALES_SOURCE'] = source
+
+        import Application
+        Application.startup_ready.wait()
+        callbacks = server_callbacks(Application.app)
+        months = list(Application.snapshots.current.options.keys())
+
+        print('{0:>7} {1:>12} {2:>12} {3:>12} {4:>12} {5:>12} {6:>12}'.format(
+            'workers', 'interact/s', 'p95', 'master Pss', 'worker Pss', 'worker USS', 'total Pss'))
+        for workers in args.workers:
+            port = free_port('127.0.0.1')
+            server = ServeProcess(workers, port, source)
+            try:
+                wait_until_ready('127.0.0.1', port, server, 300)
+                report = run_sessions('127.0.0.1', port, callbacks, months, args.sessions, args.interactions)
+                master, worker_memory = server.memory()
+            finally:
+                server.stop()
+            if master is None:
+                print('{0:>7} {1:>12.1f} (memory breakdown needs /proc/<pid>/smaps_rollup)'.format(
+                    workers, report['interactions_per_second']))
+                continue
+            worker_pss = sum(memory['pss'] for memory in worker_memory) / workers
+            worker_uss = sum(memory['uss'] for memory in worker_memory) / workers
+            total_pss = master['pss'] + sum(memory['pss'] for memory in worker_memory)
+            print('{0:>7} {1:>12.1f} {2:>10.1f}ms {3:>12} {4:>12} {5:>12} {6:>12}'.format(
+                workers, report['interactions_per_second'], report['callbacks']['dashboard']['p95'] * 1000,
+                format_bytes(master['pss']), format_bytes(worker_pss), format_bytes(worker_uss),
+                format_bytes(total_pss)))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
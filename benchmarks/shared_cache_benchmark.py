@@ -0,0 +1,91 @@
+# Shared Cache Benchmark: serve.py workers with their own figure caches, one shared cache, and a warmed one
+#
+# Usage: python -m benchmarks.shared_cache_benchmark [--workers 4] [--sessions 16] [--interactions 50]
+#                                                    [--source path/to/sales.csv] [--years 3]
+#
+# The same load test sessions are replayed against serve.py three times: with only the per-worker LRU caches,
+# with FIGURE_CACHE_DIR pointing at an empty directory, and with a FIGURE_CACHE_DIR that
+# python Application.py --warm-cache filled beforehand. The sessions spread over the workers, so without the
+# shared cache a month pair is computed once per worker that is asked for it. Reading a result back costs about a
+# millisecond, so the gain is large where a result takes longer to compute, e.g. with DATA_BACKEND=sqlite, and
+# small with the precomputed pandas aggregates.
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import free_port, run_sessions, server_callbacks, wait_until_ready
+from benchmarks.serving_benchmark import ServeProcess
+from benchmarks.synthetic_data import write_sales_csv
+
+APPLICATION_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Application.py')
+
+
+def cached_entries(cache_dir):
+    path = os.path.join(cache_dir, 'figure_cache.sqlite')
+    if not os.path.exists(path):
+        return 0
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--interactions', type=int, default=50)
+    parser.add_argument('--source')
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-shared-cache-')
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(data_dir, 'synthetic_sales.csv')
+            write_sales_csv(source, years=args.years)
+        os.environ['RETAIL_SALES_SOURCE'] = source
+
+        import Application
+        Application.startup_ready.wait()
+        callbacks = server_callbacks(Application.app)
+        months = list(Application.snapshots.current.options.keys())
+
+        print('{0:<8} {1:>12} {2:>10} {3:>10} {4:>10} {5:>12}'.format(
+            'cache', 'interact/s', 'p50', 'p95', 'errors', 'on disk'))
+        for run in ('local', 'shared', 'warmed'):
+            cache_dir = os.path.join(data_dir, 'figure-cache-{0}'.format(run))
+            if run == 'local':
+                os.environ.pop('FIGURE_CACHE_DIR', None)
+            else:
+                os.environ['FIGURE_CACHE_DIR'] = cache_dir
+            if run == 'warmed':
+                start = time.perf_counter()
+                subprocess.run([sys.executable, APPLICATION_SCRIPT, '--warm-cache'], check=True,
+                               stdout=subprocess.DEVNULL)
+                print('warm-up  {0:.2f}s, {1} results'.format(time.perf_counter() - start, cached_entries(cache_dir)))
+            port = free_port('127.0.0.1')
+            server = ServeProcess(args.workers, port, source)
+            try:
+                wait_until_ready('127.0.0.1', port, server, 300)
+                report = run_sessions('127.0.0.1', port, callbacks, months, args.sessions, args.interactions)
+            finally:
+                server.stop()
+            dashboard = report['callbacks']['dashboard']
+            print('{0:<8} {1:>12.1f} {2:>8.1f}ms {3:>8.1f}ms {4:>10} {5:>12}'.format(
+                run, report['interactions_per_second'], dashboard['p50'] * 1000, dashboard['p95'] * 1000,
+                report['errors'], cached_entries(cache_dir) if run != 'local' else '-'))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
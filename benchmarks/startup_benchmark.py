@@ -0,0 +1,47 @@
+# Startup Benchmark: cold csv parsing against the warm columnar cache
+#
+# Usage: python -m benchmarks.startup_benchmark path/to/retail_sales.csv [--repeat 5]
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from data_source import load_data, read_csv_source
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='retail-cache-')
+    try:
+        cold, expected = best_of(lambda: read_csv_source(args.source), args.repeat)
+        start = time.perf_counter()
+        load_data(args.source, cache_dir=cache_dir)
+        first = time.perf_counter() - start
+        warm, cached = best_of(lambda: load_data(args.source, cache_dir=cache_dir), args.repeat)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    assert cached.equals(expected), 'cached frame differs from the csv frame'
+    print('rows              {0}'.format(len(expected)))
+    print('cold csv load     {0:.3f}s'.format(cold))
+    print('first cached load {0:.3f}s (csv load + cache write)'.format(first))
+    print('warm cache load   {0:.3f}s'.format(warm))
+    print('speedup           {0:.1f}x'.format(cold / warm))
+
+
+if __name__ == '__main__':
+    main()
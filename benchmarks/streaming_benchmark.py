@@ -0,0 +1,57 @@
+# Streaming Benchmark: chunked aggregation against the in-memory helpers
+#
+# Usage: python -m benchmarks.streaming_benchmark path/to/retail_sales.csv [--chunksize 50000 200000]
+#
+# Checks that the streamed tables equal the ones built from the full frame and reports the peak
+# memory traced while building each of them.
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from aggregates import SalesAggregator, count_data, dept_data, monthly_data, store_data, weekly_data
+from data_source import iter_csv_chunks, read_csv_source
+
+
+def in_memory_tables(path):
+    data = read_csv_source(path)
+    return monthly_data(data), weekly_data(data), store_data(data), dept_data(data), count_data(data)
+
+
+def streamed_tables(path, chunksize):
+    aggregator = SalesAggregator()
+    for chunk in iter_csv_chunks(path, chunksize):
+        aggregator.add(chunk)
+    return aggregator.tables()
+
+
+def traced(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source')
+    parser.add_argument('--chunksize', type=int, nargs='+', default=[50000, 200000])
+    args = parser.parse_args()
+
+    expected, elapsed, peak = traced(in_memory_tables, args.source)
+    print('in-memory             {0:7.2f}s  peak {1:8.1f} MB'.format(elapsed, peak / 1024 / 1024))
+    for chunksize in args.chunksize:
+        tables, elapsed, peak = traced(streamed_tables, args.source, chunksize)
+        for expected_table, table in zip(expected, tables):
+            pd.testing.assert_frame_equal(expected_table, table, check_exact=False)
+        print('chunks of {0:<10} {1:7.2f}s  peak {2:8.1f} MB  (tables match)'.format(chunksize, elapsed,
+                                                                                    peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# Benchmark Suite: data load, aggregation helpers and figure callbacks on synthetic data, written as JSON
+#
+# Usage: python -m benchmarks.suite [--stores 45] [--depts 81] [--years 3] [--repeat 5] [--output results.json]
+#                                   [--baseline previous.json]
+#
+# The synthetic csv is generated into a temporary folder, so every run starts from the same input. Each
+# benchmark reports the min, median and mean of its timings in seconds; with --baseline the results are
+# compared against an earlier run, e.g. one saved on another commit. The resident memory and the size of every
+# structure the app holds after the callbacks ran are recorded and compared as well.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import count_data, dept_data, monthly_data, store_data, weekly_data
+from benchmarks.synthetic_data import write_sales_csv
+from data_source import load_data, read_csv_source
+
+HELPERS = [monthly_data, weekly_data, store_data, dept_data, count_data]
+
+CALLBACKS = ['update_card2', 'update_card3', 'update_card4', 'update_graph1', 'update_header', 'update_graph2',
+             'update_graph3', 'update_graph4']
+
+SINGLE_MONTH_CALLBACKS = {'update_graph3': 0, 'update_graph4': 1}
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return summary(timings)
+
+
+def summary(timings):
+    return {'min': min(timings), 'median': statistics.median(timings), 'mean': statistics.mean(timings),
+            'runs': timings}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def callback_runner(function, name, pairs):
+    # Time per call, averaged over a fixed set of month pairs
+    if name in SINGLE_MONTH_CALLBACKS:
+        arguments = [(pair[SINGLE_MONTH_CALLBACKS[name]],) for pair in pairs]
+    else:
+        arguments = pairs
+
+    def run():
+        for argument in arguments:
+            function(*argument)
+    return run, len(arguments)
+
+
+def run_suite(source, repeat, pairs_per_callback):
+    results = {}
+    cache_dir = tempfile.mkdtemp(prefix='retail-cache-')
+    try:
+        results['load.csv'] = measure(lambda: read_csv_source(source), repeat)
+        results['load.cache_cold'] = measure(lambda: load_data(source, cache_dir=cache_dir), 1)
+        results['load.cache_warm'] = measure(lambda: load_data(source, cache_dir=cache_dir), repeat)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    dataframe = read_csv_source(source)
+    for helper in HELPERS:
+        results['helper.{0}'.format(helper.__name__)] = measure(lambda: helper(dataframe), repeat)
+    del dataframe
+
+    # The app reads its configuration from the environment when it is first imported
+    os.environ['RETAIL_SALES_SOURCE'] = source
+    os.environ['RETAIL_SALES_CACHE'] = '0'
+    os.environ['FIGURE_CACHE_SIZE'] = '0'
+    start = time.perf_counter()
+    import Application
+    Application.startup_ready.wait()
+    results['app.startup'] = summary([time.perf_counter() - start])
+
+    months = list(Application.snapshots.current.options.keys())
+    pairs = [(month, Application.snapshots.current.options[month][0]) for month in months[:pairs_per_callback]]
+    for name in CALLBACKS:
+        run, calls = callback_runner(getattr(Application, name), name, pairs)
+        timing = measure(run, repeat)
+        results['callback.{0}'.format(name)] = summary([run_time / calls for run_time in timing['runs']])
+    return results
+
+
+def memory_footprint():
+    import Application
+    report = Application.memory_report()
+    return {'rss_bytes': report['rss_bytes'], 'structures_total_bytes': report['structures_total_bytes'],
+            'structures': report['structures']}
+
+
+def compare_memory(memory, baseline):
+    previous = baseline.get('memory')
+    if previous is None:
+        return
+    sizes = dict(memory['structures'], rss=memory['rss_bytes'], structures_total=memory['structures_total_bytes'])
+    previous_sizes = dict(previous['structures'], rss=previous['rss_bytes'],
+                          structures_total=previous['structures_total_bytes'])
+    print()
+    print('{0:<28} {1:>12} {2:>12} {3:>8}'.format('memory', 'baseline', 'current', 'ratio'))
+    for name, size in sizes.items():
+        if not previous_sizes.get(name):
+            continue
+        print('{0:<28} {1:>10.0f}KB {2:>10.0f}KB {3:>7.2f}x'.format(
+            name, previous_sizes[name] / 1024, size / 1024, size / previous_sizes[name]))
+
+
+def compare(results, baseline):
+    print('{0:<28} {1:>12} {2:>12} {3:>8}'.format('benchmark', 'baseline', 'current', 'ratio'))
+    for name, timing in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        print('{0:<28} {1:>10.3f}ms {2:>10.3f}ms {3:>7.2f}x'.format(
+            name, previous['min'] * 1000, timing['min'] * 1000, timing['min'] / previous['min']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stores', type=int, default=45)
+    parser.add_argument('--depts', type=int, default=81)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pairs', type=int, default=12, help='month pairs per callback timing')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='retail-synthetic-')
+    try:
+        source = os.path.join(data_dir, 'synthetic_sales.csv')
+        rows = write_sales_csv(source, stores=args.stores, depts=args.depts, years=args.years, seed=args.seed)
+        results = run_suite(source, args.repeat, args.pairs)
+        memory = memory_footprint()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'dataset': {'stores': args.stores, 'depts': args.depts, 'years': args.years, 'seed': args.seed,
+                        'rows': rows},
+            'repeat': args.repeat
+        },
+        'results': results,
+        'memory': memory
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    for name, timing in results.items():
+        print('{0:<28} {1:>10.3f}ms'.format(name, timing['min'] * 1000))
+    print('{0:<28} {1:>10.0f}KB'.format('memory.rss', memory['rss_bytes'] / 1024))
+    print('{0:<28} {1:>10.0f}KB'.format('memory.structures_total', memory['structures_total_bytes'] / 1024))
+    print('results written to {0}'.format(args.output))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        compare(results, baseline)
+        compare_memory(memory, baseline)
+
+
+if __name__ == '__main__':
+    main()
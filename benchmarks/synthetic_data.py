@@ -0,0 +1,55 @@
+# Synthetic Retail Data: sales frames with the schema of retail_sales.csv at any number of stores, depts and years
+#
+# Usage: python -m benchmarks.synthetic_data path/to/synthetic_sales.csv [--stores 45] [--depts 81] [--years 3]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+START_DATE = '2010-02-05'
+
+# ISO weeks of the Super Bowl, Labor Day, Thanksgiving and Christmas holiday weeks
+HOLIDAY_WEEKS = [6, 36, 47, 52]
+
+
+def generate_sales(stores=45, depts=81, years=3, seed=0):
+    # One row per week, store and department, shaped like the frame read_csv_source returns
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START_DATE, periods=52 * years, freq='7D')
+    dataframe = pd.MultiIndex.from_product([dates, np.arange(1, stores + 1), np.arange(1, depts + 1)],
+                                           names=['Date', 'Store', 'Dept']).to_frame(index=False)
+    # Store and department sizes vary, weekly noise and a December peak come on top
+    store_scale = rng.lognormal(0.0, 0.4, stores)[dataframe['Store'].to_numpy() - 1]
+    dept_scale = rng.lognormal(0.0, 0.8, depts)[dataframe['Dept'].to_numpy() - 1]
+    season = np.where(dataframe['Date'].dt.month.to_numpy() == 12, 1.5, 1.0)
+    noise = rng.lognormal(-4.5, 0.3, len(dataframe))
+    dataframe['Weekly_Sales'] = (store_scale * dept_scale * season * noise).round(6)
+    dataframe['IsHoliday'] = dataframe['Date'].dt.isocalendar().week.isin(HOLIDAY_WEEKS).to_numpy()
+    dataframe['month'] = dataframe['Date'].dt.strftime('%Y-%m')
+    dataframe['Month'] = dataframe['Date'].dt.strftime('%B %Y')
+    return dataframe
+
+
+def write_sales_csv(path, stores=45, depts=81, years=3, seed=0):
+    dataframe = generate_sales(stores=stores, depts=depts, years=years, seed=seed)
+    dataframe['Date'] = dataframe['Date'].dt.strftime('%Y-%m-%d')
+    dataframe.to_csv(path, index=False)
+    return len(dataframe)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('--stores', type=int, default=45)
+    parser.add_argument('--depts', type=int, default=81)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = write_sales_csv(args.path, stores=args.stores, depts=args.depts, years=args.years, seed=args.seed)
+    print('wrote {0} rows to {1}'.format(rows, args.path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# Importing Required Libraries
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+# Data Source Settings
+
+REMOTE_URL = 'https://raw.githubusercontent.com/NurulYakimKazal/Dash-App-For-Retail-Sales-Data/main/retail_sales.csv'
+
+CACHE_FORMAT_VERSION = 1
+
+FINGERPRINT_SAMPLE_BYTES = 65536
+
+
+# Source Helpers
+
+def fetch_source(path, url=REMOTE_URL):
+    # One-off download of the published csv so that later starts only touch the local file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(handle, 'wb') as target, urllib.request.urlopen(url) as response:
+            shutil.copyfileobj(response, target)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+
+def ensure_source(path):
+    if not os.path.exists(path):
+        fetch_source(path)
+    return path
+
+
+def source_fingerprint(path):
+    # Size, mtime and the head/tail bytes identify a source revision without reading the whole file
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update('{0}:{1}:{2}'.format(CACHE_FORMAT_VERSION, stat.st_size, stat.st_mtime_ns).encode())
+    with open(path, 'rb') as source:
+        digest.update(source.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            source.seek(max(stat.st_size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def prefix_signature(path, offset):
+    # The head of the file and the bytes just before `offset`: appending keeps it, rewriting the first `offset`
+    # bytes changes it, even if the file keeps its inode and grows
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        digest.update(source.read(min(offset, FINGERPRINT_SAMPLE_BYTES)))
+        start = max(offset - FINGERPRINT_SAMPLE_BYTES, 0)
+        source.seek(start)
+        digest.update(source.read(offset - start))
+    return digest.hexdigest()[:16]
+
+
+def source_stat(path):
+    # Changes with any rewrite, append or replacement of the file, without reading it
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def read_csv_source(path):
+    dataframe = pd.read_csv(path, sep=',')
+    dataframe['Date'] = pd.to_datetime(dataframe['Date'], format='%Y-%m-%d')
+    return dataframe
+
+
+def iter_csv_chunks(path, chunksize):
+    for dataframe in pd.read_csv(ensure_source(path), sep=',', chunksize=chunksize):
+        dataframe['Date'] = pd.to_datetime(dataframe['Date'], format='%Y-%m-%d')
+        yield dataframe
+
+
+def read_appended_rows(path, offset, end=None):
+    # Rows written after byte `offset`, up to byte `end` if given; an unfinished last line is left for the next call
+    with open(path, 'rb') as source:
+        header = source.readline()
+        source.seek(offset)
+        appended = source.read() if end is None else source.read(end - offset)
+    end = appended.rfind(b'\n') + 1
+    if end == 0:
+        return None, offset
+    dataframe = pd.read_csv(io.BytesIO(header + appended[:end]), sep=',')
+    if len(dataframe) == 0:
+        return None, offset + end
+    dataframe['Date'] = pd.to_datetime(dataframe['Date'], format='%Y-%m-%d')
+    for column in ('Store', 'Dept', 'Weekly_Sales'):
+        if not pd.api.types.is_numeric_dtype(dataframe[column]):
+            raise ValueError('Column {0} holds values that are not numbers'.format(column))
+    return dataframe, offset + end
+
+
+def complete_lines_end(path, offset, end):
+    # The byte after the last complete line between `offset` and `end`
+    with open(path, 'rb') as source:
+        source.seek(offset)
+        return offset + source.read(end - offset).rfind(b'\n') + 1
+
+
+# Columnar Cache
+
+def default_cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '.data_cache')
+
+
+def cache_source(cache_dir, entry):
+    try:
+        with open(os.path.join(cache_dir, entry, 'meta.json')) as meta:
+            return json.load(meta).get('source')
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(dataframe, cache_dir, fingerprint, source=None):
+    # Every column is stored as a plain .npy array; text columns are split into integer codes and labels. Older
+    # revisions of the same source are removed, other sources sharing the directory keep theirs
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    columns = []
+    for position, column in enumerate(dataframe.columns):
+        values = dataframe[column]
+        if values.dtype == object:
+            codes, labels = pd.factorize(values)
+            codes = codes.astype(np.int16 if len(labels) < np.iinfo(np.int16).max else np.int32)
+            np.save(os.path.join(temp_dir, '{0}.codes.npy'.format(position)), codes)
+            np.save(os.path.join(temp_dir, '{0}.labels.npy'.format(position)), np.asarray(labels, dtype=str))
+            columns.append({'name': column, 'kind': 'text'})
+        else:
+            np.save(os.path.join(temp_dir, '{0}.npy'.format(position)), values.to_numpy())
+            columns.append({'name': column, 'kind': 'array'})
+    with open(os.path.join(temp_dir, 'meta.json'), 'w') as meta:
+        json.dump({'fingerprint': fingerprint, 'source': source, 'rows': len(dataframe), 'columns': columns}, meta)
+
+    target_dir = os.path.join(cache_dir, fingerprint)
+    try:
+        os.rename(temp_dir, target_dir)
+    except OSError:
+        # Another worker published the same fingerprint first
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    for entry in os.listdir(cache_dir):
+        if entry != fingerprint and not entry.startswith('.tmp-') and cache_source(cache_dir, entry) in (None, source):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    return target_dir
+
+
+def discard_cache_entry(cache_dir, target_dir):
+    # Moved aside first, so that readers never see it half removed and the next write_cache can take its name
+    aside = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        os.rename(target_dir, os.path.join(aside, 'entry'))
+    except OSError:
+        pass
+    shutil.rmtree(aside, ignore_errors=True)
+
+
+def read_cache(cache_dir, fingerprint):
+    # A damaged entry, e.g. one cut short by a full disk, is a miss: it is discarded and written again from the csv
+    target_dir = os.path.join(cache_dir, fingerprint)
+    if not os.path.isdir(target_dir):
+        return None
+    try:
+        with open(os.path.join(target_dir, 'meta.json')) as meta:
+            manifest = json.load(meta)
+        columns = {}
+        for position, column in enumerate(manifest['columns']):
+            if column['kind'] == 'text':
+                codes = np.load(os.path.join(target_dir, '{0}.codes.npy'.format(position)))
+                labels = np.load(os.path.join(target_dir, '{0}.labels.npy'.format(position))).astype(object)
+                columns[column['name']] = pd.Categorical.from_codes(codes, labels).astype(object)
+            else:
+                columns[column['name']] = np.load(os.path.join(target_dir, '{0}.npy'.format(position)))
+        dataframe = pd.DataFrame(columns)
+        if len(dataframe) != manifest['rows']:
+            raise ValueError('{0} rows instead of {1}'.format(len(dataframe), manifest['rows']))
+        return dataframe
+    except Exception as error:
+        print('Discarding the damaged cache entry {0}: {1}'.format(target_dir, error))
+        discard_cache_entry(cache_dir, target_dir)
+        return None
+
+
+def load_data(path, cache_dir=None, use_cache=True):
+    ensure_source(path)
+    if not use_cache:
+        return read_csv_source(path)
+
+    cache_dir = cache_dir or default_cache_dir(path)
+    fingerprint = source_fingerprint(path)
+    dataframe = read_cache(cache_dir, fingerprint)
+    if dataframe is None:
+        dataframe = read_csv_source(path)
+        write_cache(dataframe, cache_dir, fingerprint, source=os.path.abspath(path))
+    return dataframe
+
+
+# Compact Schema
+
+def compact_frame(dataframe, float32=False):
+    # Month keys become categories ordered by the month key, Store and Dept the narrowest integer type that fits
+    month_order = dataframe[['month', 'Month']].drop_duplicates().sort_values('month')
+    columns = {column: dataframe[column] for column in dataframe.columns}
+    columns['month'] = pd.Categorical(dataframe['month'], categories=month_order['month'].unique(), ordered=True)
+    columns['Month'] = pd.Categorical(dataframe['Month'], categories=month_order['Month'].unique(), ordered=True)
+    for column in ['Store', 'Dept']:
+        columns[column] = pd.to_numeric(dataframe[column], downcast='integer')
+    if float32:
+        columns['Weekly_Sales'] = dataframe['Weekly_Sales'].astype(np.float32)
+    return pd.DataFrame(columns)
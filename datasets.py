@@ -0,0 +1,164 @@
+# Importing Required Libraries
+
+import collections
+import threading
+import time
+
+from flask import jsonify
+
+from memory_usage import deep_size
+from snapshot import SnapshotHolder
+
+
+# Dataset Settings
+
+def parse_datasets(text):
+    # 'north=/data/north.csv,south=/data/south.csv' in order; the first one is the default dataset
+    datasets = collections.OrderedDict()
+    for entry in text.split(','):
+        if not entry.strip():
+            continue
+        name, separator, path = entry.partition('=')
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError('Expected name=path in RETAIL_SALES_DATASETS, got {0!r}'.format(entry))
+        datasets[name.strip()] = path.strip()
+    return datasets
+
+
+# Dataset Registry
+
+class DatasetEntry:
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.holder = None
+        self.measured = None
+        self.nbytes = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.last_load_seconds = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_lock = threading.Lock()
+
+
+class DatasetRegistry:
+    # Loads a dataset's snapshot on first use and keeps it until the loaded datasets outgrow the memory budget,
+    # then evicts the least recently used ones. Attached datasets, like the one loaded at startup, are never
+    # evicted. A request that still holds an evicted snapshot keeps using it; the memory is freed after it
+
+    def __init__(self, paths, loader, budget=0):
+        self.loader = loader
+        self.budget = budget
+        self._entries = {name: DatasetEntry(name, path) for name, path in paths.items()}
+        self._recent = collections.OrderedDict()
+        self._attached = set()
+        self._lock = threading.Lock()
+
+    def names(self):
+        return list(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def attach(self, name, holder, load_seconds=None):
+        # A dataset whose snapshots are published elsewhere, e.g. by the refresh and reload threads
+        entry = self._entries[name]
+        with self._lock:
+            entry.holder = holder
+            entry.loads += 1
+            if load_seconds is not None:
+                entry.load_seconds += load_seconds
+                entry.last_load_seconds = load_seconds
+            self._attached.add(name)
+            self._recent[name] = None
+            self._measure(entry)
+
+    def get(self, name, count=True):
+        # Hits and misses count page loads and exports; callbacks pass count=False, so that the refresh poll and
+        # every interaction of a page do not inflate the hit rate
+        entry = self._entries[name]
+        with self._lock:
+            if entry.holder is not None:
+                entry.hits += count
+                self._recent.move_to_end(name)
+                return entry.holder.current
+            entry.misses += count
+        # Requests that miss at the same time wait for one load
+        with entry.load_lock:
+            with self._lock:
+                if entry.holder is not None:
+                    self._recent.move_to_end(name)
+                    return entry.holder.current
+            start = time.perf_counter()
+            snapshot = self.loader(entry.path)
+            seconds = time.perf_counter() - start
+            with self._lock:
+                entry.holder = SnapshotHolder(snapshot)
+                entry.loads += 1
+                entry.load_seconds += seconds
+                entry.last_load_seconds = seconds
+                self._recent[name] = None
+                self._measure(entry)
+                self._evict(keep=name)
+            return snapshot
+
+    def _measure(self, entry):
+        # Snapshots that were published since the last measurement, e.g. by a reload, are measured again
+        snapshot = entry.holder.current
+        if snapshot is not entry.measured:
+            entry.nbytes = deep_size(snapshot)
+            entry.measured = snapshot
+        return entry.nbytes
+
+    def loaded(self):
+        # The snapshots currently loaded, without counting as a use
+        with self._lock:
+            return {name: self._entries[name].holder.current for name in self._recent}
+
+    def loaded_bytes(self):
+        return sum(self._measure(self._entries[name]) for name in self._recent)
+
+    def _evict(self, keep):
+        if self.budget <= 0:
+            return
+        total = self.loaded_bytes()
+        for name in list(self._recent):
+            if total <= self.budget:
+                break
+            if name == keep or name in self._attached:
+                continue
+            entry = self._entries[name]
+            total -= entry.nbytes
+            entry.holder = entry.measured = None
+            entry.nbytes = 0
+            entry.evictions += 1
+            del self._recent[name]
+
+    def stats(self):
+        with self._lock:
+            datasets = {}
+            for name, entry in self._entries.items():
+                requests = entry.hits + entry.misses
+                datasets[name] = {
+                    'loaded': entry.holder is not None,
+                    'bytes': self._measure(entry) if entry.holder is not None else 0,
+                    'loads': entry.loads,
+                    'load_seconds': entry.load_seconds,
+                    'last_load_seconds': entry.last_load_seconds,
+                    'hits': entry.hits,
+                    'misses': entry.misses,
+                    'hit_rate': entry.hits / requests if requests else None,
+                    'evictions': entry.evictions
+                }
+            return {'budget_bytes': self.budget, 'loaded_bytes': sum(item['bytes'] for item in datasets.values()),
+                    'datasets': datasets}
+
+    def install(self, server):
+        # Adds the /datasets route with the footprint, load time and hit rate of every dataset
+
+        @server.route('/datasets')
+        def datasets():
+            return jsonify(self.stats())
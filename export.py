@@ -0,0 +1,170 @@
+# Importing Required Libraries
+
+import threading
+
+import pandas as pd
+from flask import Response, jsonify, request
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Export Settings
+
+EXPORT_TABLES = ('weekly', 'dept-difference', 'store-ranking')
+
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+EXPORT_CONCURRENCY = 2
+
+
+# Export Tables
+
+def weekly_frames(backend, months):
+    for month in months:
+        weekly = backend.weekly_sales(month)
+        yield pd.DataFrame({'Month': month, 'Week_Number': weekly['Week_Number'].to_numpy(),
+                            'Date': weekly['Date'].to_numpy(), 'Weekly_Sales': weekly['Weekly_Sales'].to_numpy()})
+
+
+def dept_difference_frames(backend, pairs):
+    for current, reference in pairs:
+        merged_dept = backend.dept_difference(current, reference)
+        yield pd.DataFrame({'Current': current, 'Reference': reference, 'Dept': merged_dept['Dept'].to_numpy(),
+                            'Difference': merged_dept['Difference'].to_numpy()})
+
+
+def store_ranking_frames(backend, months):
+    for month in months:
+        stores = backend.top_stores(month)
+        yield pd.DataFrame({'Month': month, 'Rank': range(1, len(stores) + 1), 'Store': stores['Store'].to_numpy(),
+                            'Weekly_Sales': stores['Weekly_Sales'].to_numpy()})
+
+
+def export_frames(backend, table, months, current=None, reference=None):
+    # One small frame per month or month pair, built when the response asks for it. Without a pair every month
+    # is exported, and dept differences compare each month with the one before it
+    if current is not None:
+        months = [current] if reference == current else [current, reference]
+        pairs = [(current, reference)]
+    else:
+        pairs = list(zip(months[1:], months[:-1]))
+    if table == 'weekly':
+        return weekly_frames(backend, months)
+    elif table == 'dept-difference':
+        return dept_difference_frames(backend, pairs)
+    else:
+        return store_ranking_frames(backend, months)
+
+
+# Encodings
+
+def csv_chunks(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, date_format='%Y-%m-%d', lineterminator='\n').encode()
+        header = False
+
+
+class ChunkSink:
+    # Write-only file for the parquet writer; what it wrote since the last take() is sent as the next chunk
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(frames):
+    # One row group per frame; the footer with the row group offsets follows the last one
+    sink = ChunkSink()
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            yield sink.take()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.take()
+
+
+# Export Routes
+
+def released(chunks, release):
+    # The slot is freed as soon as the last chunk is produced, before the client sees the end of the response
+    try:
+        yield from chunks
+    finally:
+        release()
+
+
+def install_export(server, dataset_snapshot, ready, concurrency=EXPORT_CONCURRENCY):
+    # /export/<table>.<format> streams one of EXPORT_TABLES for ?current=&reference= or for all months, of the
+    # default dataset or of ?dataset=; dataset_snapshot answers a KeyError for unknown datasets. Exports
+    # run on the server's request threads, so at most `concurrency` of them run at once and the rest get a 429
+    # instead of taking the threads the dashboard callbacks need
+    slots = threading.BoundedSemaphore(concurrency)
+
+    @server.route('/export/<table>.<encoding>')
+    def export(table, encoding):
+        if table not in EXPORT_TABLES or encoding not in EXPORT_MIMETYPES:
+            return jsonify(error='Unknown export {0}.{1}'.format(table, encoding)), 404
+        if encoding == 'parquet' and pq is None:
+            return jsonify(error='Parquet export needs the pyarrow package'), 501
+        if not ready.is_set():
+            return jsonify(status='loading'), 503
+        # Streamed from the snapshot published now, even if a reload swaps it during the download
+        try:
+            state = dataset_snapshot(request.args.get('dataset'))
+        except KeyError:
+            return jsonify(error='Unknown dataset {0}'.format(request.args.get('dataset'))), 404
+        current, reference = request.args.get('current'), request.args.get('reference')
+        if (current is None) != (reference is None):
+            return jsonify(error='Pass both current and reference, or neither for all months'), 400
+        for month in (current, reference):
+            if month is not None and month not in state.backend:
+                return jsonify(error='Unknown month {0}'.format(month)), 404
+        if not slots.acquire(blocking=False):
+            return jsonify(error='Too many exports running, retry shortly'), 429, {'Retry-After': '5'}
+
+        frames = export_frames(state.backend, table, list(state.options), current, reference)
+        chunks = csv_chunks(frames) if encoding == 'csv' else parquet_chunks(frames)
+        name = '{0}-{1}.{2}'.format(table, 'all-months' if current is None else
+                                    '{0}-vs-{1}'.format(current, reference).replace(' ', '-'), encoding)
+        slot = threading.Lock()
+
+        def release():
+            if slot.acquire(blocking=False):
+                slots.release()
+
+        response = Response(released(chunks, release), mimetype=EXPORT_MIMETYPES[encoding],
+                            headers={'Content-Disposition': 'attachment; filename="{0}"'.format(name)})
+        # Also released when the response is closed, if the client goes away before the first chunk
+        response.call_on_close(release)
+        return response
@@ -0,0 +1,233 @@
+# Importing Required Libraries
+
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Bounded LRU Cache
+
+class LRUCache:
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+# Shared Disk Cache
+
+class DiskCache:
+    # Results in a SQLite file that every worker process on the node reads and writes, so a month pair computed by
+    # one worker is served by all of them. Entries expire after `ttl` seconds; once the file holds more than
+    # `max_bytes` of results the oldest stored ones are evicted. Keys are hashed together with `namespace`, which
+    # names the settings the results depend on. A locked or broken file counts as a miss and never fails a callback
+
+    def __init__(self, path, ttl=86400, max_bytes=256 * 1024 * 1024, namespace='', timeout=5):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._idle = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        # The value comes last, so that scanning the sizes does not read through the stored results
+        connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                           'stored REAL NOT NULL, expires REAL NOT NULL, value BLOB NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored, size)')
+        connection.execute('CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)')
+        return connection
+
+    @contextlib.contextmanager
+    def _connection(self):
+        # Connections are reused by the request threads of a process, which come and go; a forked worker opens
+        # its own instead of sharing its parent's
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle, self._pid = [], os.getpid()
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                if self._pid == os.getpid():
+                    self._idle.append(connection)
+
+    def _key(self, key):
+        return hashlib.sha1(repr((self.namespace, key)).encode()).hexdigest()
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, key, default=None):
+        try:
+            with self._connection() as connection:
+                row = connection.execute('SELECT value FROM entries WHERE key = ? AND expires > ?',
+                                         (self._key(key), time.time())).fetchone()
+            value = default if row is None else pickle.loads(row[0])
+        except Exception:
+            # Besides a locked or broken file, a result pickled by other versions of numpy or plotly may not load
+            self._count('errors')
+            row, value = None, default
+        self._count('misses' if row is None else 'hits')
+        return value
+
+    def set(self, key, value):
+        if self.max_bytes <= 0:
+            return
+        now = time.time()
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                return
+            with self._connection() as connection:
+                try:
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                       (self._key(key), len(data), now, now + self.ttl, data))
+                    self._evict(connection, now)
+                    connection.execute('COMMIT')
+                except BaseException:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    raise
+        except Exception:
+            self._count('errors')
+
+    def _evict(self, connection, now):
+        connection.execute('DELETE FROM entries WHERE expires <= ?', (now,))
+        excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in connection.execute('SELECT key, size FROM entries ORDER BY stored'):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+    def clear(self):
+        try:
+            with self._connection() as connection:
+                connection.execute('DELETE FROM entries')
+        except Exception:
+            self._count('errors')
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+
+    def stats(self):
+        # The size is None while the file cannot be read
+        try:
+            with self._connection() as connection:
+                entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries '
+                                                   'WHERE expires > ?', (time.time(),)).fetchone()
+        except Exception:
+            self._count('errors')
+            entries = size = None
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors, 'size': entries,
+                    'bytes': size, 'max_bytes': self.max_bytes, 'ttl': self.ttl, 'path': self.path}
+
+
+class TieredCache:
+    # The worker's own LRU cache in front of the shared disk cache; a result found on disk is kept in memory too
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def __len__(self):
+        return len(self.local)
+
+    def get(self, key, default=None):
+        result = self.local.get(key, _missing)
+        if result is _missing:
+            result = self.shared.get(key, _missing)
+            if result is _missing:
+                return default
+            self.local.set(key, result)
+        return result
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self.shared.set(key, value)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        return dict(self.local.stats(), shared=self.shared.stats())
+
+
+_missing = object()
+
+
+def cached_result(cache, version):
+    # Results are keyed by the function, the data version and the month arguments
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            key = (function.__name__, version(), args)
+            result = cache.get(key, _missing)
+            if result is _missing:
+                result = function(*args)
+                cache.set(key, result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,193 @@
+# Importing Required Libraries
+
+import plotly
+import plotly.graph_objects as go
+
+
+# Figure Settings
+
+# Part of the shared figure cache's key: bump it with any change to how figures are drawn, so that workers of a new
+# deploy do not read figures cached by the old one
+FIGURE_FORMAT_VERSION = 1
+
+
+def figure_format():
+    return '{0}-plotly{1}'.format(FIGURE_FORMAT_VERSION, plotly.__version__)
+
+
+# Shared Layouts
+
+def validated_layout(**properties):
+    # Plotly validates and normalizes each layout once; figures reuse the resulting plain dict
+    return go.Figure(layout=properties).to_plotly_json()['layout']
+
+
+tick_font = dict(
+    family='Arial',
+    size=12,
+    color='white'
+)
+
+card_layout = validated_layout(
+    template='plotly_dark',
+    margin=dict(l=0, r=0, t=0, b=0),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)'
+)
+
+line_layout = validated_layout(
+    xaxis=dict(
+        showline=True,
+        showgrid=False,
+        showticklabels=True,
+        linecolor='white',
+        linewidth=2,
+        ticks='outside',
+        tickfont=tick_font
+    ),
+    yaxis=dict(
+        showgrid=False,
+        showline=True,
+        showticklabels=True,
+        linecolor='white',
+        linewidth=2,
+        ticks='outside',
+        tickfont=tick_font,
+        tickformat='$',
+        ticksuffix='M'
+    ),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    margin=dict(l=0, r=0, t=0, b=0),
+    legend=dict(
+        orientation="h",
+        yanchor="bottom",
+        y=1,
+        xanchor="right",
+        x=1,
+        font=tick_font
+    )
+)
+
+bar_axes = dict(
+    xaxis=dict(
+        showline=True,
+        showgrid=False,
+        zeroline=False,
+        showticklabels=True,
+        linecolor='white',
+        linewidth=2,
+        ticks='outside',
+        tickfont=tick_font,
+        tickformat='$',
+        ticksuffix='M'
+    ),
+    yaxis=dict(
+        showgrid=False,
+        showline=False,
+        showticklabels=True,
+        ticks='outside',
+        tickfont=tick_font
+    ),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)'
+)
+
+dept_bar_layout = validated_layout(
+    margin=dict(l=0, r=0, t=0, b=0),
+    **bar_axes
+)
+
+store_bar_layout = validated_layout(
+    margin=dict(l=0, r=0, t=27.5, b=0),
+    title=dict(
+        x=0.5,
+        y=0.99,
+        font=dict(
+            family='Arial',
+            color='white',
+            size=15
+        )
+    ),
+    **bar_axes
+)
+
+
+# Figure Builders
+
+def indicator_figure(value, reference, money=False):
+    indicator = {
+        'type': 'indicator',
+        'mode': 'number+delta',
+        'value': value,
+        'align': 'center',
+        'delta': {'reference': reference, 'relative': False, 'position': 'bottom'},
+        'domain': {'x': [0.15, 0.85], 'y': [0, 1]}
+    }
+    if money:
+        indicator['number'] = {'valueformat': '$.2f', 'suffix': 'M'}
+        indicator['delta'].update({'valueformat': '$.2f', 'suffix': 'M'})
+    return {'data': [indicator], 'layout': card_layout}
+
+
+def weekly_line(weekly_sales, name, color):
+    return {
+        'type': 'scatter',
+        'x': weekly_sales['Week_Number'].to_numpy(),
+        'y': weekly_sales['Weekly_Sales'].to_numpy(),
+        'line': {'color': color, 'width': 3},
+        'name': '{}'.format(name),
+        'text': weekly_sales['Month'].to_numpy(dtype=object),
+        'hovertemplate': "<i><b>Week %{x}</b></i><br>" +
+                         "<i><b>Sales:</b> %{y}</i><br>" +
+                         "<extra></extra>"
+    }
+
+
+def weekly_figure(current_weekly, reference_weekly, current, reference):
+    return {'data': [weekly_line(current_weekly, current, 'cyan'), weekly_line(reference_weekly, reference, 'dodgerblue')],
+            'layout': line_layout}
+
+
+def horizontal_bar(values, labels, color, hover_label):
+    return {
+        'type': 'bar',
+        'x': values,
+        'y': labels,
+        'marker': {'color': color},
+        'orientation': 'h',
+        'text': values,
+        'textposition': 'outside',
+        'textfont': tick_font,
+        'hovertemplate': "<i><b>%{y}</b></i><br>" +
+                         "<i><b>" + hover_label + ":</b> %{x}</i><br>" +
+                         "<extra></extra>"
+    }
+
+
+def dept_difference_figure(dept_difference):
+    difference = dept_difference['Difference']
+    bar = horizontal_bar(difference.to_numpy(), dept_difference['Dept'].to_numpy(dtype=object), 'lightsteelblue',
+                         'Sales Diff')
+    xaxis = dict(dept_bar_layout['xaxis'], range=['{}'.format(difference.min() - 3), '{}'.format(difference.max() + 3)])
+    return {'data': [bar], 'layout': dict(dept_bar_layout, xaxis=xaxis)}
+
+
+def store_ranking_figure(store_sales, month, color):
+    sales = store_sales['Weekly_Sales']
+    bar = horizontal_bar(sales.to_numpy(), store_sales['Store'].to_numpy(dtype=object), color, 'Sales')
+    bar['name'] = '{}'.format(month)
+    xaxis = dict(store_bar_layout['xaxis'], range=[0, '{}'.format(sales.max() + 2.75)])
+    title = dict(store_bar_layout['title'], text='{}'.format(month))
+    return {'data': [bar], 'layout': dict(store_bar_layout, xaxis=xaxis, title=title)}
+
+
+# Clientside Payload
+
+def clientside_payload(aggregate_store, options):
+    # Everything the clientside callbacks need to draw any month pair without a server round trip
+    return {
+        'options': {month: list(others) for month, others in options.items()},
+        'months': {month: aggregate_store.month_payload(month) for month in options},
+        'layouts': {'card': card_layout, 'line': line_layout, 'dept': dept_bar_layout, 'store': store_bar_layout}
+    }
@@ -0,0 +1,151 @@
+# Importing Required Libraries
+
+import bisect
+import contextlib
+import functools
+import threading
+import time
+
+from flask import Response, g, has_request_context
+
+# Histogram Settings
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+NULL_PHASE = contextlib.nullcontext()
+
+
+# Latency Histograms
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        position = bisect.bisect_left(self.buckets, seconds)
+        if position < len(self.buckets):
+            self.counts[position] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class PhaseTimer:
+
+    def __init__(self, instrumentation, callback, phase):
+        self.instrumentation = instrumentation
+        self.callback = callback
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.callback, self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    # Timing histograms per callback and phase; when disabled every hook is a no-op or returns the function as is
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, callback, phase, seconds):
+        with self._lock:
+            histogram = self._histograms.get((callback, phase))
+            if histogram is None:
+                histogram = self._histograms[(callback, phase)] = Histogram()
+            histogram.observe(seconds)
+        if has_request_context():
+            g.setdefault('server_timing', []).append((callback, phase, seconds))
+
+    def phase(self, callback, phase):
+        if not self.enabled:
+            return NULL_PHASE
+        return PhaseTimer(self, callback, phase)
+
+    def timed(self, func):
+        # Records the whole call as the 'total' phase of func
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            with PhaseTimer(self, func.__name__, 'total'):
+                return func(*args)
+        return wrapper
+
+    def callback(self, func):
+        # Like timed, for the functions registered as Dash callbacks: whatever the update request spends
+        # outside them is recorded as their 'serialization' phase
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                seconds = time.perf_counter() - start
+                self.record(func.__name__, 'total', seconds)
+                if has_request_context():
+                    g.callback_timing = (func.__name__, seconds)
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {key: {'count': histogram.count, 'sum': histogram.sum}
+                    for key, histogram in self._histograms.items()}
+
+    def prometheus_text(self):
+        lines = ['# HELP retail_callback_seconds Time spent per dashboard callback and phase',
+                 '# TYPE retail_callback_seconds histogram']
+        with self._lock:
+            for (callback, phase), histogram in sorted(self._histograms.items()):
+                labels = 'callback="{0}",phase="{1}"'.format(callback, phase)
+                for bound, count in histogram.cumulative_counts():
+                    lines.append('retail_callback_seconds_bucket{{{0},le="{1}"}} {2}'.format(labels, bound, count))
+                lines.append('retail_callback_seconds_bucket{{{0},le="+Inf"}} {1}'.format(labels, histogram.count))
+                lines.append('retail_callback_seconds_sum{{{0}}} {1}'.format(labels, repr(histogram.sum)))
+                lines.append('retail_callback_seconds_count{{{0}}} {1}'.format(labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def install(self, server):
+        # Adds the /metrics route and Server-Timing headers to the Flask server; nothing is added when disabled
+        if not self.enabled:
+            return
+
+        @server.route('/metrics')
+        def metrics():
+            return Response(self.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+        @server.before_request
+        def start_request_timer():
+            g.request_start = time.perf_counter()
+
+        @server.after_request
+        def add_server_timing(response):
+            callback_timing = g.pop('callback_timing', None)
+            if callback_timing is not None:
+                callback, seconds = callback_timing
+                self.record(callback, 'serialization', time.perf_counter() - g.request_start - seconds)
+            timings = g.pop('server_timing', None)
+            if timings:
+                response.headers['Server-Timing'] = ', '.join(
+                    '{0}.{1};dur={2:.3f}'.format(callback, phase, seconds * 1000)
+                    for callback, phase, seconds in timings)
+            return response
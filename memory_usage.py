@@ -0,0 +1,167 @@
+# Importing Required Libraries
+
+import functools
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+
+
+# Process Memory
+
+def resident_memory():
+    # Current resident set size in bytes; peak RSS is the fallback where /proc is not available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_bytes(size):
+    return '{0:.1f} MB'.format(size / 1024 / 1024)
+
+
+def shared_memory_breakdown(pid='self'):
+    # Proportional (Pss) and private (USS) set sizes in bytes; pages shared copy-on-write with the parent
+    # process count towards Pss in equal parts and not at all towards USS. Linux only, None elsewhere
+    try:
+        with open('/proc/{0}/smaps_rollup'.format(pid)) as smaps:
+            fields = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in smaps if line.endswith('kB\n')}
+    except (OSError, ValueError):
+        return None
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+# Object Sizes
+
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size(value):
+    # Bytes held by value and everything it references, each object counted once. Frames and arrays are counted
+    # by their own buffers
+    seen = set()
+    pending = [value]
+    size = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            size += int(np.sum(item.memory_usage(deep=True)))
+        elif isinstance(item, np.ndarray):
+            size += item.nbytes
+        else:
+            size += sys.getsizeof(item)
+            if isinstance(item, dict):
+                pending.extend(item.keys())
+                pending.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                pending.extend(item)
+            elif hasattr(item, '__dict__'):
+                pending.append(vars(item))
+    return size
+
+
+# Allocation Tracking
+
+class AllocationTracker:
+    # Python allocations traced with tracemalloc: the peak while the data is loaded and aggregated, then per
+    # callback the bytes still allocated after a call and the peak during it. The tracer is process-wide, so calls
+    # that overlap in other threads blur each other's numbers. When disabled nothing is traced and the decorator
+    # returns the function as is
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.startup_peak = None
+        self.startup_current = None
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def mark_startup(self):
+        if self.enabled and tracemalloc.is_tracing():
+            self.startup_current, self.startup_peak = tracemalloc.get_traced_memory()
+
+    def callback(self, func):
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if not tracemalloc.is_tracing():
+                return func(*args)
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                return func(*args)
+            finally:
+                after, peak = tracemalloc.get_traced_memory()
+                self.record(func.__name__, after - before, peak - before)
+        return wrapper
+
+    def record(self, name, retained, peak):
+        with self._lock:
+            stats = self._callbacks.setdefault(name, {'calls': 0, 'retained_bytes': 0, 'max_peak_bytes': 0})
+            stats['calls'] += 1
+            stats['retained_bytes'] += retained
+            stats['max_peak_bytes'] = max(stats['max_peak_bytes'], peak)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(stats, mean_retained_bytes=stats['retained_bytes'] / stats['calls'])
+                    for name, stats in self._callbacks.items()}
+
+
+# Memory Report
+
+def format_kilobytes(size):
+    return '{0:,.0f} KB'.format(size / 1024)
+
+
+def format_memory_report(report):
+    # The report of Application.memory_report as text, largest structures first
+    lines = ['Process {0}: resident {1}'.format(report['pid'], format_bytes(report['rss_bytes']))]
+    if report['shared'] is not None:
+        lines.append('  proportional {0}, private {1}'.format(format_bytes(report['shared']['pss']),
+                                                             format_bytes(report['shared']['uss'])))
+    lines.append('')
+    lines.append('{0:<28} {1:>12}'.format('structure', 'size'))
+    for name, size in sorted(report['structures'].items(), key=lambda item: -item[1]):
+        lines.append('{0:<28} {1:>12}'.format(name, format_kilobytes(size)))
+    lines.append('{0:<28} {1:>12}'.format('total, shared counted once', format_kilobytes(report['structures_total_bytes'])))
+    if 'database_file_bytes' in report:
+        lines.append('{0:<28} {1:>12}'.format('database file', format_kilobytes(report['database_file_bytes'])))
+    startup = report['startup']
+    lines.append('')
+    if startup['traced_peak_bytes'] is not None:
+        lines.append('Startup: {0:.2f}s, traced peak {1}, still allocated {2}'.format(
+            startup['seconds'] or 0, format_bytes(startup['traced_peak_bytes']),
+            format_bytes(startup['traced_bytes'])))
+    else:
+        lines.append('Startup: {0:.2f}s, not traced'.format(startup['seconds'] or 0))
+    if report['callbacks']:
+        lines.append('')
+        lines.append('{0:<34} {1:>7} {2:>14} {3:>12}'.format('callback', 'calls', 'mean retained', 'max peak'))
+        for name, stats in sorted(report['callbacks'].items()):
+            lines.append('{0:<34} {1:>7} {2:>14} {3:>12}'.format(
+                name, stats['calls'], format_kilobytes(stats['mean_retained_bytes']),
+                format_kilobytes(stats['max_peak_bytes'])))
+    budget = report['budget']
+    if budget['bytes'] > 0:
+        lines.append('')
+        lines.append('Budget {0}: {1}, on excess {2}'.format(
+            format_bytes(budget['bytes']), 'exceeded' if budget['exceeded'] else 'within', budget['action']))
+    return '\n'.join(lines)
@@ -0,0 +1,238 @@
+# Importing Required Libraries
+
+import functools
+import gzip
+import json
+import threading
+
+import numpy as np
+from flask import request
+from plotly.utils import PlotlyJSONEncoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Payload Settings
+
+MEASURE_DECIMALS = 2
+
+COMPRESSED_PATHS = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies')
+
+COMPRESSION_MIN_BYTES = 512
+
+# Template layout entries that only apply when the figure uses the matching layout key
+OPTIONAL_TEMPLATE_LAYOUT = {'geo': 'geo', 'mapbox': 'mapbox', 'polar': 'polar', 'ternary': 'ternary', 'scene': 'scene',
+                            'annotationdefaults': 'annotations', 'shapedefaults': 'shapes',
+                            'sliderdefaults': 'sliders', 'updatemenudefaults': 'updatemenus'}
+
+COLORSCALE_TEMPLATE_LAYOUT = ('colorscale', 'coloraxis')
+
+COLOR_BY_NAME_TRACES = {'scatter', 'bar', 'indicator'}
+
+NON_CARTESIAN_TRACES = {'indicator', 'pie', 'table', 'sunburst', 'treemap', 'funnelarea', 'sankey', 'parcoords',
+                        'parcats'}
+
+
+# Payload Sizes
+
+class PayloadSizes:
+    # Bytes per response before and after each slimming or compression stage
+
+    def __init__(self):
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, before, after):
+        with self._lock:
+            sizes = self._sizes.setdefault(name, [0, 0, 0])
+            sizes[0] += 1
+            sizes[1] += before
+            sizes[2] += after
+
+    def stats(self):
+        with self._lock:
+            return {name: {'responses': count, 'bytes_before': before / count, 'bytes_after': after / count}
+                    for name, (count, before, after) in self._sizes.items()}
+
+
+def json_size(value):
+    return len(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+# Figure Slimming
+
+def round_measures(values, decimals=MEASURE_DECIMALS):
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return np.round(values, decimals)
+    if isinstance(values, float):
+        return round(values, decimals)
+    if isinstance(values, (list, tuple)) and any(isinstance(value, float) for value in values):
+        return [round(value, decimals) if isinstance(value, float) else value for value in values]
+    return values
+
+
+def slim_trace(trace, decimals):
+    slimmed = dict(trace)
+    for key in ('x', 'y', 'text', 'value'):
+        if key in slimmed:
+            slimmed[key] = round_measures(slimmed[key], decimals)
+    if 'delta' in slimmed and 'reference' in slimmed['delta']:
+        slimmed['delta'] = dict(slimmed['delta'], reference=round_measures(slimmed['delta']['reference'], decimals))
+    return slimmed
+
+
+def without_template_values(layout, template_layout):
+    # Drops the values the template would fill in anyway
+    slimmed = {}
+    for key, value in layout.items():
+        default = template_layout.get(key)
+        if isinstance(value, dict) and isinstance(default, dict):
+            value = without_template_values(value, default)
+            if value:
+                slimmed[key] = value
+        elif default is None or value != default:
+            slimmed[key] = value
+    return slimmed
+
+
+def without_overridden(template_layout, layout):
+    # Drops the template values the figure sets itself
+    slimmed = {}
+    for key, value in template_layout.items():
+        override = layout.get(key)
+        if isinstance(value, dict) and isinstance(override, dict):
+            value = without_overridden(value, override)
+            if value:
+                slimmed[key] = value
+        elif override is None:
+            slimmed[key] = value
+    return slimmed
+
+
+def uses_colorscale(trace):
+    # Colorscales apply to traces coloured by numbers; the dashboard's traces only use named colours
+    if trace.get('type', 'scatter') not in COLOR_BY_NAME_TRACES:
+        return True
+    for part in ('marker', 'line'):
+        color = trace.get(part, {}).get('color')
+        if color is not None and not isinstance(color, str):
+            return True
+    return False
+
+
+def layout_paths(layout, prefix=()):
+    for key, value in layout.items():
+        if isinstance(value, dict):
+            yield from layout_paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,)
+
+
+class FigureSlimmer:
+    # Rounds measures to the displayed precision and keeps only the parts of the template a figure can use;
+    # the pruned templates are reused across figures built from the same shared layout
+
+    def __init__(self, enabled=True, decimals=MEASURE_DECIMALS, sizes=None):
+        self.enabled = enabled
+        self.decimals = decimals
+        self.sizes = sizes
+        self._templates = {}
+
+    def pruned_template(self, template, trace_types, colorscale, layout):
+        # The pruning depends on which layout properties the figure sets, not on their values
+        key = (id(template), trace_types, colorscale, frozenset(layout_paths(layout)))
+        cached = self._templates.get(key)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+
+        data = {trace_type: traces for trace_type, traces in template.get('data', {}).items()
+                if trace_type in trace_types}
+        template_layout = {name: value for name, value in template.get('layout', {}).items()
+                           if name not in OPTIONAL_TEMPLATE_LAYOUT or OPTIONAL_TEMPLATE_LAYOUT[name] in layout}
+        if not colorscale:
+            template_layout = {name: value for name, value in template_layout.items()
+                               if name not in COLORSCALE_TEMPLATE_LAYOUT}
+        if trace_types <= NON_CARTESIAN_TRACES:
+            template_layout = {name: value for name, value in template_layout.items()
+                               if not name.startswith(('xaxis', 'yaxis'))}
+        pruned = {'data': data, 'layout': without_overridden(template_layout, layout)}
+        self._templates[key] = (template, pruned)
+        return pruned
+
+    def slim(self, figure):
+        layout = figure.get('layout', {})
+        template = layout.get('template')
+        traces = [slim_trace(trace, self.decimals) for trace in figure.get('data', [])]
+        if template is None:
+            slimmed_layout = dict(layout)
+        else:
+            own_layout = {key: value for key, value in layout.items() if key != 'template'}
+            own_layout = without_template_values(own_layout, template.get('layout', {}))
+            trace_types = frozenset(trace.get('type', 'scatter') for trace in traces)
+            colorscale = any(uses_colorscale(trace) for trace in traces)
+            slimmed_layout = dict(own_layout,
+                                  template=self.pruned_template(template, trace_types, colorscale, own_layout))
+        return {'data': traces, 'layout': slimmed_layout}
+
+    def slimmed(self, func):
+        # Decorator for the figure builders; with a size registry the bytes before and after are recorded per builder
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            figure = func(*args)
+            slimmed = self.slim(figure)
+            if self.sizes is not None:
+                self.sizes.record(func.__name__, json_size(figure), json_size(slimmed))
+            return slimmed
+        return wrapper
+
+
+# Response Compression
+
+def response_label(path):
+    if path != '/_dash-update-component':
+        return path
+    # Named after the components the callback updates, e.g. 'reference' or 'card2,card3,...'
+    output = (request.get_json(silent=True) or {}).get('output', '')
+    components = []
+    for item in output.strip('.').split('...'):
+        component = item.split('.')[0]
+        if component and component not in components:
+            components.append(component)
+    return ','.join(components) or path
+
+
+def preferred_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def install_compression(server, sizes=None, paths=COMPRESSED_PATHS, min_bytes=COMPRESSION_MIN_BYTES, level=6):
+    # Brotli when the client accepts it and the brotli package is installed, gzip otherwise
+
+    @server.after_request
+    def compress_response(response):
+        if (request.path not in paths or response.status_code != 200 or response.direct_passthrough or
+                'Content-Encoding' in response.headers):
+            return response
+        encoding = preferred_encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < min_bytes:
+            return response
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=level)
+        else:
+            compressed = gzip.compress(data, compresslevel=level)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        if sizes is not None:
+            sizes.record(response_label(request.path), len(data), len(compressed))
+        return response
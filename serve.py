@@ -0,0 +1,92 @@
+# Production Server: the data is loaded and aggregated once, then worker processes are forked that share it
+#
+# Usage: python serve.py [--workers 4] [--host 0.0.0.0] [--port 8050]
+#
+# The master imports the app, which loads the data and builds the aggregates, stops its refresh and reload threads,
+# freezes the garbage collector so the inherited objects are not written to by collections in the workers, and then
+# forks the workers, which start their own threads. They all accept connections on the one listening socket and
+# share the master's memory pages copy-on-write, the columns read from the .data_cache included. Workers that exit
+# are replaced, SIGTERM or SIGINT stops them all. With LAZY_STARTUP=1 the master still waits for the data before it
+# forks, so the workers share it instead of each loading their own.
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+
+from werkzeug.serving import make_server
+
+import Application
+
+
+def run_worker(listener, host, port):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    make_server(host, port, Application.server, threaded=True, fd=listener.fileno()).serve_forever()
+
+
+def spawn_worker(listener, host, port):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener, host, port)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--quiet', action='store_true', help='no access log')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        raise SystemExit('serve.py needs os.fork; elsewhere serve Application:server with a WSGI server')
+    if args.quiet:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    while not Application.startup_ready.wait(1):
+        if Application.startup_error is not None:
+            raise SystemExit('Loading the sales data failed: {0}'.format(Application.startup_error))
+
+    listener = socket.create_server((args.host, args.port), backlog=1024)
+    listener.set_inheritable(True)
+
+    # A worker forked while one of these threads held the ingest or a database lock would inherit it locked
+    Application.stop_background_threads()
+
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn_worker(listener, args.host, args.port) for _ in range(args.workers)}
+    print('Serving on http://{0}:{1} with {2} workers (pids {3})'.format(
+        args.host, args.port, len(workers), ', '.join(str(pid) for pid in sorted(workers))), flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while workers:
+        pid, status = os.wait()
+        workers.discard(pid)
+        if not stopping:
+            print('Worker {0} exited with status {1}, starting a new one'.format(pid, status), flush=True)
+            workers.add(spawn_worker(listener, args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Importing Required Libraries
+
+import contextlib
+import threading
+
+
+# Sales Snapshot
+
+class SalesSnapshot:
+    # Everything the callbacks read about one revision of the source. A snapshot is filled in completely before it
+    # is published; an ingest or a reload publishes a new one instead of changing the published one
+
+    def __init__(self, source_version, source_offset, data=None, aggregator=None, range_sales=None, cube_sales=None,
+                 backend=None, tables=None, options=None, range_index=None, sales_cube=None, ingest_count=0,
+                 source_path=None, ingest_token=None, source_signature=None):
+        self.source_version = source_version
+        self.source_offset = source_offset
+        self.data = data
+        self.aggregator = aggregator
+        self.range_sales = range_sales
+        self.cube_sales = cube_sales
+        self.backend = backend
+        self.tables = tables
+        self.options = options if options is not None else {}
+        self.range_index = range_index
+        self.sales_cube = sales_cube
+        self.ingest_count = ingest_count
+        self.source_path = source_path
+        self.ingest_token = ingest_token
+        self.source_signature = source_signature
+
+    @property
+    def version(self):
+        # Names the data, so every worker holding the same rows has the same version and results can be shared.
+        # Rows appended to the source are identified by the offset they were read up to; rows ingested by other
+        # means only exist in this process and get a token of their own
+        if self.ingest_count == 0:
+            return self.source_version
+        version = '{0}-{1}'.format(self.source_version, self.source_offset)
+        return version if self.ingest_token is None else '{0}-{1}'.format(version, self.ingest_token)
+
+    def replace(self, **changes):
+        fields = dict(vars(self))
+        fields.update(changes)
+        return SalesSnapshot(**fields)
+
+
+class SnapshotHolder:
+    # The published snapshot is swapped with one reference assignment. A callback pins the snapshot it started
+    # with, so a request never mixes two versions, while the requests after a swap see the new one
+
+    def __init__(self, snapshot=None):
+        self.current = snapshot
+        self._pinned = threading.local()
+
+    def publish(self, snapshot):
+        self.current = snapshot
+
+    def active(self):
+        snapshot = getattr(self._pinned, 'snapshot', None)
+        return self.current if snapshot is None else snapshot
+
+    @contextlib.contextmanager
+    def pinned(self, snapshot=None):
+        # Pins the given snapshot, e.g. another dataset's, or else the active one
+        previous = getattr(self._pinned, 'snapshot', None)
+        self._pinned.snapshot = snapshot if snapshot is not None else self.active()
+        try:
+            yield self._pinned.snapshot
+        finally:
+            self._pinned.snapshot = previous
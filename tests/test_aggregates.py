@@ -0,0 +1,76 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from aggregates import (SalesAggregator, aggregate_frame, count_data, dept_data, monthly_data, parallel_aggregate,
+                        store_data, weekly_data)
+from benchmarks.synthetic_data import generate_sales
+
+
+def assert_tables_equal(actual, expected):
+    for actual_table, expected_table in zip(actual, expected):
+        pd.testing.assert_frame_equal(actual_table.reset_index(drop=True), expected_table.reset_index(drop=True))
+
+
+def test_concurrent_parallel_aggregations_keep_their_own_frames():
+    frames = [generate_sales(stores=6, depts=4, years=1, seed=seed) for seed in (0, 1)]
+    expected = [aggregate_frame(frame).tables() for frame in frames]
+    barrier = threading.Barrier(len(frames))
+    results = [None] * len(frames)
+
+    def run(position):
+        barrier.wait()
+        results[position] = parallel_aggregate(frames[position], workers=2).tables()
+
+    threads = [threading.Thread(target=run, args=(position,)) for position in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result, tables in zip(results, expected):
+        assert_tables_equal(result, tables)
+
+
+def test_parallel_aggregation_forks_only_without_other_threads(monkeypatch):
+    frame = generate_sales(stores=6, depts=4, years=1, seed=3)
+    expected = aggregate_frame(frame).tables()
+    assert_tables_equal(parallel_aggregate(frame, workers=2).tables(), expected)
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('forked while another thread was running')
+
+    monkeypatch.setattr('aggregates.ProcessPoolExecutor', refuse)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(parallel_aggregate(frame, workers=2).tables()))
+    thread.start()
+    thread.join()
+    assert_tables_equal(results[0], expected)
+
+
+@pytest.mark.parametrize('chunksize', [1, 50, 250, 10000])
+def test_streamed_tables_match_the_in_memory_ones(chunksize):
+    frame = generate_sales(stores=3, depts=4, years=1)
+    chunks = [frame.iloc[start:start + chunksize] for start in range(0, len(frame), chunksize)]
+    if 1 < chunksize < len(frame):
+        # Months of 48 or 60 rows, so some of them span two chunks
+        assert any(chunk['Month'].iloc[-1] == following['Month'].iloc[0]
+                   for chunk, following in zip(chunks, chunks[1:]))
+    aggregator = SalesAggregator()
+    for chunk in chunks:
+        aggregator.add(chunk)
+
+    expected = (monthly_data(frame), weekly_data(frame), store_data(frame), dept_data(frame), count_data(frame))
+    for table, expected_table in zip(aggregator.tables(), expected):
+        pd.testing.assert_frame_equal(table, expected_table, check_exact=False)
+
+
+def test_rows_added_to_a_copy_leave_the_original_unchanged():
+    frame = generate_sales(stores=3, depts=4, years=2, seed=2)
+    first, second = frame.iloc[:len(frame) // 2], frame.iloc[len(frame) // 2:]
+    aggregator = aggregate_frame(first)
+    aggregator.tables()
+    copy = aggregator.copy()
+    copy.add(second)
+    assert_tables_equal(aggregator.tables(), aggregate_frame(first).tables())
+    assert_tables_equal(copy.tables(), aggregate_frame(frame).tables())
@@ -0,0 +1,60 @@
+import os
+
+from backends import SQLBackend, build_database, open_backend
+from benchmarks.synthetic_data import generate_sales, write_sales_csv
+from data_source import read_appended_rows
+
+
+def append_rows(path, dataframe):
+    dataframe = dataframe.copy()
+    dataframe['Date'] = dataframe['Date'].dt.strftime('%Y-%m-%d')
+    dataframe.to_csv(path, mode='a', header=False, index=False)
+    return os.path.getsize(path)
+
+
+def test_workers_sharing_a_database_insert_appended_rows_once(tmp_path):
+    source = str(tmp_path / 'sales.csv')
+    write_sales_csv(source, stores=2, depts=3, years=1)
+    database = str(tmp_path / 'sales.sqlite')
+    build_database('sqlite', source, database)
+    first, second = SQLBackend('sqlite', database), SQLBackend('sqlite', database)
+    start = os.path.getsize(source)
+    extra = generate_sales(stores=2, depts=3, years=2, seed=1).iloc[-60:]
+
+    # The first worker ingests one batch, the second one reads from the same old offset after more rows arrived
+    middle = append_rows(source, extra.iloc[:25])
+    rows, offset = read_appended_rows(source, start)
+    first_view = first.add(rows, offset, start_offset=start, source_path=source)
+    end = append_rows(source, extra.iloc[25:])
+    rows, offset = read_appended_rows(source, start)
+    assert offset == end and len(rows) == 60
+    second_view = second.add(rows, offset, start_offset=start, source_path=source)
+    # A batch the file already holds completely is dropped, and the view covers the rows the file holds
+    rows, offset = read_appended_rows(source, start, end=middle)
+    last_view = first.add(rows, offset, start_offset=start, source_path=source)
+
+    source_rows = sum(1 for _ in open(source)) - 1
+    assert second.query('SELECT COUNT(*) FROM sales')[0][0] == source_rows
+    assert second_view.source_offset() == last_view.source_offset() == end
+    # Every view keeps reading the rows it was created with
+    month = extra['Month'].iloc[-1]
+    totals = [view.total_sales(month) if month in view else 0.0 for view in (first, first_view, second_view)]
+    expected = [extra.iloc[:n].loc[extra['Month'].iloc[:n] == month, 'Weekly_Sales'].sum() for n in (0, 25, 60)]
+    assert totals[1:] == [round(totals[0] + value, 1) for value in expected[1:]]
+    assert second_view.summary(month) == last_view.summary(month)
+
+
+def test_sources_with_the_same_name_keep_their_own_database(tmp_path):
+    database_dir = str(tmp_path / 'databases')
+    sources = []
+    for folder in ('north', 'south'):
+        os.makedirs(str(tmp_path / folder))
+        sources.append(str(tmp_path / folder / 'sales.csv'))
+        write_sales_csv(sources[-1], stores=2, depts=3, years=1)
+    north = open_backend('sqlite', sources[0], database_dir)
+    open_backend('sqlite', sources[1], database_dir)
+    # Rebuilding one source after a rewrite removes only its own older database
+    append_rows(sources[1], generate_sales(stores=2, depts=3, years=1, seed=1).iloc[:5])
+    open_backend('sqlite', sources[1], database_dir)
+    databases = [name for name in os.listdir(database_dir) if name.endswith('.sqlite')]
+    assert len(databases) == 2 and os.path.basename(north.path) in databases
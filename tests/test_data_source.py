@@ -0,0 +1,20 @@
+import os
+
+import pandas as pd
+
+from benchmarks.synthetic_data import write_sales_csv
+from data_source import load_data, read_cache, read_csv_source, source_fingerprint
+
+
+def test_a_damaged_cache_entry_is_read_again_from_the_csv(tmp_path):
+    source = str(tmp_path / 'sales.csv')
+    cache_dir = str(tmp_path / 'cache')
+    write_sales_csv(source, stores=2, depts=3, years=1)
+    load_data(source, cache_dir=cache_dir)
+    entry = os.path.join(cache_dir, source_fingerprint(source))
+    column = os.path.join(entry, '3.npy')
+    with open(column, 'r+b') as values:
+        values.truncate(os.path.getsize(column) // 2)
+
+    pd.testing.assert_frame_equal(load_data(source, cache_dir=cache_dir), read_csv_source(source))
+    pd.testing.assert_frame_equal(read_cache(cache_dir, source_fingerprint(source)), read_csv_source(source))
@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+from figure_cache import DiskCache
+
+
+@pytest.mark.parametrize('data', [b'', b'cgone_module\nThing\n.', b'\x80\x04\x95'])
+def test_unreadable_entries_count_as_misses(tmp_path, data):
+    cache = DiskCache(str(tmp_path / 'figure_cache.sqlite'))
+    cache.set('key', {'data': []})
+    connection = sqlite3.connect(cache.path)
+    connection.execute('UPDATE entries SET value = ?', (data,))
+    connection.commit()
+    connection.close()
+
+    assert cache.get('key', 'missing') == 'missing'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['errors']) == (0, 1, 1)
+
+
+def test_unusable_file_never_raises(tmp_path):
+    path = tmp_path / 'figure_cache.sqlite'
+    path.write_bytes(b'not a database' * 100)
+    cache = DiskCache(str(path))
+    cache.set('key', 1)
+    assert cache.get('key') is None
+    cache.clear()
+    assert cache.stats()['size'] is None
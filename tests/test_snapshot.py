@@ -0,0 +1,15 @@
+from snapshot import SalesSnapshot
+
+
+def test_version_names_the_rows_not_the_number_of_ingests():
+    loaded = SalesSnapshot('abc', 100)
+    assert loaded.version == 'abc'
+    # Two workers that read the appended rows in different batches hold the same rows
+    one_batch = loaded.replace(source_offset=300, ingest_count=1)
+    two_batches = loaded.replace(source_offset=300, ingest_count=2)
+    assert one_batch.version == two_batches.version
+    # Different rows under the same number of ingests
+    assert one_batch.version != loaded.replace(source_offset=200, ingest_count=1).version
+    # Rows that did not come from the source are never shared
+    local = one_batch.replace(ingest_count=2, ingest_token='f00d')
+    assert local.version != one_batch.version